@@ -0,0 +1,373 @@
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "libraries", "python"))
+
+from cast import Cast, CastColor, Model, Animation, Instance, File
+
+
+def buildMeshScene(rng, scale):
+    vertexCount = int(250000 * scale)
+    faceCount = vertexCount * 2
+    maximumInfluence = 4
+
+    cast = Cast()
+    root = cast.CreateRoot()
+    model = root.CreateModel()
+    model.SetName("dense")
+
+    skeleton = model.CreateSkeleton()
+
+    for i in range(64):
+        bone = skeleton.CreateBone()
+        bone.SetName("bone_%d" % i)
+        bone.SetParentIndex(i - 1)
+
+    mesh = model.CreateMesh()
+    mesh.SetName("dense_mesh")
+    mesh.SetVertexPositionBuffer([(rng.random(), rng.random(), rng.random())
+                                  for _ in range(vertexCount)])
+    mesh.SetVertexNormalBuffer([(0.0, 0.0, 1.0)] * vertexCount)
+    mesh.SetVertexUVLayerBuffer(0, [(rng.random(), rng.random())
+                                    for _ in range(vertexCount)])
+    mesh.SetUVLayerCount(1)
+    mesh.SetVertexColorBuffer(0, [CastColor.toInteger((rng.random(), rng.random(), rng.random(), 1.0))
+                                  for _ in range(vertexCount)])
+    mesh.SetColorLayerCount(1)
+    mesh.SetFaceBuffer([rng.randrange(vertexCount)
+                        for _ in range(faceCount * 3)])
+    mesh.SetMaximumWeightInfluence(maximumInfluence)
+    mesh.SetVertexWeightBoneBuffer([rng.randrange(64)
+                                    for _ in range(vertexCount * maximumInfluence)])
+    mesh.SetVertexWeightValueBuffer([0.25] * (vertexCount * maximumInfluence))
+
+    return cast
+
+
+def buildSkeletonScene(rng, scale):
+    cast = Cast()
+    root = cast.CreateRoot()
+    model = root.CreateModel()
+    skeleton = model.CreateSkeleton()
+
+    for i in range(max(1, int(1000 * scale))):
+        bone = skeleton.CreateBone()
+        bone.SetName("bone_%d" % i)
+        bone.SetParentIndex(rng.randrange(i) if i > 0 else -1)
+        bone.SetLocalPosition((rng.random(), rng.random(), rng.random()))
+        bone.SetLocalRotation((0.0, 0.0, 0.0, 1.0))
+        bone.SetWorldPosition((rng.random(), rng.random(), rng.random()))
+        bone.SetWorldRotation((0.0, 0.0, 0.0, 1.0))
+        bone.SetScale((1.0, 1.0, 1.0))
+
+    return cast
+
+
+def buildAnimationScene(rng, scale):
+    cast = Cast()
+    root = cast.CreateRoot()
+    animation = root.CreateAnimation()
+    animation.SetName("clip")
+    animation.SetFramerate(30.0)
+
+    for i in range(max(1, int(100000 * scale))):
+        curve = animation.CreateCurve()
+        curve.SetNodeName("bone_%d" % (i // 4))
+        curve.SetMode("absolute")
+
+        keyframes = list(range(0, 30, rng.randrange(1, 4)))
+        curve.SetKeyFrameBuffer(keyframes)
+
+        if i % 4 == 0:
+            curve.SetKeyPropertyName("rq")
+            curve.SetVec4KeyValueBuffer([(0.0, 0.0, 0.0, 1.0)] * len(keyframes))
+        else:
+            curve.SetKeyPropertyName(["tx", "ty", "tz"][i % 4 - 1])
+            curve.SetFloatKeyValueBuffer([rng.random() for _ in keyframes])
+
+    return cast
+
+
+def buildHairScene(rng, scale):
+    strandCount = max(1, int(50000 * scale))
+    segments = [rng.randrange(4, 12) for _ in range(strandCount)]
+
+    cast = Cast()
+    root = cast.CreateRoot()
+    model = root.CreateModel()
+
+    hair = model.CreateHair()
+    hair.SetName("hair")
+    hair.SetSegmentBuffer(segments)
+    hair.SetParticleBuffer([(rng.random(), rng.random(), rng.random())
+                            for _ in range(sum(segments) + strandCount)])
+
+    return cast
+
+
+def buildInstanceScene(rng, scale):
+    cast = Cast()
+    root = cast.CreateRoot()
+
+    for i in range(max(1, int(100000 * scale))):
+        instance = root.CreateInstance()
+        instance.SetName("instance_%d" % i)
+
+        # Instances reference one of a small library of shared props, like a world export does.
+        file = instance.CreateChild(File())
+        file.SetPath("props/prop_%d.cast" % rng.randrange(200))
+
+        instance.SetReferenceFile(file.Hash())
+        instance.SetPosition((rng.random(), rng.random(), rng.random()))
+        instance.SetRotation((0.0, 0.0, 0.0, 1.0))
+        instance.SetScale((1.0, 1.0, 1.0))
+
+    return cast
+
+
+def countNodes(nodes):
+    count = 0
+
+    for node in nodes:
+        count += 1 + countNodes(node.childNodes)
+
+    return count
+
+
+def readProperties(nodes):
+    values = 0
+
+    for node in nodes:
+        for property in node.properties.values():
+            values += len(property.values)
+
+        values += readProperties(node.childNodes)
+
+    return values
+
+
+def readAccessors(cast):
+    # Walks the scene the way the importers do, through the typed accessors.
+    values = 0
+
+    for root in cast.Roots():
+        for model in root.ChildrenOfType(Model):
+            for mesh in model.Meshes():
+                for buffer in (mesh.VertexPositionBuffer(),
+                               mesh.VertexNormalBuffer(),
+                               mesh.FaceBuffer(),
+                               mesh.VertexWeightBoneBuffer(),
+                               mesh.VertexWeightValueBuffer()):
+                    values += len(buffer or ())
+
+                for i in range(mesh.UVLayerCount()):
+                    values += len(mesh.VertexUVLayerBuffer(i))
+                for i in range(mesh.ColorLayerCount()):
+                    values += len(mesh.VertexColorLayerBuffer(i))
+
+            for hair in model.Hairs():
+                values += len(hair.SegmentsBuffer()) + len(hair.ParticleBuffer())
+
+            skeleton = model.Skeleton()
+
+            if skeleton is not None:
+                for bone in skeleton.Bones():
+                    bone.Name()
+                    bone.ParentIndex()
+                    values += len(bone.LocalPosition() or ()) + \
+                        len(bone.LocalRotation() or ())
+
+        for animation in root.ChildrenOfType(Animation):
+            for curve in animation.Curves():
+                curve.NodeName()
+                curve.KeyPropertyName()
+                values += len(curve.KeyFrameBuffer()) + \
+                    len(curve.KeyValueBuffer())
+
+        for instance in root.ChildrenOfType(Instance):
+            instance.ReferenceFile()
+            values += len(instance.Position())
+
+    return values
+
+
+def measure(function, *args):
+    gc.collect()
+
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+
+    return (result, elapsed)
+
+
+def measurePeak(function, *args):
+    # Tracing allocations slows everything down, so peak memory is measured on its own run.
+    gc.collect()
+    tracemalloc.start()
+
+    try:
+        function(*args)
+        (_, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def runScenario(name, builder, scale, repeat, directory):
+    rng = random.Random(0x63617374)
+    path = os.path.join(directory, "%s.cast" % name)
+
+    (cast, buildTime) = measure(builder, rng, scale)
+    nodes = countNodes(cast.Roots())
+
+    report = {"scenario": name, "nodes": nodes, "build_s": buildTime}
+
+    timings = {"save": [], "load": [], "properties": [], "accessors": []}
+
+    # Take the best of each run, it's the least affected by everything else on the machine.
+    for _ in range(repeat):
+        (_, elapsed) = measure(cast.save, path)
+        timings["save"].append(elapsed)
+
+        (loaded, elapsed) = measure(Cast.load, path)
+        timings["load"].append(elapsed)
+
+        (_, elapsed) = measure(readProperties, loaded.Roots())
+        timings["properties"].append(elapsed)
+
+        (_, elapsed) = measure(readAccessors, loaded)
+        timings["accessors"].append(elapsed)
+
+        del loaded
+
+    peaks = {"save": measurePeak(cast.save, path),
+             "load": measurePeak(Cast.load, path)}
+
+    size = os.path.getsize(path)
+    megabytes = size / (1024.0 * 1024.0)
+
+    report["bytes"] = size
+
+    for (phase, values) in timings.items():
+        best = min(values)
+
+        report["%s_s" % phase] = best
+        report["%s_nodes_per_s" % phase] = nodes / best if best > 0 else 0.0
+
+        if phase in ("save", "load"):
+            report["%s_mb_per_s" % phase] = megabytes / best if best > 0 else 0.0
+            report["%s_peak_mb" % phase] = peaks[phase] / (1024.0 * 1024.0)
+
+    os.remove(path)
+
+    return report
+
+
+def compareBaseline(reports, baseline, tolerance):
+    # Timings and peak memory are compared, throughput follows from the timings and counts describe the scenario.
+    previous = dict((x["scenario"], x) for x in baseline.get("results", []))
+    regressions = []
+
+    for report in reports:
+        old = previous.get(report["scenario"])
+
+        if old is None:
+            continue
+
+        for (key, value) in sorted(report.items()):
+            measured = (key.endswith("_s") and not key.endswith("_per_s")) or key.endswith("_peak_mb")
+
+            # Building the scene only measures the generator, not cast.
+            if not measured or key == "build_s" or key not in old:
+                continue
+
+            if value > old[key] * (1.0 + tolerance):
+                regressions.append("%s %s: %.3f, baseline %.3f (+%.0f%%)" %
+                                   (report["scenario"], key, value, old[key],
+                                    (value / old[key] - 1.0) * 100.0 if old[key] > 0 else float("inf")))
+
+    return regressions
+
+
+scenarios = {
+    "mesh": buildMeshScene,
+    "skeleton": buildSkeletonScene,
+    "animation": buildAnimationScene,
+    "hair": buildHairScene,
+    "instances": buildInstanceScene,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cast.py load, save, and accessors on generated scenes.")
+    parser.add_argument("scenarios", nargs="*",
+                        help="scenarios to run (%s), defaults to all of them" % ", ".join(sorted(scenarios.keys())))
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiplier for the size of each generated scene")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of times to run each measurement, the best is reported")
+    parser.add_argument("--json", help="write the results to this file as json")
+    parser.add_argument("--baseline",
+                        help="compare against results previously written with --json, failing on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fraction a measurement may exceed the baseline by before it counts as a regression")
+
+    args = parser.parse_args(argv)
+    reports = []
+
+    for name in args.scenarios:
+        if name not in scenarios:
+            parser.error("unknown scenario: %s" % name)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.scenarios or sorted(scenarios.keys()):
+            report = runScenario(name, scenarios[name], args.scale,
+                                 max(1, args.repeat), directory)
+            reports.append(report)
+
+            print("%-10s %9d nodes %10.2f MB | save %7.3fs %8.2f MB/s %7.1f MB peak | load %7.3fs %8.2f MB/s %7.1f MB peak | "
+                  "properties %7.3fs | accessors %7.3fs" %
+                  (name, report["nodes"], report["bytes"] / (1024.0 * 1024.0),
+                   report["save_s"], report["save_mb_per_s"], report["save_peak_mb"],
+                   report["load_s"], report["load_mb_per_s"], report["load_peak_mb"],
+                   report["properties_s"], report["accessors_s"]))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"python": sys.version, "scale": args.scale, "results": reports},
+                      file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+
+        if baseline.get("scale") != args.scale:
+            print("warning: baseline was measured at scale %s, not %s" %
+                  (baseline.get("scale"), args.scale))
+
+        regressions = compareBaseline(reports, baseline, args.tolerance)
+
+        for regression in regressions:
+            print("regression: %s" % regression)
+
+        if regressions:
+            return 1
+
+        print("no regressions against %s (tolerance %.0f%%)" %
+              (args.baseline, args.tolerance * 100.0))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
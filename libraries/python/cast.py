@@ -1,8 +1,18 @@
+import os
+import sys
+import json
+import pickle
+import time
 import struct
 import itertools
 
 castHashBase = 0x534E495752545250
 
+# The active profiler, when one has been started.
+castProfiler = None
+
+castClock = getattr(time, "perf_counter", time.time)
+
 
 def castNextHash():
     global castHashBase
@@ -14,6 +24,9 @@ def castNextHash():
 
 
 def castTypeForMaximum(values):
+    if len(values) == 0:
+        return "b"
+
     maximum = max(values)
 
     if maximum <= 0xFF:
@@ -24,6 +37,14 @@ def castTypeForMaximum(values):
         return "i"
 
 
+def castRemoveDegenerateFaces(faces):
+    # Compacts in one pass, faces that use a vertex more than once have no area.
+    triangles = [x for x in zip(faces[0::3], faces[1::3], faces[2::3])
+                 if x[0] != x[1] and x[0] != x[2] and x[1] != x[2]]
+
+    return (list(itertools.chain.from_iterable(triangles)), int(len(faces) / 3) - len(triangles))
+
+
 class CastString_t(object):
     __slots__ = ("value")
 
@@ -237,10 +258,14 @@ class CastNode(object):
         return child
 
     @staticmethod
-    def load(file):
-        """Loads a cast node from the given file."""
+    def load(file, skip=None):
+        """Loads a cast node from the given file, skipping over nodes with identifiers in skip."""
         header = struct.unpack("IIQII", file.read(0x18))
 
+        if skip is not None and header[0] in skip:
+            file.seek(header[1] - 0x18, 1)
+            return None
+
         if header[0] in typeSwitcher:
             node = typeSwitcher[header[0]]()
         else:
@@ -254,8 +279,13 @@ class CastNode(object):
             prop = CastProperty(file)
             node.properties[prop.name] = prop
         for i in range(header[4]):
-            node.childNodes[i] = CastNode.load(file)
-            node.childNodes[i].parentNode = node
+            node.childNodes[i] = CastNode.load(file, skip)
+
+            if node.childNodes[i] is not None:
+                node.childNodes[i].parentNode = node
+
+        if skip is not None:
+            node.childNodes = [x for x in node.childNodes if x is not None]
 
         return node
 
@@ -726,6 +756,19 @@ class Mesh(CastNode):
         self.CreateProperty("f",
                             castTypeForMaximum(values)).values = list(values)
 
+    def RemoveDegenerateFaces(self):
+        """Removes faces that use the same vertex more than once, returning the number removed."""
+        f = self.properties.get("f")
+        if f is None:
+            return 0
+
+        (faces, removed) = castRemoveDegenerateFaces(f.values)
+
+        if removed > 0:
+            f.values = faces
+
+        return removed
+
     def VertexPositionBuffer(self):
         """The collection of vertex positions for this mesh."""
         vp = self.properties.get("vp")
@@ -1594,6 +1637,189 @@ typeSwitcher = {
 }
 
 
+def castPeakMemory():
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # Linux reports kilobytes, macOS reports bytes.
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+
+    try:
+        import ctypes
+        import ctypes.wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", ctypes.wintypes.DWORD),
+                        ("PageFaultCount", ctypes.wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t),
+                        ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t),
+                        ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+
+        if ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                    ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    except (ImportError, AttributeError, OSError):
+        pass
+
+    return None
+
+
+def castCountNodes(nodes):
+    count = 0
+
+    for node in nodes:
+        count += 1 + castCountNodes(node.childNodes)
+
+    return count
+
+
+class CastProfilerPhase(object):
+    __slots__ = ("profiler", "name", "depth")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.depth = 0
+
+    def __enter__(self):
+        self.depth = len(self.profiler.stack)
+        self.profiler.begin(self.name)
+        return self
+
+    def __exit__(self, type, value, traceback):
+        # Phases begun inside this one are left open when an exception is raised through them.
+        while len(self.profiler.stack) > self.depth:
+            self.profiler.end()
+        return False
+
+
+class CastProfiler(object):
+    """Collects phase timings, counters, and peak memory while cast files are processed."""
+    __slots__ = ("name", "enabled", "phases", "counters", "stack", "startTime", "endTime", "startMemory")
+
+    def __init__(self, name="cast", enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self.phases = {}
+        self.counters = {}
+        self.stack = []
+        self.startTime = None
+        self.endTime = None
+        self.startMemory = None
+
+    def start(self):
+        """Starts profiling, and makes this the profiler used by cast file loads and saves."""
+        global castProfiler
+
+        if not self.enabled:
+            return self
+
+        self.startTime = castClock()
+        self.startMemory = castPeakMemory()
+
+        castProfiler = self
+        return self
+
+    def stop(self):
+        """Stops profiling, closing any phases that are still open."""
+        global castProfiler
+
+        if not self.enabled:
+            return self
+
+        while self.stack:
+            self.end()
+
+        self.endTime = castClock()
+
+        if castProfiler is self:
+            castProfiler = None
+
+        return self
+
+    def phase(self, name):
+        """Returns a context manager that times the given phase, nested under the current one."""
+        return CastProfilerPhase(self, name)
+
+    def begin(self, name):
+        """Begins timing the given phase, nested under the current one."""
+        if not self.enabled:
+            return
+
+        parent = self.stack[-1][0] if self.stack else None
+        path = name if parent is None else "%s/%s" % (parent, name)
+
+        self.stack.append((path, castClock()))
+
+    def end(self):
+        """Ends timing the current phase."""
+        if not self.enabled or not self.stack:
+            return
+
+        (path, start) = self.stack.pop()
+        phase = self.phases.get(path)
+
+        if phase is None:
+            phase = self.phases[path] = [0, 0.0]
+
+        phase[0] += 1
+        phase[1] += castClock() - start
+
+    def count(self, name, value=1):
+        """Adds the given value to a counter."""
+        if not self.enabled:
+            return
+
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self):
+        """Returns a structured report of everything collected so far."""
+        end = self.endTime if self.endTime is not None else castClock()
+        peak = castPeakMemory()
+
+        report = {
+            "name": self.name,
+            "seconds": (end - self.startTime) if self.startTime is not None else 0.0,
+            "phases": dict((path, {"calls": phase[0], "seconds": phase[1]})
+                           for (path, phase) in self.phases.items()),
+            "counters": dict(self.counters),
+        }
+
+        if peak is not None:
+            report["peak_memory_mb"] = peak / (1024.0 * 1024.0)
+
+            # The process peak is never reset, so a lower peak was reached before this started.
+            if self.startMemory is not None:
+                report["peak_memory_growth_mb"] = (peak - self.startMemory) / (1024.0 * 1024.0)
+
+        return report
+
+    def write(self, path=None):
+        """Writes the report as json to the given path, or prints it when there is no path."""
+        if not self.enabled:
+            return
+
+        report = json.dumps(self.report(), indent=2, sort_keys=True)
+
+        if path is None:
+            print(report)
+        else:
+            with open(path, "w") as file:
+                file.write(report)
+
+
 class Cast(object):
     """A cast file that holds a collection of cast nodes."""
     __slots__ = ("rootNodes")
@@ -1612,8 +1838,8 @@ class Cast(object):
         return root
 
     @staticmethod
-    def load(path):
-        """Loads a cast file from the given path."""
+    def load(path, skip=None):
+        """Loads a cast file from the given path, skipping over nodes with identifiers in skip."""
         try:
             file = open(path, "rb")
         except IOError:
@@ -1623,11 +1849,25 @@ class Cast(object):
         if header[0] != 0x74736163:
             raise Exception("Invalid cast file magic")
 
+        profiler = castProfiler
+
+        if profiler is not None:
+            profiler.begin("load")
+
         cast = Cast()
         cast.rootNodes = [None] * header[2]
 
         for i in range(header[2]):
-            cast.rootNodes[i] = CastNode.load(file)
+            cast.rootNodes[i] = CastNode.load(file, skip)
+
+        if skip is not None:
+            cast.rootNodes = [x for x in cast.rootNodes if x is not None]
+
+        if profiler is not None:
+            profiler.end()
+            profiler.count("load.files")
+            profiler.count("load.bytes", file.tell())
+            profiler.count("load.nodes", castCountNodes(cast.rootNodes))
 
         return cast
 
@@ -1644,5 +1884,329 @@ class Cast(object):
                                len(self.rootNodes),
                                0))
 
+        profiler = castProfiler
+
+        if profiler is not None:
+            profiler.begin("save")
+
         for rootNode in self.rootNodes:
             rootNode.save(file)
+
+        if profiler is not None:
+            profiler.end()
+            profiler.count("save.files")
+            profiler.count("save.bytes", file.tell())
+            profiler.count("save.nodes", castCountNodes(self.rootNodes))
+
+
+def castLoadPickled(path):
+    # Worker processes hand back the pickled cast, so the caller can keep the bytes without pickling it again.
+    return pickle.dumps(Cast.load(path), pickle.HIGHEST_PROTOCOL)
+
+
+# Node type names, as used on the command line.
+castNodeTypeNames = dict((value.__name__.lower(), key)
+                         for (key, value) in typeSwitcher.items() if key is not None)
+
+# Integer properties that are sized to their maximum value when written, which can be narrowed safely.
+castNarrowableProperties = {
+    Mesh: ("f", "wb"),
+    Hair: ("se",),
+    BlendShape: ("vi",),
+    Curve: ("kb",),
+    NotificationTrack: ("kb",),
+}
+
+
+def castSkipProperty(file):
+    header = struct.unpack("2sHI", file.read(0x8))
+    type = CastProperty_t(header[0].decode("utf-8").strip('\0'))
+
+    file.seek(header[1], 1)
+
+    if type.size == 0 and type.fmt == "s":
+        CastString_t(file)
+    else:
+        file.seek(type.size * header[2], 1)
+
+
+def castScanNode(file, counts):
+    start = file.tell()
+    header = struct.unpack("IIQII", file.read(0x18))
+
+    name = typeSwitcher.get(header[0], CastNode).__name__
+    counts[name] = counts.get(name, 0) + 1
+
+    for i in range(header[3]):
+        castSkipProperty(file)
+    for i in range(header[4]):
+        castScanNode(file, counts)
+
+    # Every node must end exactly where its size says it does.
+    if file.tell() - start != header[1]:
+        raise Exception("Node size mismatch at offset 0x%X: expected 0x%X bytes, read 0x%X" %
+                        (start, header[1], file.tell() - start))
+
+
+def castScanFile(path):
+    with open(path, "rb") as file:
+        header = struct.unpack("IIII", file.read(0x10))
+
+        if header[0] != 0x74736163:
+            raise Exception("Invalid cast file magic")
+
+        counts = {}
+
+        for i in range(header[2]):
+            castScanNode(file, counts)
+
+        if file.read(1):
+            raise Exception("Unexpected data after the last root node")
+
+    return (header, counts)
+
+
+def castNarrowNode(node):
+    for name in castNarrowableProperties.get(node.__class__, ()):
+        property = node.properties.get(name)
+
+        if property is None or not property.values or property.type.fmt not in ("B", "H", "I"):
+            continue
+
+        property.type = CastProperty_t(castTypeForMaximum(property.values))
+
+    for child in node.childNodes:
+        castNarrowNode(child)
+
+
+def castRemoveDegenerateMeshFaces(node):
+    if node.__class__ is Mesh:
+        node.RemoveDegenerateFaces()
+
+    for child in node.childNodes:
+        castRemoveDegenerateMeshFaces(child)
+
+
+def castRemoveUnusedMaterials(node):
+    if node.__class__ is Model:
+        used = set()
+
+        for child in node.childNodes:
+            if child.__class__ is Mesh or child.__class__ is Hair:
+                material = child.properties.get("m")
+
+                if material is not None:
+                    used.add(material.values[0])
+
+        node.childNodes = [x for x in node.childNodes
+                           if x.__class__ is not Material or x.hash in used]
+
+    for child in node.childNodes:
+        castRemoveUnusedMaterials(child)
+
+
+def castDumpNode(node, depth, maximumValues, lines):
+    indent = "  " * depth
+
+    lines.append("%s%s (0x%016X)" % (indent, node.__class__.__name__, node.hash))
+
+    for property in node.properties.values():
+        values = list(property.values[:maximumValues])
+        more = len(property.values) - len(values)
+
+        lines.append("%s  - %s [%s x%d]: %s%s" % (indent,
+                                                  property.name,
+                                                  property.type.identifier,
+                                                  len(property.values) // property.type.array,
+                                                  ", ".join(str(x) for x in values),
+                                                  " ... (+%d)" % more if more > 0 else ""))
+
+    for child in node.childNodes:
+        castDumpNode(child, depth + 1, maximumValues, lines)
+
+
+def castCollectFiles(paths):
+    files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            for (directory, _, names) in os.walk(path):
+                for name in sorted(names):
+                    if name.lower().endswith(".cast"):
+                        files.append((path, os.path.join(directory, name)))
+        else:
+            files.append((None, path))
+
+    return files
+
+
+def castOutputPath(args, base, path, count):
+    if args.in_place:
+        return path
+    if count == 1 and base is None:
+        return args.output
+
+    # Multiple inputs are mirrored into the output directory.
+    if base is None:
+        return os.path.join(args.output, os.path.basename(path))
+
+    return os.path.join(args.output, os.path.relpath(path, base))
+
+
+def castRunFile(command, options, path, output):
+    if command == "info":
+        (header, counts) = castScanFile(path)
+
+        lines = ["%s: %d bytes, version %d, %d root(s)" %
+                 (path, os.path.getsize(path), header[1], header[2])]
+        lines.extend("  %s: %d" % (name, count)
+                     for (name, count) in sorted(counts.items()))
+
+        return "\n".join(lines)
+    elif command == "validate":
+        castScanFile(path)
+        Cast.load(path)
+
+        return "%s: ok" % path
+
+    size = os.path.getsize(path)
+    skip = None
+
+    if command == "strip":
+        skip = set(castNodeTypeNames[x] for x in options["types"])
+
+    cast = Cast.load(path, skip)
+
+    if command == "optimize":
+        for root in cast.rootNodes:
+            castRemoveUnusedMaterials(root)
+            castRemoveDegenerateMeshFaces(root)
+    if command in ("compress", "optimize"):
+        for root in cast.rootNodes:
+            castNarrowNode(root)
+
+    directory = os.path.dirname(output)
+
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    cast.save(output)
+
+    return "%s: %d -> %d bytes" % (path, size, os.path.getsize(output))
+
+
+def castRunFiles(args, command, options):
+    files = castCollectFiles(args.paths)
+
+    if command not in ("info", "validate"):
+        if not args.in_place and not args.output:
+            raise Exception("Either --output or --in-place is required")
+
+    jobs = []
+
+    for (base, path) in files:
+        if command in ("info", "validate"):
+            jobs.append((command, options, path, None))
+        else:
+            jobs.append((command, options, path,
+                         castOutputPath(args, base, path, len(files))))
+
+    failed = 0
+
+    if args.jobs > 1 and len(jobs) > 1:
+        import concurrent.futures
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [pool.submit(castRunFile, *job) for job in jobs]
+            results = []
+
+            for (job, future) in zip(jobs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append("%s: error: %s" % (job[2], e))
+                    failed += 1
+    else:
+        results = []
+
+        for job in jobs:
+            try:
+                results.append(castRunFile(*job))
+            except Exception as e:
+                results.append("%s: error: %s" % (job[2], e))
+                failed += 1
+
+    for result in results:
+        print(result)
+
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="cast",
+                                     description="Inspect and process cast files without a 3d package.")
+    commands = parser.add_subparsers(dest="command")
+
+    for (name, help) in [("info", "print a summary of each file, without decoding any properties"),
+                         ("validate", "check that each file is well formed"),
+                         ("strip", "remove every node of the given types"),
+                         ("compress", "store integer buffers in the smallest type that fits"),
+                         ("optimize", "compress, and remove degenerate faces and materials that are never used")]:
+        command = commands.add_parser(name, help=help)
+        command.add_argument("paths", nargs="+",
+                             help="cast files, or directories to search for cast files")
+        command.add_argument("-j", "--jobs", type=int, default=1,
+                             help="number of files to process in parallel")
+
+        if name == "strip":
+            command.add_argument("-t", "--type", dest="types", action="append", required=True,
+                                 choices=sorted(castNodeTypeNames.keys()),
+                                 help="node type to remove, may be given more than once")
+        if name not in ("info", "validate"):
+            command.add_argument("-o", "--output",
+                                 help="output file, or directory when there are multiple inputs")
+            command.add_argument("--in-place", action="store_true",
+                                 help="overwrite the input files")
+
+    dump = commands.add_parser("dump", help="print every node and property of a file")
+    dump.add_argument("path", help="cast file")
+    dump.add_argument("--values", type=int, default=8,
+                      help="maximum number of values to print for each property")
+
+    merge = commands.add_parser("merge", help="combine the root nodes of several files into one")
+    merge.add_argument("output", help="output cast file")
+    merge.add_argument("inputs", nargs="+", help="cast files to merge")
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "dump":
+            lines = []
+
+            for root in Cast.load(args.path).Roots():
+                castDumpNode(root, 0, args.values, lines)
+
+            print("\n".join(lines))
+            return 0
+        elif args.command == "merge":
+            cast = Cast()
+
+            for path in args.inputs:
+                cast.rootNodes.extend(Cast.load(path).Roots())
+
+            cast.save(args.output)
+            return 0
+        elif args.command is not None:
+            return castRunFiles(args, args.command, {"types": getattr(args, "types", None)})
+    except Exception as e:
+        print("error: %s" % e)
+        return 1
+
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
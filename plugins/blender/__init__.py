@@ -84,6 +84,14 @@ class ImportCast(bpy.types.Operator, ImportHelper):
     import_merge: BoolProperty(name="Import Merge",
                                description="Imports and merges models together with the selected armature")
 
+    import_share_meshes: BoolProperty(name="Share Mesh Data",
+                                      description="Identical meshes use one linked mesh data-block, editing one mesh edits every copy of it",
+                                      default=False)
+
+    import_profile: BoolProperty(name="Profile Import",
+                                 description="Prints a report of where the import spent its time to the system console",
+                                 default=False)
+
     create_hair_type: EnumProperty(name="Type",
                                    description="Change the way hair definitions are imported",
                                    items=[("curve", "Create Curve Hairs", "Creates hairs as curves"),
@@ -106,6 +114,8 @@ class ImportCast(bpy.types.Operator, ImportHelper):
         self.layout.prop(self, "import_blend_shapes")
         self.layout.prop(self, "import_hair")
         self.layout.prop(self, "import_merge")
+        self.layout.prop(self, "import_share_meshes")
+        self.layout.prop(self, "import_profile")
 
         self.layout.separator_spacer()
 
@@ -206,6 +216,18 @@ class ExportCast(bpy.types.Operator, ExportHelper):
                          description="Apply a scale modifier to any meshes, bones, or animation data",
                          default=1.0)
 
+    split_seams: BoolProperty(name="Split Seams",
+                              description="Split vertices along uv, normal, and color seams instead of averaging them",
+                              default=False)
+
+    batch_mode: EnumProperty(name="Batch",
+                             description="Export one cast file per action, armature, or collection, next to the chosen file",
+                             items=[("none", "None", "Export everything to a single cast file"),
+                                    ("action", "Per Action", "Export one cast file for each action"),
+                                    ("armature", "Per Armature", "Export one cast file for each armature, with its meshes and action"),
+                                    ("collection", "Per Collection", "Export one cast file for each collection")],
+                             default="none")
+
     up_axis: EnumProperty(name="Up",
                           description="Override the up axis for this scene",
                           items=[("y", "Y Up", "The Y axis points up"),
@@ -220,6 +242,8 @@ class ExportCast(bpy.types.Operator, ExportHelper):
         self.layout.prop(self, "incl_notetracks")
         self.layout.prop(self, "is_looped")
         self.layout.prop(self, "scale")
+        self.layout.prop(self, "split_seams")
+        self.layout.prop(self, "batch_mode")
         self.layout.prop(self, "up_axis")
 
     def execute(self, context):
@@ -1,14 +1,17 @@
 import bpy
-import bmesh
 import os
+import numpy
+import concurrent.futures
 
 from bpy_extras.wm_utils.progress_report import ProgressReport
 from mathutils import *
-from .cast import Cast, CastColor
-from .shared_cast import utilityIsVersionAtLeast
+from .cast import Cast, CastColor, Model, Animation
+from .shared_cast import utilityIsVersionAtLeast, utilityCreateCastPool
 
 # Minimum weight value to be considered.
 WEIGHT_THRESHOLD = 0.000001
+# Minimum distance a shape key vertex must move from the basis to be considered.
+SHAPE_THRESHOLD = 0.000001
 
 
 def utilityResolveObjectTarget(objects, path):
@@ -21,22 +24,46 @@ def utilityResolveObjectTarget(objects, path):
     return None
 
 
-def utilityGetSimpleKeyValue(object, property):
-    if property == "location":
-        if object.parent is not None:
-            return object.parent.matrix.inverted() @ object.matrix.translation
-        else:
-            return object.matrix.translation
-    elif property == "scale":
-        return object.scale
-    return None
+def utilityGetPoseBoneIndex(poseBone):
+    return poseBone.id_data.pose.bones.find(poseBone.name)
 
 
-def utilityGetQuatKeyValue(object):
-    if object.parent is not None:
-        return (object.parent.matrix.to_3x3().inverted() @ object.matrix.to_3x3()).to_quaternion()
-    else:
-        return object.matrix.to_quaternion()
+def utilityMatricesToQuats(matrices):
+    # Matches Matrix.to_quaternion, which normalizes the axes before converting.
+    matrices = matrices / numpy.maximum(numpy.linalg.norm(matrices, axis=1, keepdims=True),
+                                        1e-12)
+
+    m00 = matrices[:, 0, 0]
+    m11 = matrices[:, 1, 1]
+    m22 = matrices[:, 2, 2]
+
+    # Pick the most stable branch per matrix, from the largest of w, x, y, and z.
+    candidates = numpy.stack((1.0 + m00 + m11 + m22,
+                              1.0 + m00 - m11 - m22,
+                              1.0 - m00 + m11 - m22,
+                              1.0 - m00 - m11 + m22), axis=1)
+    branch = numpy.argmax(candidates, axis=1)
+    root = numpy.sqrt(numpy.maximum(candidates[numpy.arange(len(branch)), branch], 1e-12)) * 2.0
+
+    m01 = matrices[:, 0, 1]
+    m02 = matrices[:, 0, 2]
+    m10 = matrices[:, 1, 0]
+    m12 = matrices[:, 1, 2]
+    m20 = matrices[:, 2, 0]
+    m21 = matrices[:, 2, 1]
+
+    quats = numpy.empty((len(matrices), 4), dtype=numpy.float64)
+
+    # Columns are (x, y, z, w), which is the order cast stores quaternions in.
+    quats[:, 0] = numpy.choose(branch, (m21 - m12, 0.25 * root * root, m01 + m10, m02 + m20)) / root
+    quats[:, 1] = numpy.choose(branch, (m02 - m20, m01 + m10, 0.25 * root * root, m12 + m21)) / root
+    quats[:, 2] = numpy.choose(branch, (m10 - m01, m02 + m20, m12 + m21, 0.25 * root * root)) / root
+    quats[:, 3] = numpy.choose(branch, (0.25 * root * root, m21 - m12, m02 - m20, m10 - m01)) / root
+
+    # Keep w positive so the same rotation always produces the same quaternion.
+    quats[quats[:, 3] < 0.0] *= -1.0
+
+    return quats
 
 
 def utilityGetActionCurves(action):
@@ -98,6 +125,152 @@ def utilityAssignMaterialSlots(material, matNode, filepath):
                         matNode.SetSlot(slots[connection], file.Hash())
 
 
+def utilityGetUVLayers(mesh):
+    uvLayers = []
+
+    # Collect the uv layers for this mesh, making the active the first.
+    if mesh.uv_layers.active is not None:
+        uvLayers.append(mesh.uv_layers.active)
+
+        # Add the other layers after the active one.
+        for layer in mesh.uv_layers:
+            if layer != uvLayers[0]:
+                uvLayers.append(layer)
+
+    return uvLayers
+
+
+def utilityGetColorLayer(mesh):
+    activeColor = mesh.color_attributes.active_color
+
+    # We only support one color layer, prefer per-vertex float colors over byte and per-face colors.
+    for domain in ["POINT", "CORNER"]:
+        for dataType in ["FLOAT_COLOR", "BYTE_COLOR"]:
+            layers = [x for x in mesh.color_attributes
+                      if x.domain == domain and x.data_type == dataType]
+
+            if not layers:
+                continue
+            if activeColor is not None and activeColor.name in [x.name for x in layers]:
+                return mesh.color_attributes[activeColor.name]
+
+            return layers[0]
+
+    return None
+
+
+def utilityGetVectorBuffer(collection, property, size):
+    buffer = numpy.empty(len(collection) * size, dtype=numpy.float32)
+    collection.foreach_get(property, buffer)
+
+    return buffer.reshape(-1, size)
+
+
+def utilityGetLoopNormals(mesh):
+    if utilityIsVersionAtLeast(4, 1):
+        return utilityGetVectorBuffer(mesh.corner_normals, "vector", 3)
+
+    mesh.calc_normals_split()
+
+    return utilityGetVectorBuffer(mesh.loops, "normal", 3)
+
+
+def utilitySplitLoopVertices(loopVertices, loopData):
+    # Each loop is keyed by its vertex and the raw bits of its data, so corners only merge when they match exactly.
+    keys = numpy.empty((len(loopVertices), 1 + sum(x.shape[1] for x in loopData)),
+                       dtype=numpy.float32)
+    keys[:, 0] = loopVertices.astype(numpy.int32).view(numpy.float32)
+
+    column = 1
+
+    for data in loopData:
+        keys[:, column:column + data.shape[1]] = data
+        column += data.shape[1]
+
+    keys = keys.view(numpy.dtype((numpy.void, keys.shape[1] * keys.itemsize))).ravel()
+
+    (_, sourceLoops, inverse) = numpy.unique(keys,
+                                             return_index=True,
+                                             return_inverse=True)
+
+    # Keep the new vertices in the order they're first used by a loop.
+    order = numpy.argsort(sourceLoops, kind="stable")
+    rank = numpy.empty(len(order), dtype=numpy.int64)
+    rank[order] = numpy.arange(len(order))
+
+    return (sourceLoops[order], rank[inverse.ravel()])
+
+
+def utilityAverageLoopData(loopVertices, loopData, vertexCount):
+    counts = numpy.bincount(loopVertices, minlength=vertexCount)
+    counts = numpy.maximum(counts, 1)
+
+    average = numpy.empty((vertexCount, loopData.shape[1]), dtype=numpy.float64)
+
+    for i in range(loopData.shape[1]):
+        average[:, i] = numpy.bincount(loopVertices,
+                                       weights=loopData[:, i],
+                                       minlength=vertexCount) / counts
+
+    return average
+
+
+def utilityPackColors(colors):
+    # Matches CastColor.toInteger, which clamps and truncates each rgba channel to a byte.
+    bytes = numpy.clip(colors * 255.0, 0.0, 255.0).astype(numpy.uint8)
+
+    return numpy.ascontiguousarray(bytes).view("<u4").ravel()
+
+
+def utilityGetVertexWeights(mesh, boneToIndex):
+    vertexCount = len(mesh.data.vertices)
+
+    # Deform weights aren't exposed in bulk, so gather them in one pass, and build the buffers from that.
+    weights = [(vertex.index, group.group, group.weight)
+               for vertex in mesh.data.vertices for group in vertex.groups]
+
+    if not weights:
+        return (0, None, None)
+
+    weights = numpy.array(weights, dtype=numpy.float64)
+
+    vertices = weights[:, 0].astype(numpy.int64)
+    groups = weights[:, 1].astype(numpy.int64)
+    values = weights[:, 2]
+
+    # Groups that aren't bones in this model can't be exported.
+    groupToBone = numpy.array([boneToIndex.get(x.name, -1) for x in mesh.vertex_groups],
+                              dtype=numpy.int64)
+    bones = groupToBone[groups]
+
+    keep = (values > WEIGHT_THRESHOLD) & (bones >= 0)
+
+    vertices = vertices[keep]
+    bones = bones[keep]
+    values = values[keep]
+
+    if len(vertices) == 0:
+        return (0, None, None)
+
+    # Weights are gathered in vertex order, so each weight's slot is its offset from the vertex's first weight.
+    counts = numpy.bincount(vertices, minlength=vertexCount)
+    maximumInfluence = int(counts.max())
+
+    starts = numpy.cumsum(counts) - counts
+    slots = numpy.arange(len(vertices)) - starts[vertices]
+    indices = (vertices * maximumInfluence) + slots
+
+    vertexWeightValueBuffer = numpy.zeros(vertexCount * maximumInfluence,
+                                          dtype=numpy.float64)
+    vertexWeightBoneBuffer = numpy.zeros(vertexCount * maximumInfluence,
+                                         dtype=numpy.int64)
+
+    vertexWeightValueBuffer[indices] = values
+    vertexWeightBoneBuffer[indices] = bones
+
+    return (maximumInfluence, vertexWeightBoneBuffer, vertexWeightValueBuffer)
+
+
 def exportModel(self, context, root, armatureOrMesh, filepath):
     model = root.CreateModel()
     model.SetName(armatureOrMesh.name)
@@ -192,183 +365,146 @@ def exportModel(self, context, root, armatureOrMesh, filepath):
             if len(deformers) > 0 and deformers[0].use_deform_preserve_volume:
                 meshNode.SetSkinningMethod("quaternion")
 
-            blendMesh = bmesh.new(use_operators=False)
-            blendMesh.from_mesh(mesh.data,
-                                face_normals=False,
-                                vertex_normals=True,
-                                use_shape_key=False,
-                                shape_key_index=0)
+            meshData = mesh.data
+            vertexCount = len(meshData.vertices)
+
+            # Pull everything we need out of the mesh in bulk, and build the buffers from that.
+            vertexPositions = utilityGetVectorBuffer(meshData.vertices, "co", 3) * self.scale
+            vertexNormals = utilityGetVectorBuffer(meshData.vertices, "normal", 3)
 
-            vertexPositions = [None] * len(blendMesh.verts)
-            vertexNormals = [None] * len(blendMesh.verts)
+            # Blender's int properties are 32 bit, any other buffer type makes foreach_get copy item by item.
+            loopVertices = numpy.empty(len(meshData.loops), dtype=numpy.int32)
+            meshData.loops.foreach_get("vertex_index", loopVertices)
 
-            uvLayers = []
-            colors = []
+            # Automatically converts n-gons to triangle faces.
+            meshData.calc_loop_triangles()
 
-            # Collect the uv layers for this mesh, making the active the first.
-            if blendMesh.loops.layers.uv.active is not None:
-                uvLayers.append(blendMesh.loops.layers.uv.active)
+            triangleLoops = numpy.empty(len(meshData.loop_triangles) * 3, dtype=numpy.int32)
+            meshData.loop_triangles.foreach_get("loops", triangleLoops)
 
-                # Add the other layers after the active one.
-                for layer in blendMesh.loops.layers.uv.values():
-                    if layer != uvLayers[0]:
-                        uvLayers.append(layer)
+            loopUVLayers = [utilityGetVectorBuffer(x.data, "uv", 2)
+                            for x in utilityGetUVLayers(meshData)]
 
-            vertexUVLayers = [[None] * len(blendMesh.verts) for _ in uvLayers]
+            # Per-vert colors are kept per-vert, per-face colors are per loop.
+            colorLayer = utilityGetColorLayer(meshData)
 
-            # Collect the color layer for this mesh, we only support one, the active one.
-            if blendMesh.verts.layers.float_color.active is not None:
-                colors.append(blendMesh.verts.layers.float_color.active)
-            elif blendMesh.verts.layers.color.active is not None:
-                colors.append(blendMesh.verts.layers.color.active)
-            elif blendMesh.loops.layers.float_color.active is not None:
-                colors.append(blendMesh.loops.layers.float_color.active)
-            elif blendMesh.loops.layers.color.active is not None:
-                colors.append(blendMesh.loops.layers.color.active)
+            if colorLayer is not None:
+                colors = utilityGetVectorBuffer(colorLayer.data, "color", 4)
+                isLoopColor = colorLayer.domain == "CORNER"
+            else:
+                colors = None
+                isLoopColor = False
 
-            vertexColorLayers = [[None] * len(blendMesh.verts) for _ in colors]
-            vertexMaxInfluence = 0
+            (vertexMaxInfluence,
+             vertexWeightBoneBuffer,
+             vertexWeightValueBuffer) = utilityGetVertexWeights(mesh, boneToIndex)
 
-            for i, vert in enumerate(blendMesh.verts):
-                vertexPositions[i] = (vert.co.x * self.scale,
-                                      vert.co.y * self.scale,
-                                      vert.co.z * self.scale)
-                vertexNormals[i] = (vert.normal.x,
-                                    vert.normal.y,
-                                    vert.normal.z)
+            if self.split_seams:
+                # Emit one vertex for every unique corner, so uv, normal, and color seams are preserved.
+                loopNormals = utilityGetLoopNormals(meshData)
+                loopColorLayers = []
 
-                vertexLoopCount = len(vert.link_loops)
+                if colors is not None:
+                    loopColorLayers.append(
+                        colors if isLoopColor else colors[loopVertices])
 
-                # Calculate the maximum influence for this vertex.
-                influence = 0
+                (sourceLoops, loopToVertex) = \
+                    utilitySplitLoopVertices(loopVertices,
+                                             [loopNormals] + loopUVLayers + loopColorLayers)
 
-                if blendMesh.verts.layers.deform.active is not None:
-                    for weight in vert[blendMesh.verts.layers.deform.active].values():
-                        if weight > WEIGHT_THRESHOLD:
-                            influence += 1
+                sourceVertices = loopVertices[sourceLoops]
 
-                vertexMaxInfluence = max(vertexMaxInfluence, influence)
+                vertexPositions = vertexPositions[sourceVertices]
+                vertexNormals = loopNormals[sourceLoops]
+                vertexUVLayers = [x[sourceLoops] for x in loopUVLayers]
+                vertexColorLayers = [x[sourceLoops] for x in loopColorLayers]
 
-                # Calculate the average uv coords for each face that shares this vertex.
-                for uvLayer, uvLayerLoop in enumerate(uvLayers):
-                    uv = Vector((0.0, 0.0))
+                if vertexMaxInfluence > 0:
+                    vertexWeightBoneBuffer = \
+                        vertexWeightBoneBuffer.reshape(vertexCount, -1)[sourceVertices].ravel()
+                    vertexWeightValueBuffer = \
+                        vertexWeightValueBuffer.reshape(vertexCount, -1)[sourceVertices].ravel()
 
-                    for loop in vert.link_loops:
-                        uv += loop[uvLayerLoop].uv / vertexLoopCount
+                faceVertices = loopToVertex[triangleLoops]
+            else:
+                sourceVertices = None
 
-                    vertexUVLayers[uvLayer][i] = (uv.x, 1.0 - uv.y)
+                # Calculate the average uv coords for each face that shares a vertex.
+                vertexUVLayers = [utilityAverageLoopData(loopVertices, x, vertexCount)
+                                  for x in loopUVLayers]
+                vertexColorLayers = []
 
                 # Calculate per-vert/per-face vertex colors.
-                if blendMesh.verts.layers.float_color.active is not None \
-                        or blendMesh.verts.layers.color.active is not None:
-                    color = vert[colors[0]]
-
-                    vertexColorLayers[0][i] = CastColor.toInteger(
-                        (color.x, color.y, color.z, color.w))
-                elif blendMesh.loops.layers.float_color.active is not None \
-                        or blendMesh.loops.layers.color.active is not None:
-                    color = Vector((0.0, 0.0, 0.0, 0.0))
+                if colors is not None:
+                    if isLoopColor:
+                        colors = utilityAverageLoopData(loopVertices,
+                                                        colors,
+                                                        vertexCount)
 
-                    for loop in vert.link_loops:
-                        color += loop[colors[0]] / vertexLoopCount
+                    vertexColorLayers.append(colors)
 
-                    vertexColorLayers[0][i] = CastColor.toInteger((color.x,
-                                                                   color.y,
-                                                                   color.z,
-                                                                   color.w))
+                faceVertices = loopVertices[triangleLoops]
 
             if vertexMaxInfluence > 0:
-                vertexGroups = [x.name for x in mesh.vertex_groups]
-                vertexWeightValueBuffer = \
-                    [0.0] * (len(blendMesh.verts) * vertexMaxInfluence)
-                vertexWeightBoneBuffer = \
-                    [0] * (len(blendMesh.verts) * vertexMaxInfluence)
-
-                for i, vert in enumerate(blendMesh.verts):
-                    weights = vert[blendMesh.verts.layers.deform.active]
-                    slot = 0
-
-                    for vgroup, weight in weights.items():
-                        if weight > WEIGHT_THRESHOLD:
-                            vertexWeightValueBuffer[(
-                                i * vertexMaxInfluence) + slot] = weight
-                            vertexWeightBoneBuffer[(
-                                i * vertexMaxInfluence) + slot] = boneToIndex[vertexGroups[vgroup]]
-
-                            slot += 1
-
                 meshNode.SetMaximumWeightInfluence(vertexMaxInfluence)
-                meshNode.SetVertexWeightValueBuffer(vertexWeightValueBuffer)
-                meshNode.SetVertexWeightBoneBuffer(vertexWeightBoneBuffer)
+                meshNode.SetVertexWeightValueBuffer(vertexWeightValueBuffer.tolist())
+                meshNode.SetVertexWeightBoneBuffer(vertexWeightBoneBuffer.tolist())
 
-            meshNode.SetVertexPositionBuffer(vertexPositions)
-            meshNode.SetVertexNormalBuffer(vertexNormals)
+            meshNode.SetVertexPositionBuffer(vertexPositions.tolist())
+            meshNode.SetVertexNormalBuffer(vertexNormals.tolist())
 
             for uvLayer, vertexUVs in enumerate(vertexUVLayers):
-                meshNode.SetVertexUVLayerBuffer(uvLayer, vertexUVs)
+                vertexUVs = numpy.array(vertexUVs, dtype=numpy.float64)
+                vertexUVs[:, 1] = 1.0 - vertexUVs[:, 1]
+
+                meshNode.SetVertexUVLayerBuffer(uvLayer, vertexUVs.tolist())
 
             meshNode.SetUVLayerCount(len(vertexUVLayers))
 
             for colorLayer, vertexColors in enumerate(vertexColorLayers):
-                meshNode.SetVertexColorBuffer(colorLayer, vertexColors)
+                meshNode.SetVertexColorBuffer(colorLayer,
+                                              utilityPackColors(vertexColors).tolist())
 
             meshNode.SetColorLayerCount(len(vertexColorLayers))
 
-            # Automatically converts n-gons to triangle faces.
-            faceTris = blendMesh.calc_loop_triangles()
-            faceBuffer = [None] * (len(faceTris) * 3)
-
-            for i, face in enumerate(faceTris):
-                faceBuffer[(i * 3):(i * 3) + 3] = [face[2].vert.index,
-                                                   face[0].vert.index,
-                                                   face[1].vert.index]
+            # Remap face indices to match cast's winding order.
+            faceBuffer = faceVertices.reshape(-1, 3)[:, (2, 0, 1)].ravel().tolist()
 
             meshNode.SetFaceBuffer(faceBuffer)
 
-            blendMesh.free()
-
-            if mesh.data.shape_keys is not None:
-                shapeNode = model.CreateBlendShape()
-                shapeNode.SetName(mesh.data.shape_keys.name)
-                shapeNode.SetBaseShape(meshNode.Hash())
-
-                targetWeights = []
-                targetShapes = []
+            if meshData.shape_keys is not None:
+                shapeKeys = meshData.shape_keys
+                targets = [x for x in shapeKeys.key_blocks
+                           if x != shapeKeys.reference_key]
 
-                progress.enter_substeps(
-                    len(mesh.data.shape_keys.key_blocks) - 1)
+                basis = utilityGetVectorBuffer(shapeKeys.reference_key.data, "co", 3)
 
-                for i, target in [(i, x) for i, x in enumerate(mesh.data.shape_keys.key_blocks) if x != mesh.data.shape_keys.reference_key]:
-                    meshNode = model.CreateMesh()
-                    meshNode.SetName(target.name)
+                progress.enter_substeps(len(targets))
 
-                    blendMesh = bmesh.new(use_operators=False)
-                    blendMesh.from_mesh(mesh.data,
-                                        face_normals=False,
-                                        vertex_normals=True,
-                                        use_shape_key=True,
-                                        shape_key_index=i)
+                for target in targets:
+                    positions = utilityGetVectorBuffer(target.data, "co", 3)
 
-                    # Just set the new positions, which is the only supported blender operation at the moment.
-                    for i, vert in enumerate(blendMesh.verts):
-                        vertexPositions[i] = (vert.co.x * self.scale,
-                                              vert.co.y * self.scale,
-                                              vert.co.z * self.scale)
+                    # Only the vertices that actually move are stored in the target.
+                    moved = numpy.any(numpy.abs(positions - basis) > SHAPE_THRESHOLD,
+                                      axis=1)
 
-                    meshNode.SetVertexPositionBuffer(vertexPositions)
-                    meshNode.SetVertexNormalBuffer(vertexNormals)
-                    meshNode.SetFaceBuffer(faceBuffer)
-
-                    blendMesh.free()
-
-                    targetWeights.append(target.slider_max)
-                    targetShapes.append(meshNode.Hash())
+                    if sourceVertices is not None:
+                        indices = numpy.flatnonzero(moved[sourceVertices])
+                        positions = positions[sourceVertices[indices]]
+                    else:
+                        indices = numpy.flatnonzero(moved)
+                        positions = positions[indices]
 
                     progress.step()
 
-                if len(targetWeights) > 0:
-                    shapeNode.SetTargetWeightScales(targetWeights)
-                    shapeNode.SetTargetShapes(targetShapes)
+                    # Keys that don't move anything are still exported, rigs may drive them by name.
+                    shapeNode = model.CreateBlendShape()
+                    shapeNode.SetName(target.name)
+                    shapeNode.SetBaseShape(meshNode.Hash())
+                    shapeNode.SetTargetShapeVertexIndices(indices.tolist())
+                    shapeNode.SetTargetShapeVertexPositions(
+                        (positions * self.scale).tolist())
+                    shapeNode.SetTargetWeightScale(target.slider_max)
 
                 progress.leave_substeps()
 
@@ -377,201 +513,317 @@ def exportModel(self, context, root, armatureOrMesh, filepath):
         progress.leave_substeps()
 
 
-def exportAction(self, context, root, objects, action):
-    animation = root.CreateAnimation()
-    animation.SetName(action.name)
+def utilityResolveCachedTarget(targetCache, objects, path):
+    # Each data path is only resolved once against the objects, no matter how many actions use it.
+    if path not in targetCache:
+        targetCache[path] = utilityResolveObjectTarget(objects, path)
 
-    scene = bpy.context.scene
-    sceneFps = scene.render.fps / scene.render.fps_base
+    return targetCache[path]
+
+
+def utilityAssignAction(object, action):
+    if object.animation_data is None:
+        object.animation_data_create()
+
+    animationData = object.animation_data
+    previous = (animationData.action,
+                getattr(animationData, "action_slot", None))
+
+    animationData.action = action
+
+    return previous
 
-    animation.SetFramerate(sceneFps)
-    animation.SetLooping(self.is_looped)
 
+def utilityRestoreAction(object, previous):
+    (action, slot) = previous
+
+    object.animation_data.action = action
+
+    if slot is not None:
+        object.animation_data.action_slot = slot
+
+
+def utilityGatherActionCurves(animation, action, objects, targetCache):
     curves = {}
-    uniqueKeyframes = set()
     uniqueCurves = []
 
     # Grab the curves from the action based on the current slot if necessary.
     fcurves = utilityGetActionCurves(action)
 
-    with ProgressReport(context.window_manager) as progress:
-        progress.enter_substeps(len(fcurves))
+    # First pass will gather the curves we need to include in the animation and the properties they are keyed to.
+    # This is because for curves like rotation_quaternion, we need all of the curves in one cast curve.
+    for curve in fcurves:
+        result = utilityResolveCachedTarget(targetCache,
+                                            objects,
+                                            curve.data_path)
 
-        # First pass will gather the curves we need to include in the animation and the properties they are keyed to.
-        # This is because for curves like rotation_quaternion, we need all of the curves in one cast curve.
-        for curve in fcurves:
-            result = utilityResolveObjectTarget(objects, curve.data_path)
+        if result is None:
+            continue
+        else:
+            (object, target) = result
 
-            if result is None:
-                continue
-            else:
-                (object, target) = result
+        # Right now, only support bone keys. Eventually, we will also check for BlendShape keys, and visibility keys.
+        if type(target.data) != bpy.types.PoseBone:
+            continue
 
-            # Right now, only support bone keys. Eventually, we will also check for BlendShape keys, and visibility keys.
-            if type(target.data) != bpy.types.PoseBone:
+        poseBone = target.data
+
+        # Precompute a list of keyframes for export.
+        keyframes = [int(x.co[0]) for x in curve.keyframe_points]
+
+        if target == poseBone.location.owner:
+            result = curves.get(poseBone, [])
+            result.append((curve,
+                           "location",
+                           curve.array_index,
+                           keyframes))
+
+            curves[poseBone] = result
+        elif target == poseBone.rotation_quaternion.owner or target == poseBone.rotation_euler.owner:
+            result = curves.get(poseBone, [])
+            result.append((curve,
+                           "rotation_quaternion",
+                           curve.array_index,
+                           keyframes))
+
+            curves[poseBone] = result
+        elif target == poseBone.scale.owner:
+            result = curves.get(poseBone, [])
+            result.append((curve,
+                           "scale",
+                           curve.array_index,
+                           keyframes))
+
+            curves[poseBone] = result
+
+    for target, curves in curves.items():
+        # Quaternions are combined into their own curve.
+        rotationQuaternion = [
+            x for x in curves if x[1] == "rotation_quaternion"]
+
+        if rotationQuaternion:
+            curveNode = animation.CreateCurve()
+            curveNode.SetNodeName(target.name)
+            curveNode.SetKeyPropertyName("rq")
+            curveNode.SetMode("absolute")
+
+            keyframes = set()
+
+            for curve in rotationQuaternion:
+                keyframes.update(curve[3])
+
+            uniqueCurves.append((curveNode,
+                                 target,
+                                 "rotation_quaternion",
+                                 0,
+                                 keyframes))
+
+        for (curve, property, index, keyframes) in curves:
+            switcherProperty = {
+                "location": ["tx", "ty", "tz"],
+                "scale": ["sx", "sy", "sz"]
+            }
+
+            if property not in switcherProperty:
                 continue
 
-            poseBone = target.data
-
-            # Precompute a list of keyframes for export.
-            keyframes = [int(x.co[0]) for x in curve.keyframe_points]
-            # Update the unique keyframe list so we only iterate once.
-            uniqueKeyframes.update(keyframes)
-
-            if target == poseBone.location.owner:
-                result = curves.get(poseBone, [])
-                result.append((curve,
-                               "location",
-                               curve.array_index,
-                               keyframes))
-
-                curves[poseBone] = result
-            elif target == poseBone.rotation_quaternion.owner or target == poseBone.rotation_euler.owner:
-                result = curves.get(poseBone, [])
-                result.append((curve,
-                               "rotation_quaternion",
-                               curve.array_index,
-                               keyframes))
-
-                curves[poseBone] = result
-            elif target == poseBone.scale.owner:
-                result = curves.get(poseBone, [])
-                result.append((curve,
-                               "scale",
-                               curve.array_index,
-                               keyframes))
-
-                curves[poseBone] = result
+            propertyName = switcherProperty[property][index]
 
-            progress.step()
+            curveNode = animation.CreateCurve()
+            curveNode.SetNodeName(target.name)
+            curveNode.SetKeyPropertyName(propertyName)
+            curveNode.SetMode("absolute")
 
-        progress.leave_substeps()
-        progress.enter_substeps(len(curves.keys()))
-
-        for target, curves in curves.items():
-            # Quaternions are combined into their own curve.
-            rotationQuaternion = [
-                x for x in curves if x[1] == "rotation_quaternion"]
-
-            if rotationQuaternion:
-                curveNode = animation.CreateCurve()
-                curveNode.SetNodeName(target.name)
-                curveNode.SetKeyPropertyName("rq")
-                curveNode.SetMode("absolute")
-
-                keyframes = set()
-
-                for curve in rotationQuaternion:
-                    keyframes.update(curve[3])
-
-                uniqueCurves.append((curveNode,
-                                     target,
-                                     "rotation_quaternion",
-                                     0,
-                                     keyframes,
-                                     [],
-                                     []))
-
-            for (curve, property, index, keyframes) in curves:
-                switcherProperty = {
-                    "location": ["tx", "ty", "tz"],
-                    "scale": ["sx", "sy", "sz"]
-                }
-
-                if property not in switcherProperty:
-                    continue
+            uniqueCurves.append((curveNode,
+                                 target,
+                                 property,
+                                 index,
+                                 keyframes))
 
-                propertyName = switcherProperty[property][index]
+    return uniqueCurves
 
-                curveNode = animation.CreateCurve()
-                curveNode.SetNodeName(target.name)
-                curveNode.SetKeyPropertyName(propertyName)
-                curveNode.SetMode("absolute")
 
-                uniqueCurves.append((curveNode,
-                                     target,
-                                     property,
-                                     index,
-                                     keyframes,
-                                     [],
-                                     []))
+def utilitySampleCurves(self, context, uniqueCurves, progress):
+    uniqueKeyframes = set()
 
-            progress.step()
+    for (_, _, _, _, keyframes) in uniqueCurves:
+        uniqueKeyframes.update(keyframes)
 
-        progress.leave_substeps()
-        progress.enter_substeps(len(uniqueKeyframes))
-
-        # Iterate over the keyframes in this animation.
-        for keyframe in uniqueKeyframes:
-            context.scene.frame_set(keyframe)
-
-            for (_,
-                 target,
-                 property,
-                 index,
-                 frames,
-                 keyframes,
-                 keyvalues) in uniqueCurves:
-                if keyframe not in frames:
-                    continue
+    frames = sorted(uniqueKeyframes)
+    frameIndices = {frame: i for i, frame in enumerate(frames)}
 
-                keyframes.append(keyframe)
+    # Precompute which armatures have to be sampled on each frame, so we never scan curves per frame.
+    frameArmatures = [set() for _ in frames]
+    armatures = {}
 
-                if property == "rotation_quaternion":
-                    quat = utilityGetQuatKeyValue(target)
-                    keyvalues.append((quat.x, quat.y, quat.z, quat.w))
-                elif property == "location":
-                    simple = utilityGetSimpleKeyValue(target, property)[index]
-                    keyvalues.append(simple * self.scale)
-                elif property == "scale":
-                    simple = utilityGetSimpleKeyValue(target, property)[index]
-                    keyvalues.append(simple)
+    for (_, target, _, _, keyframes) in uniqueCurves:
+        armature = target.id_data
 
-            progress.step()
+        if armature not in armatures:
+            armatures[armature] = None
 
-        progress.leave_substeps()
-        progress.enter_substeps(len(uniqueCurves))
-
-        # Apply the keyframe and keyvalue buffers to the curve.
-        for (curveNode,
-             _,
-             property,
-             _,
-             _,
-             keyframes,
-             keyvalues) in uniqueCurves:
-            curveNode.SetKeyFrameBuffer(keyframes)
+        for keyframe in keyframes:
+            frameArmatures[frameIndices[keyframe]].add(armature)
+
+    # Every pose bone matrix and scale for each sampled frame, read in bulk once per armature per frame.
+    for armature in armatures.keys():
+        boneCount = len(armature.pose.bones)
+
+        armatures[armature] = (numpy.zeros((len(frames), boneCount, 16), dtype=numpy.float32),
+                               numpy.zeros((len(frames), boneCount, 3), dtype=numpy.float32))
+
+    progress.enter_substeps(len(frames))
+
+    # Iterate over the keyframes in this animation.
+    for i, keyframe in enumerate(frames):
+        context.scene.frame_set(keyframe)
+
+        for armature in frameArmatures[i]:
+            (matrices, scales) = armatures[armature]
+
+            armature.pose.bones.foreach_get("matrix", matrices[i].ravel())
+            armature.pose.bones.foreach_get("scale", scales[i].ravel())
+
+        progress.step()
+
+    progress.leave_substeps()
+    progress.enter_substeps(len(uniqueCurves))
+
+    # Build the keyframe and keyvalue buffers from the sampled poses, and apply them to the curve.
+    for (curveNode,
+         target,
+         property,
+         index,
+         keyframes) in uniqueCurves:
+        keyframes = sorted(set(keyframes))
+        rows = numpy.array([frameIndices[x] for x in keyframes],
+                           dtype=numpy.int64)
+
+        (matrices, scales) = armatures[target.id_data]
+        boneIndex = utilityGetPoseBoneIndex(target)
+
+        curveNode.SetKeyFrameBuffer(keyframes)
+
+        if property == "scale":
+            curveNode.SetFloatKeyValueBuffer(
+                scales[rows, boneIndex, index].tolist())
+        else:
+            # Matrices are stored column major, transpose them to match mathutils.
+            matrix = matrices[rows, boneIndex].reshape(-1, 4, 4)
+            matrix = matrix.transpose(0, 2, 1).astype(numpy.float64)
+
+            if target.parent is not None:
+                parent = matrices[rows, utilityGetPoseBoneIndex(target.parent)]
+                parent = parent.reshape(-1, 4, 4)
+                parent = parent.transpose(0, 2, 1).astype(numpy.float64)
+            else:
+                parent = None
 
             if property == "rotation_quaternion":
-                curveNode.SetVec4KeyValueBuffer(keyvalues)
+                rotation = matrix[:, :3, :3]
+
+                if parent is not None:
+                    rotation = numpy.linalg.inv(parent[:, :3, :3]) @ rotation
+
+                curveNode.SetVec4KeyValueBuffer(
+                    utilityMatricesToQuats(rotation).tolist())
+            elif property == "location":
+                translation = matrix[:, :, 3]
+
+                if parent is not None:
+                    translation = (numpy.linalg.inv(parent) @
+                                   translation[:, :, None])[:, :, 0]
+
+                curveNode.SetFloatKeyValueBuffer(
+                    (translation[:, index] * self.scale).tolist())
+
+        progress.step()
+
+    progress.leave_substeps()
+
+
+def exportNotetracks(animation, action):
+    notetracks = {}
+
+    # Pull in the pose_markers as notetracks based on their name:[frames].
+    for poseMarker in action.pose_markers:
+        if poseMarker.name in notetracks:
+            notetracks[poseMarker.name].append(int(poseMarker.frame))
+        else:
+            notetracks[poseMarker.name] = [int(poseMarker.frame)]
+
+    # Generate the notetrack curves.
+    for name, frames in notetracks.items():
+        track = animation.CreateNotification()
+        track.SetName(name)
+        track.SetKeyFrameBuffer(frames)
+
+
+def exportActions(self, context, roots, objects, actions, playActions):
+    scene = bpy.context.scene
+    sceneFps = scene.render.fps / scene.render.fps_base
+
+    targetCache = {}
+    sweeps = []
+
+    with ProgressReport(context.window_manager) as progress:
+        progress.enter_substeps(len(actions))
+
+        for root, action in zip(roots, actions):
+            animation = root.CreateAnimation()
+            animation.SetName(action.name)
+            animation.SetFramerate(sceneFps)
+            animation.SetLooping(self.is_looped)
+
+            uniqueCurves = utilityGatherActionCurves(animation,
+                                                     action,
+                                                     objects,
+                                                     targetCache)
+
+            if self.incl_notetracks:
+                exportNotetracks(animation, action)
+
+            armatures = set(x[1].id_data for x in uniqueCurves)
+
+            # Actions can share a sweep over the timeline as long as they don't need to play on the same armature.
+            for sweep in sweeps:
+                if not playActions or sweep[0].isdisjoint(armatures):
+                    sweep[0].update(armatures)
+                    sweep[1].append((action, armatures, uniqueCurves))
+                    break
             else:
-                curveNode.SetFloatKeyValueBuffer(keyvalues)
+                sweeps.append((armatures, [(action, armatures, uniqueCurves)]))
 
             progress.step()
 
         progress.leave_substeps()
+        progress.enter_substeps(len(sweeps))
 
-        # Pull in the pose_markers as notetracks based on their name:[frames].
-        if self.incl_notetracks:
-            notetracks = {}
+        for (_, sweepActions) in sweeps:
+            previousActions = {}
 
-            for poseMarker in action.pose_markers:
-                if poseMarker.name in notetracks:
-                    notetracks[poseMarker.name].append(int(poseMarker.frame))
-                else:
-                    notetracks[poseMarker.name] = [int(poseMarker.frame)]
+            try:
+                # Play each action on the armatures it animates for the duration of this sweep.
+                if playActions:
+                    for (action, armatures, _) in sweepActions:
+                        for armature in armatures:
+                            previousActions[armature] = \
+                                utilityAssignAction(armature, action)
+
+                utilitySampleCurves(self,
+                                    context,
+                                    [x for sweepAction in sweepActions for x in sweepAction[2]],
+                                    progress)
+            finally:
+                for armature, previous in previousActions.items():
+                    utilityRestoreAction(armature, previous)
 
-            # Generate the notetrack curves.
-            for name, frames in notetracks.items():
-                track = animation.CreateNotification()
-                track.SetName(name)
-                track.SetKeyFrameBuffer(frames)
+            progress.step()
 
+        progress.leave_substeps()
 
-def save(self, context, filepath=""):
-    # The currently selected object.
-    selectedObject = bpy.context.object
 
+def utilityCreateCast(self):
     cast = Cast()
     root = cast.CreateRoot()
 
@@ -583,6 +835,155 @@ def save(self, context, filepath=""):
     if self.up_axis:
         meta.SetUpAxis(self.up_axis)
 
+    return (cast, root)
+
+
+def utilityGetArmatureAction(armature):
+    if armature.animation_data is None:
+        return None
+
+    return armature.animation_data.action
+
+
+def utilitySaveCasts(outputs):
+    pool = utilityCreateCastPool(len(outputs))
+
+    if pool is None:
+        for (cast, path) in outputs:
+            cast.save(path)
+        return
+
+    # Serialization is pure python, so each file is written from its own worker process.
+    try:
+        futures = []
+
+        try:
+            for (cast, path) in outputs:
+                futures.append(pool.submit(Cast.save, cast, path))
+        except (concurrent.futures.process.BrokenProcessPool, OSError):
+            pass
+
+        for (i, (cast, path)) in enumerate(outputs):
+            try:
+                if i < len(futures):
+                    futures[i].result()
+                    continue
+            except (concurrent.futures.process.BrokenProcessPool, OSError):
+                pass
+
+            # The workers are unavailable, the rest of the files are written here instead.
+            cast.save(path)
+    finally:
+        pool.shutdown(wait=True)
+
+
+def utilityCreateBatchOutput(self, outputs, paths, directory, name):
+    (cast, root) = utilityCreateCast(self)
+
+    # Different names can clean to the same file name, so suffix them instead of overwriting the first.
+    name = bpy.path.clean_name(name)
+    path = os.path.join(directory, "%s.cast" % name)
+    suffix = 1
+
+    while path in paths:
+        path = os.path.join(directory, "%s_%d.cast" % (name, suffix))
+        suffix += 1
+
+    if suffix > 1:
+        self.report({'WARNING'}, "%s shares its file name with another output, exporting to %s" %
+                    (name, os.path.basename(path)))
+
+    paths.add(path)
+    outputs.append((cast, path))
+
+    return (root, path)
+
+
+def utilityShareNodes(root, nodes):
+    # Shared nodes keep their scratch root as the parent, so each output only pickles what it references.
+    root.childNodes.extend(nodes)
+
+
+def exportBatch(self, context, filepath):
+    directory = os.path.dirname(filepath)
+    outputs = []
+    paths = set()
+
+    if self.batch_mode == "action":
+        actions = list(bpy.data.actions)
+        roots = [utilityCreateBatchOutput(self, outputs, paths, directory, action.name)[0]
+                 for action in actions]
+
+        # Every action shares the same curve resolution, and timeline sweeps.
+        if self.incl_animation:
+            exportActions(self,
+                          context,
+                          roots,
+                          list(bpy.data.objects),
+                          actions,
+                          True)
+    else:
+        if self.batch_mode == "armature":
+            groups = [(x.name, [x])
+                      for x in bpy.data.objects if x.type == 'ARMATURE']
+        else:
+            groups = [(x.name, [y for y in x.all_objects if y.type == 'ARMATURE' or
+                                (y.type == 'MESH' and y.find_armature() is None)])
+                      for x in bpy.data.collections]
+
+        sharedModels = {}
+        sharedAnimations = {}
+
+        for (name, objects) in groups:
+            if not objects:
+                continue
+
+            (root, path) = utilityCreateBatchOutput(self,
+                                                    outputs,
+                                                    paths,
+                                                    directory,
+                                                    name)
+
+            for obj in objects:
+                # An object in several collections is only extracted once, and shared between each output.
+                if self.incl_animation and obj.type == 'ARMATURE' and utilityGetArmatureAction(obj):
+                    if obj.name not in sharedAnimations:
+                        (_, scratch) = utilityCreateCast(self)
+
+                        exportActions(self,
+                                      context,
+                                      [scratch],
+                                      [obj],
+                                      [utilityGetArmatureAction(obj)],
+                                      False)
+
+                        sharedAnimations[obj.name] = scratch.ChildrenOfType(
+                            Animation)
+
+                    utilityShareNodes(root, sharedAnimations[obj.name])
+
+                if self.incl_model:
+                    if obj.name not in sharedModels:
+                        (_, scratch) = utilityCreateCast(self)
+
+                        exportModel(self, context, scratch, obj, path)
+
+                        sharedModels[obj.name] = scratch.ChildrenOfType(Model)
+
+                    utilityShareNodes(root, sharedModels[obj.name])
+
+    utilitySaveCasts(outputs)
+
+
+def save(self, context, filepath=""):
+    if self.batch_mode != "none":
+        return exportBatch(self, context, filepath)
+
+    # The currently selected object.
+    selectedObject = bpy.context.object
+
+    (cast, root) = utilityCreateCast(self)
+
     if self.incl_animation:
         # Check that the selected object is an 'ARMATURE' if we're exporting selected animations.
         if self.export_selected and (selectedObject is not None and selectedObject.type != 'ARMATURE'):
@@ -591,18 +992,21 @@ def save(self, context, filepath=""):
 
         # Export either the armature's action, or all of the actions in the scene.
         if self.export_selected:
-            exportAction(self,
-                         context,
-                         root,
-                         [selectedObject],
-                         selectedObject.animation_data.action)
+            exportActions(self,
+                          context,
+                          [root],
+                          [selectedObject],
+                          [selectedObject.animation_data.action],
+                          False)
         else:
-            for action in bpy.data.actions:
-                exportAction(self,
-                             context,
-                             root,
-                             list(bpy.data.objects),
-                             action)
+            actions = list(bpy.data.actions)
+
+            exportActions(self,
+                          context,
+                          [root] * len(actions),
+                          list(bpy.data.objects),
+                          actions,
+                          True)
 
     if self.incl_model:
         # Check that selected object is an 'ARMATURE' or mesh if we're exporting selected models.
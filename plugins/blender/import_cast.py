@@ -1,12 +1,16 @@
 import bpy
 import os
-import array
 import sys
+import pickle
+import shutil
+import hashlib
+import numpy
+import concurrent.futures
 
 from mathutils import *
 from bpy_extras.io_utils import unpack_list
-from .cast import Cast, CastColor, Model, Animation, Instance, Metadata, File, Color
-from .shared_cast import utilityIsVersionAtLeast
+from .cast import Cast, CastColor, CastProfiler, castLoadPickled, Model, Animation, Instance, Metadata, File, Color
+from .shared_cast import utilityIsVersionAtLeast, utilityCreateCastPool
 
 
 def utilityBuildPath(root, asset):
@@ -17,6 +21,141 @@ def utilityBuildPath(root, asset):
     return os.path.join(root, asset)
 
 
+def utilityGetDecodedCast(decoded, path):
+    # Each scene is only used once, so drop the future to let the scene be freed once it's built.
+    future = decoded.pop(path, None)
+
+    if future is None:
+        return None
+
+    try:
+        data = future.result()
+    except concurrent.futures.process.BrokenProcessPool:
+        # The workers are unavailable, the caller will decode the file itself.
+        return None
+
+    # The pickled scene is kept alongside it, so it can be written to the cache as is.
+    return (pickle.loads(data), data)
+
+
+# Bump whenever the layout of decoded casts changes, so stale cache entries are ignored.
+CAST_DECODE_CACHE_VERSION = 1
+# Size the decode cache is trimmed down to after an import, least recently used entries go first.
+CAST_DECODE_CACHE_LIMIT = 2 * 1024 * 1024 * 1024
+
+
+def utilityGetDecodeCacheRoot():
+    # Entries are unpickled, so they live in the user's own blender directory, never next to shared scenes.
+    return bpy.utils.user_resource("DATAFILES",
+                                   path=os.path.join("cast", "cache", "v%d" % CAST_DECODE_CACHE_VERSION))
+
+
+def utilityTrimDecodeCache(cacheRoot):
+    # Entries written by older versions can never be read again.
+    versionsRoot = os.path.dirname(cacheRoot)
+
+    try:
+        versions = os.listdir(versionsRoot)
+    except OSError:
+        versions = []
+
+    for version in versions:
+        if version != os.path.basename(cacheRoot):
+            shutil.rmtree(os.path.join(versionsRoot, version),
+                          ignore_errors=True)
+
+    try:
+        entries = [x for x in os.scandir(cacheRoot)
+                   if x.is_file() and x.name.endswith(".bin")]
+    except OSError:
+        return
+
+    # Reading an entry touches it, so the oldest modification time is the least recently used.
+    entries = sorted(((x.stat().st_mtime, x.stat().st_size, x.path) for x in entries),
+                     reverse=True)
+    total = 0
+
+    for (_, size, entryPath) in entries:
+        total += size
+
+        if total > CAST_DECODE_CACHE_LIMIT:
+            try:
+                os.remove(entryPath)
+            except OSError:
+                pass
+
+
+def utilityGetDecodeCachePath(cacheRoot, path):
+    key = os.path.normcase(os.path.abspath(path)).encode("utf-8")
+
+    return os.path.join(cacheRoot, "%s.bin" % hashlib.sha1(key).hexdigest())
+
+
+def utilityGetCastStamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return (CAST_DECODE_CACHE_VERSION, stat.st_size, stat.st_mtime_ns)
+
+
+def utilityLoadCachedCast(cacheRoot, path, stamp):
+    if stamp is None:
+        return None
+
+    cachePath = utilityGetDecodeCachePath(cacheRoot, path)
+
+    try:
+        with open(cachePath, "rb") as file:
+            # The stamp is stored first so a stale entry is rejected without decoding the cast.
+            if pickle.load(file) != stamp:
+                return None
+
+            cast = pickle.load(file)
+    except Exception:
+        return None
+
+    try:
+        os.utime(cachePath)
+    except OSError:
+        pass
+
+    return cast
+
+
+def utilityStoreCachedCast(cacheRoot, path, stamp, cast, data=None):
+    if stamp is None:
+        return True
+
+    # Scenes decoded by a worker were already pickled there, only ones decoded here are pickled again.
+    if data is None:
+        data = pickle.dumps(cast, pickle.HIGHEST_PROTOCOL)
+
+    cachePath = utilityGetDecodeCachePath(cacheRoot, path)
+    tempPath = "%s.%d.tmp" % (cachePath, os.getpid())
+
+    try:
+        os.makedirs(cacheRoot, mode=0o700, exist_ok=True)
+
+        with open(tempPath, "wb") as file:
+            pickle.dump(stamp, file, pickle.HIGHEST_PROTOCOL)
+            file.write(data)
+
+        # Replace the entry in one step so a partially written entry is never read.
+        os.replace(tempPath, cachePath)
+    except Exception:
+        # The cache is best effort, when it can't be written we just decode every time.
+        try:
+            os.remove(tempPath)
+        except OSError:
+            pass
+
+        return False
+
+    return True
+
+
 def utilityStashCurveComponent(component, curve, name, index):
     if name in component:
         component[name][index] = curve
@@ -210,30 +349,36 @@ def utilityAssignMaterialSlots(material, slots, path):
                                          node.outputs["Color"])
 
 
+def utilityNormalizeRows(vectors):
+    lengths = numpy.linalg.norm(vectors, axis=1, keepdims=True)
+
+    # Zero length vectors stay zero, which matches mathutils normalized().
+    return numpy.divide(vectors, lengths, out=numpy.zeros_like(vectors), where=lengths != 0.0)
+
+
 def utilitySetVertexNormals(mesh, vertexNormals, faces):
-    if not vertexNormals:
+    if vertexNormals is None or len(vertexNormals) == 0:
         return mesh.validate(clean_customdata=False)
 
+    # Normals are handed to blender as rows, instead of zipping them into tuples one value at a time.
+    vertexNormals = numpy.asarray(vertexNormals, dtype=numpy.float32).reshape(-1, 3)
+
     if utilityIsVersionAtLeast(4, 1):
         mesh.validate(clean_customdata=False)
-        mesh.normals_split_custom_set_from_vertices(
-            tuple(zip(*(iter(vertexNormals),) * 3)))
+        mesh.normals_split_custom_set_from_vertices(vertexNormals)
     else:
         mesh.create_normals_split()
-        mesh.loops.foreach_set("normal", unpack_list([(vertexNormals[x * 3],
-                                                       vertexNormals[(
-                                                           x * 3) + 1],
-                                                       vertexNormals[(x * 3) + 2]) for x in faces]))
+        mesh.loops.foreach_set("normal",
+                               vertexNormals[numpy.asarray(faces, dtype=numpy.int64)].ravel())
 
         mesh.validate(clean_customdata=False)
-        clnors = array.array('f', [0.0] * (len(mesh.loops) * 3))
+        clnors = numpy.empty(len(mesh.loops) * 3, dtype=numpy.float32)
         mesh.loops.foreach_get("normal", clnors)
 
         mesh.polygons.foreach_set("use_smooth",
                                   [True] * len(mesh.polygons))
 
-        mesh.normals_split_custom_set(
-            tuple(zip(*(iter(clnors),) * 3)))
+        mesh.normals_split_custom_set(clnors.reshape(-1, 3))
         mesh.use_auto_smooth = True
 
 
@@ -289,6 +434,87 @@ def utilityResolveCurveModeOverride(bone, mode, overrides, isTranslate=False, is
                 return override.Mode()
 
 
+def utilityGetBoneIndex(self, armatureObj):
+    # Case-insensitive bone name lookups are cached on the operator, so a batch import
+    # of many animations onto the same armature only has to build the index once.
+    cache = getattr(self, "castBoneIndexCache", None)
+
+    if cache is None:
+        cache = {}
+        self.castBoneIndexCache = cache
+
+    key = (armatureObj.name, armatureObj.as_pointer())
+    index = cache.get(key)
+
+    # Rebuild the index whenever bones have been added or removed since it was created.
+    if index is None or index[0] != len(armatureObj.pose.bones):
+        index = (len(armatureObj.pose.bones),
+                 {bone.name.lower(): bone.name for bone in armatureObj.pose.bones})
+        cache[key] = index
+
+    return index[1]
+
+
+def utilityInvalidateBoneIndex(self, armatureObj):
+    cache = getattr(self, "castBoneIndexCache", None)
+
+    if cache is not None:
+        cache.pop((armatureObj.name, armatureObj.as_pointer()), None)
+
+
+def utilityFindPoseBone(self, armatureObj, name):
+    boneName = utilityGetBoneIndex(self, armatureObj).get(name.lower())
+
+    if boneName is None:
+        return None
+
+    return armatureObj.pose.bones[boneName]
+
+
+def utilityHashMeshBuffers(descriptor, buffers):
+    hasher = hashlib.sha1(repr(descriptor).encode("utf-8"))
+
+    for buffer in buffers:
+        data = numpy.asarray(buffer if buffer is not None else ())
+
+        # The layout is hashed along with the data so buffers of different kinds never collide.
+        hasher.update(repr((data.dtype.str, data.shape)).encode("utf-8"))
+        hasher.update(data.tobytes())
+
+    return hasher.hexdigest()
+
+
+def utilityGetSharedMesh(self, key):
+    # Meshes are shared by content for the whole operator run, so identical meshes
+    # across models, files, and instance scenes only ever create one data-block.
+    cache = getattr(self, "castMeshCache", None)
+
+    if key is None or cache is None or key not in cache:
+        return None
+
+    try:
+        cache[key].name
+    except ReferenceError:
+        # The data-block was removed since it was cached.
+        del cache[key]
+        return None
+
+    return cache[key]
+
+
+def utilityStoreSharedMesh(self, key, mesh):
+    if key is None:
+        return
+
+    cache = getattr(self, "castMeshCache", None)
+
+    if cache is None:
+        cache = {}
+        self.castMeshCache = cache
+
+    cache[key] = mesh
+
+
 def utilityGetBindposeScale(poseBone):
     bindPoseScale = Matrix.LocRotScale(None, None, Vector((1.0, 1.0, 1.0)))
 
@@ -386,8 +612,11 @@ def importMergeModel(self, selectedObj, skeletonObj, poses):
 
     missingBones = []
 
+    # Bones are matched by their exact name, the armature modifier binds vertex groups the same way.
     for bone in skeletonObj.pose.bones:
-        if not bone.name in selectedObj.pose.bones:
+        existingBone = selectedObj.pose.bones.get(bone.name)
+
+        if existingBone is None:
             missingBones.append(bone.name)
             continue
 
@@ -397,7 +626,7 @@ def importMergeModel(self, selectedObj, skeletonObj, poses):
         foundMatchingRoot = True
 
         # Move the models bone to the existing bone in the scene's position.
-        bone.matrix = selectedObj.pose.bones[bone.name].matrix
+        bone.matrix = existingBone.matrix
 
     if not foundMatchingRoot:
         self.report({"WARNING"},
@@ -439,6 +668,9 @@ def importMergeModel(self, selectedObj, skeletonObj, poses):
     bpy.context.view_layer.objects.active = skeletonObj
     bpy.ops.object.mode_set(mode='POSE')
 
+    # The selected armature gained bones, so the cached index is stale.
+    utilityInvalidateBoneIndex(self, selectedObj)
+
     # Make sure that any bone in poses update for ik/constraints later.
     for bone in poses.keys():
         poses[bone] = selectedObj.pose.bones[bone]
@@ -645,6 +877,8 @@ def importMaterialNode(path, material):
 
 
 def importModelNode(self, model, path, selectedObject):
+    profiler = self.castProfiler
+
     # Extract the name of this model from the path
     modelName = model.Name() or os.path.splitext(os.path.basename(path))[0]
 
@@ -653,12 +887,14 @@ def importModelNode(self, model, path, selectedObject):
     bpy.context.scene.collection.children.link(collection)
 
     # Import skeleton for binds, materials for meshes
-    (skeletonObj, poses) = importSkeletonNode(modelName,
-                                              model.Skeleton(),
-                                              collection)
+    with profiler.phase("skeleton"):
+        (skeletonObj, poses) = importSkeletonNode(modelName,
+                                                  model.Skeleton(),
+                                                  collection)
 
-    materialArray = {key: value for (key, value) in (
-        importMaterialNode(path, x) for x in model.Materials())}
+    with profiler.phase("materials"):
+        materialArray = {key: value for (key, value) in (
+            importMaterialNode(path, x) for x in model.Materials())}
 
     # For mesh import performance, unlink from scene until we're done
     bpy.context.scene.collection.children.unlink(collection)
@@ -679,371 +915,441 @@ def importModelNode(self, model, path, selectedObject):
     meshes = model.Meshes()
     meshHandles = {}
 
-    for mesh in meshes:
-        newMesh = bpy.data.meshes.new("polySurfaceMesh")
-        meshObj = bpy.data.objects.new(mesh.Name() or "CastMesh", newMesh)
+    # Shape keys live on the mesh data-block, so meshes with blend shapes can't be shared.
+    blendShapeBases = set()
 
-        # Store for later creating blend shapes if necessary.
-        meshHandles[mesh.Hash()] = (meshObj, newMesh)
+    if self.import_blend_shapes:
+        for blendShape in model.BlendShapes():
+            blendShapeBases.add(blendShape.BaseShape().Hash())
 
-        vertexPositions = mesh.VertexPositionBuffer()
-        newMesh.vertices.add(int(len(vertexPositions) / 3))
-        newMesh.vertices.foreach_set("co", vertexPositions)
+    isSkinned = skeletonObj is not None and self.import_skin
 
-        faces = mesh.FaceBuffer()
-        faceIndicesCount = len(faces)
-        facesCount = int(faceIndicesCount / 3)
+    if isSkinned:
+        boneNames = [bone.Name() for bone in model.Skeleton().Bones()]
+    else:
+        boneNames = []
 
-        # Remap face indices to match blender's winding order
-        faces = unpack_list([(faces[x + 1],
-                              faces[x + 2],
-                              faces[x + 0]) for x in range(0, faceIndicesCount, 3)])
+    with profiler.phase("meshes"):
+        for mesh in meshes:
+            meshMaterial = mesh.Material()
+            meshKey = None
 
-        newMesh.loops.add(faceIndicesCount)
-        newMesh.polygons.add(facesCount)
+            # Remove any degenerate faces before giving it to the mesh.
+            facesRemoved = mesh.RemoveDegenerateFaces()
 
-        newMesh.loops.foreach_set("vertex_index", faces)
-        newMesh.polygons.foreach_set("loop_start",
-                                     [x for x in range(0, faceIndicesCount, 3)])
-        newMesh.polygons.foreach_set("loop_total", [3] * facesCount)
-        newMesh.polygons.foreach_set("material_index", [0] * facesCount)
+            if facesRemoved > 0:
+                self.report({'WARNING'}, "Removed %d degenerate faces from %s" %
+                            (facesRemoved, mesh.Name() or "CastMesh"))
 
-        for i in range(mesh.UVLayerCount()):
-            uvBuffer = mesh.VertexUVLayerBuffer(i)
+            profiler.count("meshes.degenerate_faces", facesRemoved)
 
-            newMesh.uv_layers.new(do_init=False)
-            newMesh.uv_layers[i].data.foreach_set("uv",
-                                                  unpack_list(
-                                                      [(uvBuffer[x * 2],
-                                                        1.0 - uvBuffer[(x * 2) + 1]) for x in faces]))
+            # Sharing links identical meshes to one data-block, so it's only done when asked for.
+            if self.import_share_meshes and mesh.Hash() not in blendShapeBases:
+                if meshMaterial is not None:
+                    meshMaterialName = materialArray[meshMaterial.Name()].name
+                else:
+                    meshMaterialName = None
 
-        for i in range(mesh.ColorLayerCount()):
-            vertexColors = mesh.VertexColorLayerBuffer(i)
-            vertexColorsPacked = mesh.VertexColorLayerBufferPacked(i)
+                buffers = [mesh.VertexPositionBuffer(),
+                           mesh.FaceBuffer(),
+                           mesh.VertexNormalBuffer()]
+                buffers.extend(mesh.VertexUVLayerBuffer(i)
+                               for i in range(mesh.UVLayerCount()))
+                buffers.extend(mesh.VertexColorLayerBuffer(i)
+                               for i in range(mesh.ColorLayerCount()))
 
-            if vertexColorsPacked:
-                colors = unpack_list(
-                    [CastColor.fromInteger(vertexColors[x]) for x in faces])
-            else:
-                colors = unpack_list([(vertexColors[x * 4],
-                                      vertexColors[(x * 4) + 1],
-                                      vertexColors[(x * 4) + 2],
-                                      vertexColors[(x * 4) + 3]) for x in faces])
+                # Weights are stored on the mesh data-block as vertex group indices, so the bones must match too.
+                if isSkinned:
+                    buffers.append(mesh.VertexWeightBoneBuffer())
+                    buffers.append(mesh.VertexWeightValueBuffer())
 
-            newMesh.color_attributes.new("Color", "FLOAT_COLOR", "CORNER")
-            newMesh.color_attributes[i].data.foreach_set("color", colors)
+                meshKey = utilityHashMeshBuffers((meshMaterialName,
+                                                  mesh.UVLayerCount(),
+                                                  [mesh.VertexColorLayerBufferPacked(i)
+                                                   for i in range(mesh.ColorLayerCount())],
+                                                  mesh.MaximumWeightInfluence() if isSkinned else 0,
+                                                  boneNames), buffers)
 
-        vertexNormals = mesh.VertexNormalBuffer()
-        utilitySetVertexNormals(newMesh, vertexNormals, faces)
+            newMesh = utilityGetSharedMesh(self, meshKey)
+            isSharedMesh = newMesh is not None
 
-        meshMaterial = mesh.Material()
-        if meshMaterial is not None:
-            newMesh.materials.append(materialArray[meshMaterial.Name()])
+            profiler.count("meshes")
+            profiler.count("meshes.shared" if isSharedMesh else "meshes.built")
 
-        if skeletonObj is not None and self.import_skin:
-            boneGroups = []
-            for bone in model.Skeleton().Bones():
-                boneGroups.append(meshObj.vertex_groups.new(name=bone.Name()))
+            if not isSharedMesh:
+                newMesh = bpy.data.meshes.new("polySurfaceMesh")
 
-            meshObj.parent = skeletonObj
+            meshObj = bpy.data.objects.new(mesh.Name() or "CastMesh", newMesh)
 
-            modifier = meshObj.modifiers.new('Armature Rig', 'ARMATURE')
-            modifier.object = skeletonObj
-            modifier.use_bone_envelopes = False
-            modifier.use_vertex_groups = True
+            # Store for later creating blend shapes if necessary.
+            meshHandles[mesh.Hash()] = (meshObj, newMesh)
 
-            skinningMethod = mesh.SkinningMethod()
+            if not isSharedMesh:
+                vertexPositions = mesh.VertexPositionBuffer()
+                newMesh.vertices.add(int(len(vertexPositions) / 3))
 
-            if skinningMethod == "linear":
-                modifier.use_deform_preserve_volume = False
-            elif skinningMethod == "quaternion":
-                modifier.use_deform_preserve_volume = True
+                profiler.count("meshes.vertices", len(newMesh.vertices))
+                newMesh.vertices.foreach_set("co", vertexPositions)
 
-            maximumInfluence = mesh.MaximumWeightInfluence()
-            if maximumInfluence > 1:  # Slower path for complex weights
-                weightBoneBuffer = mesh.VertexWeightBoneBuffer()
-                weightValueBuffer = mesh.VertexWeightValueBuffer()
+                faces = mesh.FaceBuffer()
+                faceIndicesCount = len(faces)
+                facesCount = int(faceIndicesCount / 3)
 
-                for x in range(len(newMesh.vertices)):
-                    for j in range(maximumInfluence):
-                        i = j + (x * maximumInfluence)
+                # Remap face indices to match blender's winding order
+                faces = unpack_list([(faces[x + 1],
+                                      faces[x + 2],
+                                      faces[x + 0]) for x in range(0, faceIndicesCount, 3)])
 
-                        boneGroups[weightBoneBuffer[i]].add((x,),
-                                                            weightValueBuffer[i],
-                                                            "ADD")
-            elif maximumInfluence > 0:  # Fast path for simple weighted meshes
-                weightBoneBuffer = mesh.VertexWeightBoneBuffer()
-                for x in range(len(newMesh.vertices)):
-                    boneGroups[weightBoneBuffer[x]].add((x,), 1.0, "REPLACE")
+                newMesh.loops.add(faceIndicesCount)
+                newMesh.polygons.add(facesCount)
 
-        if modelMeshTransform:
-            utilitySetPRS(meshObj, modelPosition, modelRotation, modelScale)
+                profiler.count("meshes.faces", facesCount)
 
-        collection.objects.link(meshObj)
+                newMesh.loops.foreach_set("vertex_index", faces)
+                newMesh.polygons.foreach_set("loop_start",
+                                             [x for x in range(0, faceIndicesCount, 3)])
+                newMesh.polygons.foreach_set("loop_total", [3] * facesCount)
+                newMesh.polygons.foreach_set("material_index", [0] * facesCount)
 
-    # Import hairs if necessary.
-    if self.import_hair:
-        hairs = model.Hairs()
+                for i in range(mesh.UVLayerCount()):
+                    uvBuffer = mesh.VertexUVLayerBuffer(i)
 
-        for hair in hairs:
-            segmentsBuffer = hair.SegmentsBuffer()
-            particleBuffer = hair.ParticleBuffer()
-            particleOffset = 0
-
-            strandCount = hair.StrandCount()
-
-            # Curve hair is the best option for accuracy
-            # Mesh hair can be used as a light weight fallback method.
-            if self.create_hair_type == "curve" and \
-                    self.create_hair_subtype == "bevel":
-                hairData = bpy.data.curves.new(name="curve", type="CURVE")
-                hairData.dimensions = '3D'
-                hairData.resolution_u = 3
-
-                hairObj = \
-                    bpy.data.objects.new(hair.Name() or "CastHair", hairData)
-
-                for s in range(strandCount):
-                    segment = segmentsBuffer[s]
-
-                    strand = hairData.splines.new(type="NURBS")
-                    strand.points.add(segment)
-
-                    for pt in range(segment + 1):
-                        strand.points[pt].co = (
-                            particleBuffer[particleOffset * 3],
-                            particleBuffer[particleOffset * 3 + 1],
-                            particleBuffer[particleOffset * 3 + 2], 1.0)
-                        particleOffset += 1
-
-                # Setup curve rendering because we don't want the particle system.
-                # Curves don't render by default, so we need to enable them to.
-                hairData.use_fill_caps = True
-                hairData.bevel_depth = 0.0025
-
-                hairMaterial = hair.Material()
-                if hairMaterial is not None:
-                    hairData.materials.append(
-                        materialArray[hairMaterial.Name()])
-            elif self.create_hair_type == "curve" \
-                    and self.create_hair_subtype == "particle":
-                # We need to have a selected target mesh to apply the new hair particle system to.
-                # The particle system will also inherit blend shape data and weights from the root faces.
-                if not selectedObject or selectedObject.type != 'MESH':
-                    self.report({'WARNING'},
-                                "You must select a mesh to use with particle hair.")
-                    continue
+                    newMesh.uv_layers.new(do_init=False)
+                    newMesh.uv_layers[i].data.foreach_set("uv",
+                                                          unpack_list(
+                                                              [(uvBuffer[x * 2],
+                                                                1.0 - uvBuffer[(x * 2) + 1]) for x in faces]))
 
-                particleSystemModifier = \
-                    selectedObject.modifiers.new(hair.Name() or "CastHair",
-                                                 type="PARTICLE_SYSTEM")
-                particleSettings = \
-                    bpy.data.particles.new(name="CastHairSettings")
+                for i in range(mesh.ColorLayerCount()):
+                    vertexColors = mesh.VertexColorLayerBuffer(i)
+                    vertexColorsPacked = mesh.VertexColorLayerBufferPacked(i)
 
-                particleSystemModifier.particle_system.settings = particleSettings
+                    if vertexColorsPacked:
+                        colors = unpack_list(
+                            [CastColor.fromInteger(vertexColors[x]) for x in faces])
+                    else:
+                        colors = unpack_list([(vertexColors[x * 4],
+                                              vertexColors[(x * 4) + 1],
+                                              vertexColors[(x * 4) + 2],
+                                              vertexColors[(x * 4) + 3]) for x in faces])
 
-                particleSettings.type = 'HAIR'
-                particleSettings.count = strandCount
-                particleSettings.emit_from = 'FACE'
-                particleSettings.use_emit_random = False
-                particleSettings.hair_step = max(segmentsBuffer)
+                    newMesh.color_attributes.new("Color", "FLOAT_COLOR", "CORNER")
+                    newMesh.color_attributes[i].data.foreach_set("color", colors)
 
-                # Evaulate the object, this is the only way to read/edit particle data.
-                evaluatedObject = \
-                    selectedObject.evaluated_get(
-                        bpy.context.evaluated_depsgraph_get())
+                vertexNormals = mesh.VertexNormalBuffer()
+                utilitySetVertexNormals(newMesh, vertexNormals, faces)
 
-                evaulatedModifier = None
+                if meshMaterial is not None:
+                    newMesh.materials.append(materialArray[meshMaterial.Name()])
 
-                for modifier in evaluatedObject.modifiers:
-                    if modifier.name == particleSystemModifier.name:
-                        evaulatedModifier = modifier
-                        break
+                utilityStoreSharedMesh(self, meshKey, newMesh)
 
-                if evaulatedModifier is None:
-                    self.report({'WARNING'},
-                                "Failed to find evaulated modifier for particle hair system.")
-                    continue
+            if isSkinned:
+                with profiler.phase("skin"):
+                    boneGroups = []
+                    for bone in model.Skeleton().Bones():
+                        boneGroups.append(meshObj.vertex_groups.new(name=bone.Name()))
+
+                    meshObj.parent = skeletonObj
 
-                particleSystem = evaulatedModifier.particle_system
+                    modifier = meshObj.modifiers.new('Armature Rig', 'ARMATURE')
+                    modifier.object = skeletonObj
+                    modifier.use_bone_envelopes = False
+                    modifier.use_vertex_groups = True
 
-                for index, particle in enumerate(particleSystem.particles):
-                    segment = segmentsBuffer[index]
+                    skinningMethod = mesh.SkinningMethod()
 
-                    for index, hair_key in enumerate(particle.hair_keys):
-                        index = min(index, segment)
+                    if skinningMethod == "linear":
+                        modifier.use_deform_preserve_volume = False
+                    elif skinningMethod == "quaternion":
+                        modifier.use_deform_preserve_volume = True
 
-                        position = (particleBuffer[(particleOffset + index) * 3],
-                                    particleBuffer[(
-                                        particleOffset + index) * 3 + 1],
-                                    particleBuffer[(particleOffset + index) * 3 + 2])
+                    maximumInfluence = mesh.MaximumWeightInfluence()
 
-                        hair_key.co_object_set(evaluatedObject,
-                                               evaulatedModifier,
-                                               particle,
-                                               position)
+                    # A shared mesh already has its weights, only the groups on the object are needed.
+                    if isSharedMesh:
+                        pass
+                    elif maximumInfluence > 1:  # Slower path for complex weights
+                        weightBoneBuffer = mesh.VertexWeightBoneBuffer()
+                        weightValueBuffer = mesh.VertexWeightValueBuffer()
 
-                    particleOffset += segment + 1
+                        for x in range(len(newMesh.vertices)):
+                            for j in range(maximumInfluence):
+                                i = j + (x * maximumInfluence)
 
-                # Toggle particle mode, so updates are visible.
-                bpy.ops.object.mode_set(mode='PARTICLE_EDIT')
-                bpy.ops.object.mode_set(mode='OBJECT')
+                                boneGroups[weightBoneBuffer[i]].add((x,),
+                                                                    weightValueBuffer[i],
+                                                                    "ADD")
+                    elif maximumInfluence > 0:  # Fast path for simple weighted meshes
+                        weightBoneBuffer = mesh.VertexWeightBoneBuffer()
+                        for x in range(len(newMesh.vertices)):
+                            boneGroups[weightBoneBuffer[x]].add((x,), 1.0, "REPLACE")
 
-                # For whatever reason, we need to disconnect and reconnect for blend shapes to work properly.
-                bpy.ops.particle.disconnect_hair()
-                bpy.ops.particle.connect_hair()
+                    if not isSharedMesh:
+                        profiler.count("meshes.weights",
+                                       len(newMesh.vertices) * maximumInfluence)
+
+            if modelMeshTransform:
+                utilitySetPRS(meshObj, modelPosition, modelRotation, modelScale)
+
+            collection.objects.link(meshObj)
+
+    # Import hairs if necessary.
+    if self.import_hair:
+        hairs = model.Hairs()
 
-                hairMaterial = hair.Material()
-                if hairMaterial is not None:
-                    hairMaterial = materialArray[hairMaterial.Name()]
-                    found = False
+        with profiler.phase("hair"):
+            for hair in hairs:
+                segmentsBuffer = hair.SegmentsBuffer()
+                particleBuffer = hair.ParticleBuffer()
+                particleOffset = 0
 
-                    for material in selectedObject.data.materials:
-                        if material.name == hairMaterial.name:
-                            found = True
+                strandCount = hair.StrandCount()
+
+                profiler.count("hair.strands", strandCount)
+
+                # Strand layout is computed once for the whole hair so that the geometry can be built in bulk.
+                segments = numpy.asarray(segmentsBuffer, dtype=numpy.int64)
+                particles = numpy.asarray(particleBuffer,
+                                          dtype=numpy.float32).reshape(-1, 3)
+                strandOffsets = numpy.cumsum(segments + 1) - (segments + 1)
+
+                # Curve hair is the best option for accuracy
+                # Mesh hair can be used as a light weight fallback method.
+                if self.create_hair_type == "curve" and \
+                        self.create_hair_subtype == "bevel":
+                    hairData = bpy.data.curves.new(name="curve", type="CURVE")
+                    hairData.dimensions = '3D'
+                    hairData.resolution_u = 3
+
+                    hairObj = \
+                        bpy.data.objects.new(hair.Name() or "CastHair", hairData)
+
+                    # Nurbs points are (x, y, z, w) with a weight of 1.0.
+                    points = numpy.ones((len(particles), 4), dtype=numpy.float32)
+                    points[:, :3] = particles
+
+                    for s in range(strandCount):
+                        segment = segmentsBuffer[s]
+                        offset = strandOffsets[s]
+
+                        strand = hairData.splines.new(type="NURBS")
+                        strand.points.add(segment)
+                        strand.points.foreach_set("co",
+                                                  points[offset:offset + segment + 1].ravel())
+
+                    # Setup curve rendering because we don't want the particle system.
+                    # Curves don't render by default, so we need to enable them to.
+                    hairData.use_fill_caps = True
+                    hairData.bevel_depth = 0.0025
+
+                    hairMaterial = hair.Material()
+                    if hairMaterial is not None:
+                        hairData.materials.append(
+                            materialArray[hairMaterial.Name()])
+                elif self.create_hair_type == "curve" \
+                        and self.create_hair_subtype == "particle":
+                    # We need to have a selected target mesh to apply the new hair particle system to.
+                    # The particle system will also inherit blend shape data and weights from the root faces.
+                    if not selectedObject or selectedObject.type != 'MESH':
+                        self.report({'WARNING'},
+                                    "You must select a mesh to use with particle hair.")
+                        continue
+
+                    particleSystemModifier = \
+                        selectedObject.modifiers.new(hair.Name() or "CastHair",
+                                                     type="PARTICLE_SYSTEM")
+                    particleSettings = \
+                        bpy.data.particles.new(name="CastHairSettings")
+
+                    particleSystemModifier.particle_system.settings = particleSettings
+
+                    particleSettings.type = 'HAIR'
+                    particleSettings.count = strandCount
+                    particleSettings.emit_from = 'FACE'
+                    particleSettings.use_emit_random = False
+                    particleSettings.hair_step = max(segmentsBuffer)
+
+                    # Evaulate the object, this is the only way to read/edit particle data.
+                    evaluatedObject = \
+                        selectedObject.evaluated_get(
+                            bpy.context.evaluated_depsgraph_get())
+
+                    evaulatedModifier = None
+
+                    for modifier in evaluatedObject.modifiers:
+                        if modifier.name == particleSystemModifier.name:
+                            evaulatedModifier = modifier
                             break
 
-                    if not found:
-                        selectedObject.data.materials.append(hairMaterial)
+                    if evaulatedModifier is None:
+                        self.report({'WARNING'},
+                                    "Failed to find evaulated modifier for particle hair system.")
+                        continue
 
-                    particleSettings.material_slot = hairMaterial.name
+                    particleSystem = evaulatedModifier.particle_system
 
-                # We have no 'hairObj' to assign to a collection so skip that step.
-                continue
-            elif self.create_hair_type == "mesh":
-                vertexBuffer = []
-                normalBuffer = []
-                faceBuffer = []
+                    for index, particle in enumerate(particleSystem.particles):
+                        segment = segmentsBuffer[index]
 
-                def createNormal(v1, v2, v3):
-                    return (v3 - v1).cross((v2 - v1).normalized()).normalized()
+                        for index, hair_key in enumerate(particle.hair_keys):
+                            index = min(index, segment)
 
-                def createVertex(position, normal):
-                    index = int(len(vertexBuffer) / 3)
+                            position = (particleBuffer[(particleOffset + index) * 3],
+                                        particleBuffer[(
+                                            particleOffset + index) * 3 + 1],
+                                        particleBuffer[(particleOffset + index) * 3 + 2])
 
-                    vertexBuffer.extend([position.x, position.y, position.z])
-                    normalBuffer.extend([normal.x, normal.y, normal.z])
+                            hair_key.co_object_set(evaluatedObject,
+                                                   evaulatedModifier,
+                                                   particle,
+                                                   position)
 
-                    return index
+                        particleOffset += segment + 1
 
-                particleExtrusion = Vector((0.0, 0.0, 0.010))
-                particleOffset = 0
+                    # Toggle particle mode, so updates are visible.
+                    bpy.ops.object.mode_set(mode='PARTICLE_EDIT')
+                    bpy.ops.object.mode_set(mode='OBJECT')
 
-                for s in range(strandCount):
-                    segment = segmentsBuffer[s]
+                    # For whatever reason, we need to disconnect and reconnect for blend shapes to work properly.
+                    bpy.ops.particle.disconnect_hair()
+                    bpy.ops.particle.connect_hair()
 
-                    for i in range(segment):
-                        a = Vector((particleBuffer[particleOffset * 3],
-                                    particleBuffer[particleOffset * 3 + 1],
-                                    particleBuffer[particleOffset * 3 + 2]))
-                        particleOffset += 1
-                        b = Vector((particleBuffer[particleOffset * 3],
-                                    particleBuffer[particleOffset * 3 + 1],
-                                    particleBuffer[particleOffset * 3 + 2]))
+                    hairMaterial = hair.Material()
+                    if hairMaterial is not None:
+                        hairMaterial = materialArray[hairMaterial.Name()]
+                        found = False
 
-                        aUp = a + particleExtrusion
-                        bUp = b + particleExtrusion
+                        for material in selectedObject.data.materials:
+                            if material.name == hairMaterial.name:
+                                found = True
+                                break
 
-                        normal1 = createNormal(a, b, aUp)
-                        normal2 = createNormal(a, b, bUp)
+                        if not found:
+                            selectedObject.data.materials.append(hairMaterial)
 
-                        a1 = createVertex(a, normal1)
-                        b1 = createVertex(b, normal1)
-                        aUp1 = createVertex(aUp, normal1)
+                        particleSettings.material_slot = hairMaterial.name
 
-                        a2 = createVertex(a, normal2)
-                        b2 = createVertex(b, normal2)
-                        bUp2 = createVertex(bUp, normal2)
+                    # We have no 'hairObj' to assign to a collection so skip that step.
+                    continue
+                elif self.create_hair_type == "mesh":
+                    # Every segment (a, b) of a strand, which is every particle except the last one of each strand.
+                    segmentStarts = numpy.ones(len(particles), dtype=bool)
+                    segmentStarts[strandOffsets + segments] = False
+                    segmentStarts = numpy.flatnonzero(segmentStarts)
 
-                        faceBuffer.extend([b1, aUp1, a1])
-                        faceBuffer.extend([b2, bUp2, a2])
+                    a = particles[segmentStarts]
+                    b = particles[segmentStarts + 1]
 
-                    particleOffset += 1
+                    particleExtrusion = numpy.array((0.0, 0.0, 0.010),
+                                                    dtype=numpy.float32)
 
-                vertexCount = int(len(vertexBuffer) / 3)
-                faceIndicesCount = len(faceBuffer)
-                facesCount = int(faceIndicesCount / 3)
+                    aUp = a + particleExtrusion
+                    bUp = b + particleExtrusion
 
-                hairMesh = bpy.data.meshes.new("polySurfaceMesh")
-                hairObj = bpy.data.objects.new(
-                    hair.Name() or "CastHair", hairMesh)
+                    direction = utilityNormalizeRows(b - a)
 
-                hairMesh.vertices.add(vertexCount)
-                hairMesh.vertices.foreach_set("co", vertexBuffer)
+                    normal1 = utilityNormalizeRows(numpy.cross(aUp - a, direction))
+                    normal2 = utilityNormalizeRows(numpy.cross(bUp - a, direction))
 
-                hairMesh.loops.add(faceIndicesCount)
-                hairMesh.polygons.add(facesCount)
+                    # Each segment is two triangles: (a, b, aUp) and (a, b, bUp), with one flat normal each.
+                    vertexBuffer = numpy.stack((a, b, aUp, a, b, bUp),
+                                               axis=1).reshape(-1, 3)
+                    normalBuffer = numpy.stack((normal1, normal1, normal1, normal2, normal2, normal2),
+                                               axis=1).reshape(-1, 3)
+                    faceBuffer = (numpy.arange(len(segmentStarts), dtype=numpy.int32)[:, None] * 6 +
+                                  numpy.array((1, 2, 0, 4, 5, 3), dtype=numpy.int32)).ravel()
 
-                hairMesh.loops.foreach_set("vertex_index", faceBuffer)
-                hairMesh.polygons.foreach_set("loop_start",
-                                              [x for x in range(0, faceIndicesCount, 3)])
-                hairMesh.polygons.foreach_set("loop_total", [3] * facesCount)
-                hairMesh.polygons.foreach_set("material_index",
-                                              [0] * facesCount)
+                    vertexCount = len(vertexBuffer)
+                    faceIndicesCount = len(faceBuffer)
+                    facesCount = int(faceIndicesCount / 3)
 
-                utilitySetVertexNormals(hairMesh, normalBuffer, faceBuffer)
+                    hairMesh = bpy.data.meshes.new("polySurfaceMesh")
+                    hairObj = bpy.data.objects.new(
+                        hair.Name() or "CastHair", hairMesh)
 
-                hairMaterial = hair.Material()
-                if hairMaterial is not None:
-                    hairMesh.materials.append(
-                        materialArray[hairMaterial.Name()])
+                    hairMesh.vertices.add(vertexCount)
+                    hairMesh.vertices.foreach_set("co", vertexBuffer.ravel())
 
-            # Parent hair to skeleton if necessary:
-            if skeletonObj is not None and self.import_skin:
-                hairObj.parent = skeletonObj
+                    hairMesh.loops.add(faceIndicesCount)
+                    hairMesh.polygons.add(facesCount)
 
-            if modelMeshTransform:
-                utilitySetPRS(hairObj, modelPosition,
-                              modelRotation, modelScale)
+                    hairMesh.loops.foreach_set("vertex_index", faceBuffer)
+                    hairMesh.polygons.foreach_set("loop_start",
+                                                  numpy.arange(0, faceIndicesCount, 3, dtype=numpy.int32))
+                    hairMesh.polygons.foreach_set("loop_total",
+                                                  numpy.full(facesCount, 3, dtype=numpy.int32))
+                    hairMesh.polygons.foreach_set("material_index",
+                                                  numpy.zeros(facesCount, dtype=numpy.int32))
 
-            collection.objects.link(hairObj)
+                    utilitySetVertexNormals(hairMesh, normalBuffer.ravel(), faceBuffer)
 
-    # Import blend shape controllers if necessary.
-    if self.import_blend_shapes:
-        blendShapes = model.BlendShapes()
-        blendShapesByBaseShape = {}
+                    hairMaterial = hair.Material()
+                    if hairMaterial is not None:
+                        hairMesh.materials.append(
+                            materialArray[hairMaterial.Name()])
 
-        # Merge the blend shapes together by their base shapes, so we only create a basis once.
-        for blendShape in blendShapes:
-            baseShapeHash = blendShape.BaseShape().Hash()
+                # Parent hair to skeleton if necessary:
+                if skeletonObj is not None and self.import_skin:
+                    hairObj.parent = skeletonObj
 
-            if baseShapeHash not in meshHandles:
-                continue
-            if baseShapeHash not in blendShapesByBaseShape:
-                blendShapesByBaseShape[baseShapeHash] = [blendShape]
-            else:
-                blendShapesByBaseShape[baseShapeHash].append(blendShape)
+                if modelMeshTransform:
+                    utilitySetPRS(hairObj, modelPosition,
+                                  modelRotation, modelScale)
 
-        # Iterate over the blend shapes by base shapes.
-        for blendShapes in blendShapesByBaseShape.values():
-            baseShape = meshHandles[blendShapes[0].BaseShape().Hash()]
+                collection.objects.link(hairObj)
 
-            # The basis will automatically load the base shape's vertex positions.
-            basis = baseShape[0].shape_key_add(name="Basis")
-            basis.interpolation = "KEY_LINEAR"
+    # Import blend shape controllers if necessary.
+    if self.import_blend_shapes:
+        with profiler.phase("blend_shapes"):
+            blendShapes = model.BlendShapes()
+            blendShapesByBaseShape = {}
 
+            # Merge the blend shapes together by their base shapes, so we only create a basis once.
             for blendShape in blendShapes:
-                newShape = baseShape[0].shape_key_add(name=blendShape.Name(),
-                                                      from_mix=False)
-                newShape.interpolation = "KEY_LINEAR"
-                newShape.slider_min = 0.0
-                newShape.slider_max = min(10.0,
-                                          blendShape.TargetWeightScale() or 1.0)
-                newShape.value = 0.0
-
-                indices = blendShape.TargetShapeVertexIndices()
-                positions = blendShape.TargetShapeVertexPositions()
-
-                if not indices or not positions:
-                    self.report({'WARNING'},
-                                "Ignoring blend shape \"%s\" for mesh \"%s\" no indices or positions specified." % (blendShape.Name(), baseShape[0].name))
-                    continue
+                baseShapeHash = blendShape.BaseShape().Hash()
 
-                for i, vertexIndex in enumerate(indices):
-                    newShape.data[vertexIndex].co = \
-                        Vector((positions[i * 3],
-                                positions[(i * 3) + 1],
-                                positions[(i * 3) + 2]))
+                if baseShapeHash not in meshHandles:
+                    continue
+                if baseShapeHash not in blendShapesByBaseShape:
+                    blendShapesByBaseShape[baseShapeHash] = [blendShape]
+                else:
+                    blendShapesByBaseShape[baseShapeHash].append(blendShape)
+
+            # Iterate over the blend shapes by base shapes.
+            for blendShapes in blendShapesByBaseShape.values():
+                baseShape = meshHandles[blendShapes[0].BaseShape().Hash()]
+
+                # The basis will automatically load the base shape's vertex positions.
+                basis = baseShape[0].shape_key_add(name="Basis")
+                basis.interpolation = "KEY_LINEAR"
+
+                for blendShape in blendShapes:
+                    newShape = baseShape[0].shape_key_add(name=blendShape.Name(),
+                                                          from_mix=False)
+                    newShape.interpolation = "KEY_LINEAR"
+                    newShape.slider_min = 0.0
+                    newShape.slider_max = min(10.0,
+                                              blendShape.TargetWeightScale() or 1.0)
+                    newShape.value = 0.0
+
+                    indices = blendShape.TargetShapeVertexIndices()
+                    positions = blendShape.TargetShapeVertexPositions()
+
+                    # Targets that don't move any vertex are kept, as an empty shape key.
+                    if indices is None or positions is None:
+                        self.report({'WARNING'},
+                                    "Ignoring blend shape \"%s\" for mesh \"%s\" no indices or positions specified." % (blendShape.Name(), baseShape[0].name))
+                        continue
+
+                    for i, vertexIndex in enumerate(indices):
+                        newShape.data[vertexIndex].co = \
+                            Vector((positions[i * 3],
+                                    positions[(i * 3) + 1],
+                                    positions[(i * 3) + 2]))
+
+                    profiler.count("blend_shapes")
+                    profiler.count("blend_shapes.vertices", len(indices))
 
     # Relink the collection after the mesh is built.
     bpy.context.view_layer.active_layer_collection.collection.children.link(
@@ -1052,18 +1358,21 @@ def importModelNode(self, model, path, selectedObject):
     # Merge with the existing skeleton here if one is selected and we have a skeleton.
     if self.import_merge:
         if selectedObject and selectedObject.type == 'ARMATURE':
-            importMergeModel(self, selectedObject, skeletonObj, poses)
+            with profiler.phase("merge"):
+                importMergeModel(self, selectedObject, skeletonObj, poses)
         else:
             self.report({'WARNING'},
                         "You must select an armature to merge to.")
 
     # Import any ik handles now that the meshes are bound because the constraints may effect the bind pose.
     if self.import_ik:
-        importSkeletonIKNode(self, model.Skeleton(), poses)
+        with profiler.phase("ik"):
+            importSkeletonIKNode(self, model.Skeleton(), poses)
 
     # Import any constraints after ik.
     if self.import_constraints:
-        importSkeletonConstraintNode(self, model.Skeleton(), poses)
+        with profiler.phase("constraints"):
+            importSkeletonConstraintNode(self, model.Skeleton(), poses)
 
     # If we merged this model, select the target armature again.
     if self.import_merge:
@@ -1433,6 +1742,8 @@ def importNotificationTrackNode(node, action, frameStart):
 
 
 def importAnimationNode(self, node, path, selectedObject):
+    profiler = self.castProfiler
+
     # Check that the selected object is an 'ARMATURE'.
     if selectedObject is None or selectedObject.type != 'ARMATURE':
         raise Exception(
@@ -1483,13 +1794,21 @@ def importAnimationNode(self, node, path, selectedObject):
     curves = node.Curves()
     curveModeOverrides = node.CurveModeOverrides()
 
+    profiler.count("animation.curves", len(curves))
+
     # Create a list of pose bones that match the curves.
     poseBones = {}
 
     for x in curves:
-        for bone in selectedObject.pose.bones:
-            if x.NodeName().lower() == bone.name.lower():
-                poseBones[x.NodeName()] = bone
+        nodeName = x.NodeName()
+
+        if nodeName in poseBones:
+            continue
+
+        bone = utilityFindPoseBone(self, selectedObject, nodeName)
+
+        if bone is not None:
+            poseBones[nodeName] = bone
 
     if self.import_reset:
         for bone in selectedObject.pose.bones:
@@ -1505,82 +1824,85 @@ def importAnimationNode(self, node, path, selectedObject):
     # Used to warn the user about the need to blend the additive animation.
     hasAdditiveCurve = False
 
-    for x in curves:
-        nodeName = x.NodeName()
-        property = x.KeyPropertyName()
-        hasAdditiveCurve = hasAdditiveCurve or x.Mode() == "additive"
-
-        if property == "rq":
-            (smallestFrame, largestFrame) = importRotCurveNode(self,
-                                                               x,
-                                                               nodeName,
-                                                               action,
-                                                               selectedObject,
-                                                               poseBones,
-                                                               path,
-                                                               startFrame,
-                                                               curveModeOverrides)
+    with profiler.phase("curves"):
+        for x in curves:
+            nodeName = x.NodeName()
+            property = x.KeyPropertyName()
+            hasAdditiveCurve = hasAdditiveCurve or x.Mode() == "additive"
+
+            profiler.count("animation.keys", len(x.KeyFrameBuffer()))
+
+            if property == "rq":
+                (smallestFrame, largestFrame) = importRotCurveNode(self,
+                                                                   x,
+                                                                   nodeName,
+                                                                   action,
+                                                                   selectedObject,
+                                                                   poseBones,
+                                                                   path,
+                                                                   startFrame,
+                                                                   curveModeOverrides)
+
+                wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
+                wantedLargestFrame = max(largestFrame, wantedLargestFrame)
+            elif property == "bs":
+                (smallestFrame, largestFrame) = importBlendShapeCurveNode(self,
+                                                                          x,
+                                                                          nodeName,
+                                                                          animName,
+                                                                          selectedObject,
+                                                                          startFrame)
+
+                wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
+                wantedLargestFrame = max(largestFrame, wantedLargestFrame)
+            elif property == "tx":
+                utilityStashCurveComponent(locCurves, x, nodeName, 0)
+            elif property == "ty":
+                utilityStashCurveComponent(locCurves, x, nodeName, 1)
+            elif property == "tz":
+                utilityStashCurveComponent(locCurves, x, nodeName, 2)
+            elif property == "sx":
+                utilityStashCurveComponent(scaleCurves, x, nodeName, 0)
+            elif property == "sy":
+                utilityStashCurveComponent(scaleCurves, x, nodeName, 1)
+            elif property == "sz":
+                utilityStashCurveComponent(scaleCurves, x, nodeName, 2)
+
+        for nodeName, x in locCurves.items():
+            (smallestFrame, largestFrame) = importLocCurveNodes(self,
+                                                                x,
+                                                                nodeName,
+                                                                action,
+                                                                selectedObject,
+                                                                poseBones,
+                                                                path,
+                                                                startFrame,
+                                                                curveModeOverrides)
 
             wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
             wantedLargestFrame = max(largestFrame, wantedLargestFrame)
-        elif property == "bs":
-            (smallestFrame, largestFrame) = importBlendShapeCurveNode(self,
-                                                                      x,
-                                                                      nodeName,
-                                                                      animName,
-                                                                      selectedObject,
-                                                                      startFrame)
+
+        for nodeName, x in scaleCurves.items():
+            (smallestFrame,  largestFrame) = importScaleCurveNodes(self,
+                                                                   x,
+                                                                   nodeName,
+                                                                   action,
+                                                                   selectedObject,
+                                                                   poseBones,
+                                                                   path,
+                                                                   startFrame,
+                                                                   curveModeOverrides)
+
+            wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
+            wantedLargestFrame = max(largestFrame, wantedLargestFrame)
+
+        for x in node.Notifications():
+            (smallestFrame, largestFrame) = importNotificationTrackNode(x,
+                                                                        action,
+                                                                        startFrame)
 
             wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
             wantedLargestFrame = max(largestFrame, wantedLargestFrame)
-        elif property == "tx":
-            utilityStashCurveComponent(locCurves, x, nodeName, 0)
-        elif property == "ty":
-            utilityStashCurveComponent(locCurves, x, nodeName, 1)
-        elif property == "tz":
-            utilityStashCurveComponent(locCurves, x, nodeName, 2)
-        elif property == "sx":
-            utilityStashCurveComponent(scaleCurves, x, nodeName, 0)
-        elif property == "sy":
-            utilityStashCurveComponent(scaleCurves, x, nodeName, 1)
-        elif property == "sz":
-            utilityStashCurveComponent(scaleCurves, x, nodeName, 2)
-
-    for nodeName, x in locCurves.items():
-        (smallestFrame, largestFrame) = importLocCurveNodes(self,
-                                                            x,
-                                                            nodeName,
-                                                            action,
-                                                            selectedObject,
-                                                            poseBones,
-                                                            path,
-                                                            startFrame,
-                                                            curveModeOverrides)
-
-        wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
-        wantedLargestFrame = max(largestFrame, wantedLargestFrame)
-
-    for nodeName, x in scaleCurves.items():
-        (smallestFrame,  largestFrame) = importScaleCurveNodes(self,
-                                                               x,
-                                                               nodeName,
-                                                               action,
-                                                               selectedObject,
-                                                               poseBones,
-                                                               path,
-                                                               startFrame,
-                                                               curveModeOverrides)
-
-        wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
-        wantedLargestFrame = max(largestFrame, wantedLargestFrame)
-
-    for x in node.Notifications():
-        (smallestFrame, largestFrame) = importNotificationTrackNode(x,
-                                                                    action,
-                                                                    startFrame)
-
-        wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
-        wantedLargestFrame = max(largestFrame, wantedLargestFrame)
 
     # Tell the user that we had an additive animation if necessary.
     if hasAdditiveCurve:
@@ -1595,7 +1917,8 @@ def importAnimationNode(self, node, path, selectedObject):
     scene.frame_end = wantedLargestFrame
     scene.frame_current = wantedSmallestFrame
 
-    bpy.context.evaluated_depsgraph_get().update()
+    with profiler.phase("update"):
+        bpy.context.evaluated_depsgraph_get().update()
 
     bpy.context.view_layer.objects.active = selectedObject
     bpy.ops.object.mode_set(mode='OBJECT')
@@ -1632,11 +1955,78 @@ def importInstanceNodes(self, nodes, context, path, sceneRoot):
     # Used to contain every instance.
     instanceGroup = bpy.data.collections.new("%s_instances" % name)
 
+    # Scenes that haven't changed since they were last imported are read from the decode cache.
+    cacheRoot = utilityGetDecodeCacheRoot()
+    stamps = {}
+    cached = {}
+
+    profiler = self.castProfiler
+    with profiler.phase("cache"):
+        for instancePath in uniqueInstances.keys():
+            stamps[instancePath] = utilityGetCastStamp(instancePath)
+
+            cast = utilityLoadCachedCast(
+                cacheRoot, instancePath, stamps[instancePath])
+
+            if cast is not None:
+                cached[instancePath] = cast
+
+    profiler.count("instances", len(nodes))
+    profiler.count("instances.scenes", len(uniqueInstances))
+    profiler.count("instances.cached", len(cached))
+
+    # Decode every other referenced scene in worker processes up front, so that parsing overlaps with
+    # building each scene here, only the blender calls have to happen on this thread.
+    pending = [x for x in uniqueInstances.keys() if x not in cached]
+    decodePool = utilityCreateCastPool(len(pending))
+    decoded = {}
+
+    if decodePool is not None:
+        for instancePath in pending:
+            decoded[instancePath] = decodePool.submit(castLoadPickled, instancePath)
+
+    try:
+        utilityImportInstanceScenes(self, context, name, uniqueInstances,
+                                    cacheRoot, stamps, cached, decoded, baseGroup, instanceGroup)
+    finally:
+        if decodePool is not None:
+            decodePool.shutdown(wait=False, cancel_futures=True)
+
+    if pending:
+        utilityTrimDecodeCache(cacheRoot)
+
+    baseGroup.hide_viewport = True
+
+    # Link the groups to the scene at the end for performance.
+    bpy.context.view_layer.active_layer_collection.collection.children.link(
+        baseGroup)
+    bpy.context.view_layer.active_layer_collection.collection.children.link(
+        instanceGroup)
+
+
+def utilityImportInstanceScenes(self, context, name, uniqueInstances, cacheRoot, stamps, cached, decoded, baseGroup, instanceGroup):
+    cacheWritable = True
+
     for instancePath, instances in uniqueInstances.items():
         instanceName = os.path.splitext(os.path.basename(instancePath))[0]
 
         try:
-            importCast(self, context, instancePath)
+            cast = cached.pop(instancePath, None)
+
+            if cast is None:
+                with self.castProfiler.phase("decode"):
+                    (cast, data) = utilityGetDecodedCast(decoded, instancePath) or \
+                        (Cast.load(instancePath), None)
+
+                    if cacheWritable and not utilityStoreCachedCast(
+                            cacheRoot, instancePath, stamps[instancePath], cast, data):
+                        cacheWritable = False
+
+                        self.report({'WARNING'},
+                                    "Unable to write the scene cache to %s, scenes will be decoded every import." % cacheRoot)
+
+            with self.castProfiler.phase("scene"):
+                importCast(self, context, instancePath, cast)
         except:
             self.report({'WARNING'},
                         "Instance: %s failed to import or not found, skipping..." % instancePath)
@@ -1670,17 +2060,13 @@ def importInstanceNodes(self, nodes, context, path, sceneRoot):
 
             instanceGroup.objects.link(newInstance)
 
-    baseGroup.hide_viewport = True
-
-    # Link the groups to the scene at the end for performance.
-    bpy.context.view_layer.active_layer_collection.collection.children.link(
-        baseGroup)
-    bpy.context.view_layer.active_layer_collection.collection.children.link(
-        instanceGroup)
 
+def importCast(self, context, path, cast=None):
+    profiler = self.castProfiler
 
-def importCast(self, context, path):
-    cast = Cast.load(path)
+    # The cast may have already been decoded ahead of time.
+    if cast is None:
+        cast = Cast.load(path)
 
     instances = []
     meta = None
@@ -1690,9 +2076,11 @@ def importCast(self, context, path):
 
     for root in cast.Roots():
         for child in root.ChildrenOfType(Model):
-            importModelNode(self, child, path, selectedObject)
+            with profiler.phase("model"):
+                importModelNode(self, child, path, selectedObject)
         for child in root.ChildrenOfType(Animation):
-            importAnimationNode(self, child, path, selectedObject)
+            with profiler.phase("animation"):
+                importAnimationNode(self, child, path, selectedObject)
         for child in root.ChildrenOfType(Instance):
             instances.append(child)
 
@@ -1705,10 +2093,22 @@ def importCast(self, context, path):
         sceneRoot = None
 
     if instances:
-        importInstanceNodes(self, instances, context, path, sceneRoot)
+        with profiler.phase("instances"):
+            importInstanceNodes(self, instances, context, path, sceneRoot)
 
 
 def load(self, context, filepath=""):
-    importCast(self, context, filepath)
+    # Profiling is opt-in, a disabled profiler ignores every call.
+    self.castProfiler = CastProfiler(os.path.basename(filepath),
+                                     self.import_profile).start()
+
+    try:
+        with self.castProfiler.phase("import"):
+            importCast(self, context, filepath)
+
+            with self.castProfiler.phase("update"):
+                bpy.context.view_layer.update()
+    finally:
+        self.castProfiler.stop()
 
-    bpy.context.view_layer.update()
+    self.castProfiler.write()
@@ -1,4 +1,10 @@
 import bpy
+import os
+import sys
+import multiprocessing
+import concurrent.futures
+
+from .cast import Cast
 
 
 def utilityIsVersionAtLeast(major, minor):
@@ -7,3 +13,34 @@ def utilityIsVersionAtLeast(major, minor):
     elif bpy.app.version[0] == major and bpy.app.version[1] >= minor:
         return True
     return False
+
+
+def utilityCreateCastPool(count):
+    # Loading and saving casts is pure python, so it only pays off to spin up workers for more than one file.
+    if count < 2:
+        return None
+
+    module = sys.modules[Cast.__module__]
+    package = Cast.__module__.rpartition(".")[0]
+
+    # Worker processes can't import the addon package because it requires bpy, so register the package
+    # without running it, and load cast under the same name so nodes pickle to the same classes both ways.
+    bootstrap = "\n".join([
+        "import importlib.util, sys, types",
+        "if %r:" % package,
+        "    package = types.ModuleType(%r)" % package,
+        "    package.__path__ = [%r]" % os.path.dirname(module.__file__),
+        "    sys.modules[%r] = package" % package,
+        "spec = importlib.util.spec_from_file_location(%r, %r)" % (Cast.__module__, module.__file__),
+        "module = importlib.util.module_from_spec(spec)",
+        "sys.modules[%r] = module" % Cast.__module__,
+        "spec.loader.exec_module(module)",
+    ])
+
+    try:
+        return concurrent.futures.ProcessPoolExecutor(max_workers=min(count, os.cpu_count() or 1),
+                                                      mp_context=multiprocessing.get_context("spawn"),
+                                                      initializer=exec,
+                                                      initargs=(bootstrap,))
+    except (OSError, ValueError, NotImplementedError):
+        return None
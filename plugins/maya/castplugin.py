@@ -3,20 +3,25 @@ import json
 import math
 import sys
 import string
+import multiprocessing
 
 import maya.mel as mel
 import maya.cmds as cmds
 import maya.OpenMaya as OpenMaya
 import maya.OpenMayaAnim as OpenMayaAnim
 import maya.OpenMayaMPx as OpenMayaMPx
+import maya.api.OpenMaya as OpenMaya2
+import maya.api.OpenMayaAnim as OpenMayaAnim2
 
 
-from cast import Cast, CastColor, Model, Animation, Instance, Metadata, File, Color
+from cast import Cast, CastColor, CastProfiler, Model, Animation, Instance, Metadata, File, Color
 
 # Minimum weight value to be considered.
 WEIGHT_THRESHOLD = 0.000001
 # Allowed name characters for maya nodes.
 ALLOWED_CHARACTERS = set(string.ascii_letters + string.digits + "_")
+# Number of hair strands created between progress updates.
+HAIR_PROGRESS_STEP = 1000
 
 # Support Python 3.0+
 try:
@@ -25,6 +30,19 @@ try:
 except NameError:
     xrange = range
 
+# Worker processes are only supported on Python 3.0+
+try:
+    import concurrent.futures
+    import multiprocessing.spawn
+except ImportError:
+    concurrent = None
+
+# Buffers are converted in bulk with numpy when maya ships with it.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # Used for various configuration (Persists to disk)
 sceneSettings = {
     "importAtTime": False,
@@ -46,6 +64,8 @@ sceneSettings = {
     "createCurveHairs": True,
     "createMeshHairs": False,
     "setupArnoldHair": True,
+    "profileImport": False,
+    "importWithoutUndo": False,
 }
 
 # Used for runtime configuration (Does not persist to disk)
@@ -53,6 +73,13 @@ runtimeSettings = {
     "retargetScale": 1.0,
 }
 
+# The profiler for the import in progress, nested instance imports report to it as well.
+importProfiler = None
+
+# Rest positions by dag path, read from the castRestPosition attribute once until the scene changes.
+restPositionCache = {}
+restPositionCallbacks = []
+
 # Shared version number
 version = "1.97"
 
@@ -351,6 +378,20 @@ def utilityGetDagPath(pathName):
     return dagPath
 
 
+def utilityGetDependNode2(pathName):
+    selectList = OpenMaya2.MSelectionList()
+    selectList.add(pathName)
+
+    return selectList.getDependNode(0)
+
+
+def utilityGroupBuffer(buffer, size):
+    # Groups a flat buffer into tuples of size, zip does this without a python loop per element.
+    values = iter(buffer)
+
+    return list(zip(*[values] * size))
+
+
 def utilityBoneIndex(list, name):
     for i, v in enumerate(list):
         if v[0] == name:
@@ -409,6 +450,79 @@ def utilityRemoveNamespaces():
                 pass
 
 
+def utilityCreateCastPool(count):
+    # Saving casts is pure python, so it only pays off to spin up workers for more than one file.
+    if concurrent is None or count < 2:
+        return None
+
+    # Maya's own executable can't host worker processes, they have to run in mayapy instead.
+    mayapy = os.path.join(os.environ.get("MAYA_LOCATION", ""), "bin",
+                          "mayapy.exe" if os.name == "nt" else "mayapy")
+
+    if not os.path.isfile(mayapy):
+        return None
+
+    try:
+        context = multiprocessing.get_context("spawn")
+        context.set_executable(mayapy)
+
+        return concurrent.futures.ProcessPoolExecutor(max_workers=min(count, multiprocessing.cpu_count()),
+                                                      mp_context=context)
+    except (OSError, ValueError, NotImplementedError):
+        return None
+
+
+def utilitySaveCasts(outputs):
+    # The spawn executable is shared by the whole session, so it's only swapped for mayapy while we save.
+    if concurrent is not None:
+        executable = multiprocessing.spawn.get_executable()
+
+    pool = utilityCreateCastPool(len(outputs))
+
+    try:
+        if pool is None:
+            for (cast, path) in outputs:
+                cast.save(path)
+            return
+
+        # Each file is written from its own worker process.
+        try:
+            futures = []
+
+            try:
+                for (cast, path) in outputs:
+                    futures.append(pool.submit(Cast.save, cast, path))
+            except (concurrent.futures.process.BrokenProcessPool, OSError):
+                pass
+
+            for (i, (cast, path)) in enumerate(outputs):
+                try:
+                    if i < len(futures):
+                        futures[i].result()
+                        continue
+                except (concurrent.futures.process.BrokenProcessPool, OSError):
+                    pass
+
+                # The workers are unavailable, the rest of the files are written here instead.
+                cast.save(path)
+        finally:
+            pool.shutdown(wait=True)
+    finally:
+        if concurrent is not None:
+            multiprocessing.spawn.set_executable(executable)
+
+
+def utilityBatchExport():
+    directory = cmds.fileDialog2(fileMode=3,
+                                 caption="Batch Export Skeletons",
+                                 okCaption="Export")
+
+    if not directory:
+        return
+
+    exportCastBatch(directory[0])
+
+
 def utilitySetToggleItem(name, value=False):
     if name in sceneSettings:
         sceneSettings[name] = bool(
@@ -564,9 +678,9 @@ def utilityCreateProgress(status="", maximum=0):
     return instance
 
 
-def utilityStepProgress(instance, status=""):
+def utilityStepProgress(instance, status="", step=1):
     try:
-        cmds.progressBar(instance, edit=True, status=status, step=1)
+        cmds.progressBar(instance, edit=True, status=status, step=step)
     except RuntimeError:
         pass
 
@@ -693,6 +807,14 @@ def utilityCreateMenu(refresh=False):
     cmds.menuItem("exportAxis", label="Export Up Axis", annotation="Include up axis information when exporting",
                   checkBox=utilityQueryToggleItem("exportAxis"), command=lambda x: utilitySetToggleItem("exportAxis"))
 
+    cmds.menuItem(divider=True)
+
+    cmds.menuItem("profileImport", label="Profile Import", annotation="Prints a report of where the import spent its time to the script editor",
+                  checkBox=utilityQueryToggleItem("profileImport"), command=lambda x: utilitySetToggleItem("profileImport"))
+
+    cmds.menuItem("importWithoutUndo", label="Import Without Undo", annotation="Speeds up large imports by not recording them in the undo queue, the import can't be undone",
+                  checkBox=utilityQueryToggleItem("importWithoutUndo"), command=lambda x: utilitySetToggleItem("importWithoutUndo"))
+
     cmds.setParent(menu, menu=True)
 
     cmds.menuItem(divider=True)
@@ -702,6 +824,11 @@ def utilityCreateMenu(refresh=False):
 
     cmds.menuItem(divider=True)
 
+    cmds.menuItem(label="Batch Export Skeletons", annotation="Exports each skeleton with its skinned meshes and animation to its own cast file",
+                  command=lambda x: utilityBatchExport())
+
+    cmds.menuItem(divider=True)
+
     cmds.menuItem(label="Reset Scene", annotation="Resets the scene, removing the current animation curves",
                   command=lambda x: utilityClearAnimation())
     cmds.menuItem(label="About", annotation="View information about this plugin",
@@ -771,10 +898,11 @@ def utilityCreateSkinCluster(newMesh, bones=[], maxWeightInfluence=1, skinningMe
 
     cluster = OpenMayaAnim.MFnSkinCluster(clusterObject)
 
+    # Set through the plug, so the only command per mesh is the skinCluster itself.
     if skinningMethod == "linear":
-        cmds.setAttr("%s.skinningMethod" % cluster.name(), 0)
+        cluster.findPlug("skinningMethod").setInt(0)
     elif skinningMethod == "quaternion":
-        cmds.setAttr("%s.skinningMethod" % cluster.name(), 1)
+        cluster.findPlug("skinningMethod").setInt(1)
 
     return cluster
 
@@ -1067,7 +1195,41 @@ def utilityGetRestData(restTransform, component):
         raise Exception("Invalid component was specified!")
 
 
+def utilityClearRestPositionCache(*args):
+    restPositionCache.clear()
+
+
+def utilityGetCachedRestPosition(dagPath):
+    cached = restPositionCache.get(dagPath.fullPathName())
+
+    if cached is None:
+        return None
+
+    # The node at this path may have been deleted and replaced since it was cached.
+    (handle, restTransform) = cached
+
+    if not handle.isAlive() or not handle.object() == dagPath.node():
+        return None
+
+    # Undoing the import that saved it removes the attribute, so the cached rest position is stale too.
+    if not OpenMaya.MFnDependencyNode(dagPath.node()).hasAttribute("castRestPosition"):
+        return None
+
+    # Hand out a copy, so the cached rest position can't be changed through it.
+    return OpenMaya.MTransformationMatrix(restTransform)
+
+
+def utilityCacheRestPosition(dagPath, restTransform):
+    restPositionCache[dagPath.fullPathName()] = \
+        (OpenMaya.MObjectHandle(dagPath.node()), OpenMaya.MTransformationMatrix(restTransform))
+
+
 def utilityGetSavedNodeData(dagPath):
+    restTransform = utilityGetCachedRestPosition(dagPath)
+
+    if restTransform is not None:
+        return restTransform
+
     # At this point we must have the attribute, as it's always called from the save function.
     restTransform = cmds.getAttr(
         "%s.castRestPosition" % dagPath.fullPathName())
@@ -1081,10 +1243,17 @@ def utilityGetSavedNodeData(dagPath):
     # Make the transformation matrix.
     restTransform = OpenMaya.MTransformationMatrix(restTransformMatrix)
 
+    utilityCacheRestPosition(dagPath, restTransform)
+
     return restTransform
 
 
 def utilitySaveNodeData(dagPath):
+    restTransform = utilityGetCachedRestPosition(dagPath)
+
+    if restTransform is not None:
+        return restTransform
+
     # Check if we already had the bone saved, if there is a runtime error, we already have it saved.
     if cmds.objExists("%s.castRestPosition" % dagPath.fullPathName()):
         return utilityGetSavedNodeData(dagPath)
@@ -1116,30 +1285,54 @@ def utilitySaveNodeData(dagPath):
     cmds.setAttr("%s.castRestPosition" %
                  dagPath.fullPathName(), restDoubles, type="matrix")
 
+    utilityCacheRestPosition(dagPath, restTransform)
+
     # Required to handle relative transforms.
     return restTransform
 
 
-def utilityGetOrCreateCurve(name, property, curveType):
+def utilityResolveAnimationNode(nodeCache, name):
+    # Each node is resolved, and its rest position saved, once per animation instead of once per curve.
+    if name in nodeCache:
+        return nodeCache[name]
+
+    nodeCache[name] = None
+
     # Attempt to find the object using the provided name, if that name is not found
     # try a sanitized version, maya automatically does this when we create objects.
-    if not cmds.objExists("%s.%s" % (name, property)):
-        name = utilitySanitizeName(name)
+    nodeName = name
 
-        if not cmds.objExists("%s.%s" % (name, property)):
+    if not cmds.objExists(nodeName):
+        nodeName = utilitySanitizeName(nodeName)
+
+        if not cmds.objExists(nodeName):
             return None
 
     try:
-        nodePath = utilityGetDagPath(name)
+        nodePath = utilityGetDagPath(nodeName)
     except RuntimeError:
-        cmds.warning("Unable to animate \"%s.%s\" due to a name conflict in the scene" % (name,
-                                                                                          property))
+        cmds.warning("Unable to animate \"%s\" due to a name conflict in the scene" % name)
+        return None
+
+    nodeCache[name] = (OpenMaya.MFnDependencyNode(nodePath.node()),
+                       utilitySaveNodeData(nodePath))
+
+    return nodeCache[name]
+
+
+def utilityGetOrCreateCurve(nodeCache, name, property, curveType):
+    resolved = utilityResolveAnimationNode(nodeCache, name)
+
+    if resolved is None:
         return None
 
-    restTransform = utilitySaveNodeData(nodePath)
+    (node, restTransform) = resolved
+
+    try:
+        propertyPlug = node.findPlug(property, False)
+    except RuntimeError:
+        return None
 
-    propertyPlug = \
-        OpenMaya.MFnDependencyNode(nodePath.node()).findPlug(property, False)
     propertyPlug.setKeyable(True)
     propertyPlug.setLocked(False)
 
@@ -1168,64 +1361,138 @@ def utilityGetOrCreateCurve(name, property, curveType):
     return None
 
 
-def utilityImportQuatTrackData(tracks, property, timeUnit, frameStart, frameBuffer, valueBuffer, mode, blendWeight):
-    timeBuffer = OpenMaya.MTimeArray()
+def utilityCreateDoubleArray(values):
+    scriptUtil = OpenMaya.MScriptUtil()
+    scriptUtil.createFromList(values, len(values))
+
+    return OpenMaya.MDoubleArray(scriptUtil.asDoublePtr(), len(values))
 
-    smallestFrame = OpenMaya.MTime(sys.maxsize, timeUnit)
-    largestFrame = OpenMaya.MTime(0, timeUnit)
 
-    valuesX = OpenMaya.MDoubleArray(len(frameBuffer), 0.0)
-    valuesY = OpenMaya.MDoubleArray(len(frameBuffer), 0.0)
-    valuesZ = OpenMaya.MDoubleArray(len(frameBuffer), 0.0)
+def utilityGetTimeBuffer(timeCache, timeUnit, frameStart, frameBuffer):
+    # Curves usually share the same key frames, so each set of times is only built once per animation.
+    key = tuple(frameBuffer)
 
-    trackXExists = tracks[0][0].numKeys() > 0
-    trackYExists = tracks[1][0].numKeys() > 0
-    trackZExists = tracks[2][0].numKeys() > 0
+    if key in timeCache:
+        return timeCache[key]
+
+    offset = frameStart.asUnits(timeUnit)
+    timeBuffer = OpenMaya.MTimeArray()
 
     for frame in frameBuffer:
-        time = OpenMaya.MTime(frame, timeUnit) + frameStart
+        timeBuffer.append(OpenMaya.MTime(frame + offset, timeUnit))
 
-        smallestFrame = min(time, smallestFrame)
-        largestFrame = max(time, largestFrame)
+    if frameBuffer:
+        smallestFrame = OpenMaya.MTime(min(frameBuffer) + offset, timeUnit)
+        largestFrame = OpenMaya.MTime(max(frameBuffer) + offset, timeUnit)
+    else:
+        smallestFrame = OpenMaya.MTime(sys.maxsize, timeUnit)
+        largestFrame = OpenMaya.MTime(0, timeUnit)
 
-        timeBuffer.append(time)
+    timeCache[key] = (timeBuffer, smallestFrame, largestFrame)
 
-    if mode == "absolute" or mode is None:
-        for i in xrange(0, len(valueBuffer), 4):
-            slot = int(i / 4)
-            euler = OpenMaya.MQuaternion(valueBuffer[i],
-                                         valueBuffer[i + 1],
-                                         valueBuffer[i + 2],
-                                         valueBuffer[i + 3]).asEulerRotation()
+    return timeCache[key]
 
-            valuesX[slot] = euler.x
-            valuesY[slot] = euler.y
-            valuesZ[slot] = euler.z
+
+def utilitySampleCurve(curve, timeBuffer, rest):
+    # Samples an existing curve at every time up front, or the rest value when it has no keys.
+    if curve.numKeys() == 0:
+        return [rest] * timeBuffer.length()
+
+    return [curve.evaluate(timeBuffer[i]) for i in xrange(timeBuffer.length())]
+
+
+def utilityQuaternionsToEulers(valueBuffer):
+    # Converts (x, y, z, w) quaternions to xyz euler rotations in radians, matching MQuaternion.asEulerRotation.
+    if numpy is not None:
+        quats = numpy.asarray(valueBuffer, dtype=numpy.float64).reshape(-1, 4)
+        quats = quats / \
+            numpy.maximum(numpy.linalg.norm(quats, axis=1), 1e-12)[:, None]
+
+        (x, y, z, w) = (quats[:, 0], quats[:, 1], quats[:, 2], quats[:, 3])
+
+        eulerX = numpy.arctan2(2.0 * (w * x + y * z), 1.0 - 2.0 * (x * x + y * y))
+        eulerY = numpy.arcsin(numpy.clip(2.0 * (w * y - z * x), -1.0, 1.0))
+        eulerZ = numpy.arctan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+
+        return (eulerX.tolist(), eulerY.tolist(), eulerZ.tolist())
+
+    eulerX = []
+    eulerY = []
+    eulerZ = []
+
+    for i in xrange(0, len(valueBuffer), 4):
+        euler = OpenMaya.MQuaternion(valueBuffer[i],
+                                     valueBuffer[i + 1],
+                                     valueBuffer[i + 2],
+                                     valueBuffer[i + 3]).asEulerRotation()
+
+        eulerX.append(euler.x)
+        eulerY.append(euler.y)
+        eulerZ.append(euler.z)
+
+    return (eulerX, eulerY, eulerZ)
+
+
+def utilityEulersToQuaternions(valueBuffer, orient):
+    # Converts xyz euler rotations in radians to (x, y, z, w) quaternions, each followed by orient.
+    if numpy is not None:
+        eulers = numpy.asarray(valueBuffer, dtype=numpy.float64).reshape(-1, 3)
+
+        (cx, cy, cz) = numpy.cos(eulers * 0.5).T
+        (sx, sy, sz) = numpy.sin(eulers * 0.5).T
+
+        x = sx * cy * cz - cx * sy * sz
+        y = cx * sy * cz + sx * cy * sz
+        z = cx * cy * sz - sx * sy * cz
+        w = cx * cy * cz + sx * sy * sz
+
+        # Rotating by the euler then the orient, the same as MQuaternion's euler * orient.
+        quats = numpy.stack((orient.w * x + orient.x * w + orient.y * z - orient.z * y,
+                             orient.w * y - orient.x * z + orient.y * w + orient.z * x,
+                             orient.w * z + orient.x * y - orient.y * x + orient.z * w,
+                             orient.w * w - orient.x * x - orient.y * y - orient.z * z), axis=1)
+
+        return [tuple(quat) for quat in quats.tolist()]
+
+    quats = []
+
+    for i in xrange(0, len(valueBuffer), 3):
+        value = OpenMaya.MEulerRotation(valueBuffer[i],
+                                        valueBuffer[i + 1],
+                                        valueBuffer[i + 2]).asQuaternion() * orient
+
+        quats.append((value.x, value.y, value.z, value.w))
+
+    return quats
+
+
+def utilityImportQuatTrackData(tracks, property, timeUnit, frameStart, frameBuffer, valueBuffer, mode, blendWeight, timeCache):
+    (timeBuffer, smallestFrame, largestFrame) = \
+        utilityGetTimeBuffer(timeCache, timeUnit, frameStart, frameBuffer)
+
+    if timeBuffer.length() <= 0:
+        return (smallestFrame, largestFrame)
+
+    if mode == "absolute" or mode is None:
+        (valuesX, valuesY, valuesZ) = utilityQuaternionsToEulers(valueBuffer)
     elif mode == "additive":
         rest = utilityGetRestData(tracks[0][1],
                                   "rotation_quaternion").asEulerRotation()
 
-        for i in xrange(0, len(valueBuffer), 4):
-            slot = int(i / 4)
+        samplesX = utilitySampleCurve(tracks[0][0], timeBuffer, rest.x)
+        samplesY = utilitySampleCurve(tracks[1][0], timeBuffer, rest.y)
+        samplesZ = utilitySampleCurve(tracks[2][0], timeBuffer, rest.z)
 
-            frame = timeBuffer[slot]
+        valuesX = [0.0] * timeBuffer.length()
+        valuesY = [0.0] * timeBuffer.length()
+        valuesZ = [0.0] * timeBuffer.length()
 
-            if trackXExists:
-                sampleX = tracks[0][0].evaluate(frame)
-            else:
-                sampleX = rest.x
-            if trackYExists:
-                sampleY = tracks[1][0].evaluate(frame)
-            else:
-                sampleY = rest.y
-            if trackZExists:
-                sampleZ = tracks[2][0].evaluate(frame)
-            else:
-                sampleZ = rest.z
+        for slot in xrange(timeBuffer.length()):
+            i = slot * 4
 
-            additiveQuat = OpenMaya.MEulerRotation(sampleX,
-                                                   sampleY,
-                                                   sampleZ).asQuaternion()
+            additiveQuat = OpenMaya.MEulerRotation(samplesX[slot],
+                                                   samplesY[slot],
+                                                   samplesZ[slot]).asQuaternion()
             frameQuat = OpenMaya.MQuaternion(valueBuffer[i],
                                              valueBuffer[i + 1],
                                              valueBuffer[i + 2],
@@ -1241,8 +1508,12 @@ def utilityImportQuatTrackData(tracks, property, timeUnit, frameStart, frameBuff
     elif mode == "relative":
         rest = utilityGetRestData(tracks[0][1], "rotation_quaternion")
 
-        for i in xrange(0, len(valueBuffer), 4):
-            slot = int(i / 4)
+        valuesX = [0.0] * timeBuffer.length()
+        valuesY = [0.0] * timeBuffer.length()
+        valuesZ = [0.0] * timeBuffer.length()
+
+        for slot in xrange(timeBuffer.length()):
+            i = slot * 4
             frame = OpenMaya.MQuaternion(valueBuffer[i],
                                          valueBuffer[i + 1],
                                          valueBuffer[i + 2],
@@ -1253,31 +1524,31 @@ def utilityImportQuatTrackData(tracks, property, timeUnit, frameStart, frameBuff
             valuesX[slot] = euler.x
             valuesY[slot] = euler.y
             valuesZ[slot] = euler.z
-
-    if timeBuffer.length() <= 0:
+    else:
         return (smallestFrame, largestFrame)
 
+    # One call per channel with every key.
     tracks[0][0].addKeys(timeBuffer,
-                         valuesX,
+                         utilityCreateDoubleArray(valuesX),
                          OpenMayaAnim.MFnAnimCurve.kTangentLinear,
                          OpenMayaAnim.MFnAnimCurve.kTangentLinear)
 
     tracks[1][0].addKeys(timeBuffer,
-                         valuesY,
+                         utilityCreateDoubleArray(valuesY),
                          OpenMayaAnim.MFnAnimCurve.kTangentLinear,
                          OpenMayaAnim.MFnAnimCurve.kTangentLinear)
 
     tracks[2][0].addKeys(timeBuffer,
-                         valuesZ,
+                         utilityCreateDoubleArray(valuesZ),
                          OpenMayaAnim.MFnAnimCurve.kTangentLinear,
                          OpenMayaAnim.MFnAnimCurve.kTangentLinear)
 
     return (smallestFrame, largestFrame)
 
 
-def utilityImportBlendShapeTrackData(shapeName, timeUnit, frameStart, frameBuffer, valueBuffer):
-    smallestFrame = OpenMaya.MTime(sys.maxsize, timeUnit)
-    largestFrame = OpenMaya.MTime(0, timeUnit)
+def utilityImportBlendShapeTrackData(shapeName, timeUnit, frameStart, frameBuffer, valueBuffer, timeCache):
+    (timeBuffer, smallestFrame, largestFrame) = \
+        utilityGetTimeBuffer(timeCache, timeUnit, frameStart, frameBuffer)
 
     deformers = []
 
@@ -1290,29 +1561,17 @@ def utilityImportBlendShapeTrackData(shapeName, timeUnit, frameStart, frameBuffe
     if not deformers:
         cmds.warning(
             "Skipping blend shape track \"%s\" no matching deformer was found." % shapeName)
+        return (OpenMaya.MTime(sys.maxsize, timeUnit), OpenMaya.MTime(0, timeUnit))
+
+    if timeBuffer.length() <= 0:
         return (smallestFrame, largestFrame)
 
     track = OpenMayaAnim.MFnAnimCurve()
     track.create(OpenMayaAnim.MFnAnimCurve.kAnimCurveTL)
     track.setName("%s_weight" % shapeName)
 
-    timeBuffer = OpenMaya.MTimeArray()
-    curveValueBuffer = OpenMaya.MDoubleArray(len(valueBuffer), 0.0)
-
-    for i, frame in enumerate(frameBuffer):
-        time = OpenMaya.MTime(frame, timeUnit) + frameStart
-
-        smallestFrame = min(time, smallestFrame)
-        largestFrame = max(time, largestFrame)
-
-        timeBuffer.append(time)
-        curveValueBuffer[i] = valueBuffer[i]
-
-    if timeBuffer.length() <= 0:
-        return (smallestFrame, largestFrame)
-
     track.addKeys(timeBuffer,
-                  curveValueBuffer,
+                  utilityCreateDoubleArray(valueBuffer),
                   OpenMayaAnim.MFnAnimCurve.kTangentLinear,
                   OpenMayaAnim.MFnAnimCurve.kTangentLinear)
 
@@ -1323,29 +1582,17 @@ def utilityImportBlendShapeTrackData(shapeName, timeUnit, frameStart, frameBuffe
     return (smallestFrame, largestFrame)
 
 
-def utilityImportSingleTrackData(tracks, property, timeUnit, frameStart, frameBuffer, valueBuffer, mode, blendWeight):
-    timeBuffer = OpenMaya.MTimeArray()
-
-    smallestFrame = OpenMaya.MTime(sys.maxsize, timeUnit)
-    largestFrame = OpenMaya.MTime(0, timeUnit)
+def utilityImportSingleTrackData(tracks, property, timeUnit, frameStart, frameBuffer, valueBuffer, mode, blendWeight, timeCache):
+    (timeBuffer, smallestFrame, largestFrame) = \
+        utilityGetTimeBuffer(timeCache, timeUnit, frameStart, frameBuffer)
 
     # We must have one track here
-    if None in tracks:
+    if None in tracks or timeBuffer.length() <= 0:
         return (smallestFrame, largestFrame)
 
     track = tracks[0][0]
-    trackExists = track.numKeys() > 0
-
     restTransform = tracks[0][1]
 
-    for frame in frameBuffer:
-        time = OpenMaya.MTime(frame, timeUnit) + frameStart
-
-        smallestFrame = min(time, smallestFrame)
-        largestFrame = max(time, largestFrame)
-
-        timeBuffer.append(time)
-
     restSwitcher = {
         "tx": lambda: utilityGetRestData(restTransform, "translation")[0],
         "ty": lambda: utilityGetRestData(restTransform, "translation")[1],
@@ -1365,48 +1612,38 @@ def utilityImportSingleTrackData(tracks, property, timeUnit, frameStart, frameBu
     else:
         scaleFactor = 1.0
 
+    isScale = property in ["sx", "sy", "sz"]
+
     # Default track mode is absolute meaning that the
     # values are what they should be in the curve already
     if mode == "absolute" or mode is None:
-        curveValueBuffer = OpenMaya.MDoubleArray(len(valueBuffer), 0.0)
-
-        for i, value in enumerate(valueBuffer):
-            curveValueBuffer[i] = value * scaleFactor
+        if scaleFactor == 1.0:
+            curveValues = valueBuffer
+        else:
+            curveValues = [x * scaleFactor for x in valueBuffer]
     # Additive curves are applied to any existing curve value in the scene
     # so we will add it to the sample at the given time
     elif mode == "additive":
-        curveValueBuffer = OpenMaya.MDoubleArray(len(valueBuffer), 0.0)
-
-        for i, value in enumerate(valueBuffer):
-            if trackExists:
-                sample = track.evaluate(timeBuffer[i])
-            else:
-                sample = rest
+        samples = utilitySampleCurve(track, timeBuffer, rest)
 
-            if property in ["sx", "sy", "sz"]:
-                curveValueBuffer[i] = utilityLerp(sample,
-                                                  sample * value * scaleFactor,
-                                                  blendWeight)
-            else:
-                curveValueBuffer[i] = utilityLerp(sample,
-                                                  sample + value * scaleFactor,
-                                                  blendWeight)
+        if isScale:
+            curveValues = [utilityLerp(sample, sample * value * scaleFactor, blendWeight)
+                           for (sample, value) in zip(samples, valueBuffer)]
+        else:
+            curveValues = [utilityLerp(sample, sample + value * scaleFactor, blendWeight)
+                           for (sample, value) in zip(samples, valueBuffer)]
     # Relative curves are applied against the resting position value in the scene
     # we will add it to the rest position
     elif mode == "relative":
-        curveValueBuffer = OpenMaya.MDoubleArray(len(valueBuffer), 0.0)
-
-        for i, value in enumerate(valueBuffer):
-            if property in ["sx", "sy", "sz"]:
-                curveValueBuffer[i] = rest * value * scaleFactor
-            else:
-                curveValueBuffer[i] = rest + value * scaleFactor
-
-    if timeBuffer.length() <= 0:
+        if isScale:
+            curveValues = [rest * value * scaleFactor for value in valueBuffer]
+        else:
+            curveValues = [rest + value * scaleFactor for value in valueBuffer]
+    else:
         return (smallestFrame, largestFrame)
 
     track.addKeys(timeBuffer,
-                  curveValueBuffer,
+                  utilityCreateDoubleArray(curveValues),
                   OpenMayaAnim.MFnAnimCurve.kTangentLinear,
                   OpenMayaAnim.MFnAnimCurve.kTangentLinear)
 
@@ -1725,31 +1962,37 @@ def importSkeletonNode(skeleton):
 
     progress = utilityCreateProgress("Importing skeleton...", len(bones) * 3)
 
+    # Joints are created, named, and parented in one modifier instead of a command per joint.
+    modifier = OpenMaya.MDagModifier()
+    nodes = [None] * len(bones)
+
     for i, bone in enumerate(bones):
-        newBone = OpenMayaAnim.MFnIkJoint()
-        newBone.create(jointNode)
-        newBone.setName(bone.Name())
-        handles[i] = newBone
+        nodes[i] = modifier.createNode("joint", jointNode)
+        modifier.renameNode(nodes[i], bone.Name())
         indexes[bone.Hash()] = i
 
         utilityStepProgress(progress, "Importing skeleton...")
 
     for i, bone in enumerate(bones):
         if bone.ParentIndex() > -1:
-            cmds.parent(handles[i].fullPathName(),
-                        handles[bone.ParentIndex()].fullPathName())
+            modifier.reparentNode(nodes[i], nodes[bone.ParentIndex()])
 
         utilityStepProgress(progress, "Importing skeleton...")
 
+    modifier.doIt()
+
+    modifier = OpenMaya.MDGModifier()
+
     for i, bone in enumerate(bones):
-        newBone = handles[i]
+        newBone = OpenMayaAnim.MFnIkJoint(nodes[i])
+        handles[i] = newBone
         paths[i] = newBone.fullPathName()
 
         ssc = bone.SegmentScaleCompensate()
         segmentScaleCompensate = newBone.findPlug("segmentScaleCompensate")
 
         if segmentScaleCompensate is not None:
-            segmentScaleCompensate.setBool(bool(ssc))
+            modifier.newPlugValueBool(segmentScaleCompensate, bool(ssc))
 
         if bone.LocalPosition() is not None:
             localPos = bone.LocalPosition()
@@ -1769,11 +2012,33 @@ def importSkeletonNode(skeleton):
             newBone.setScale(scaleUtility.asDoublePtr())
 
         utilityStepProgress(progress, "Importing skeleton...")
+
+    modifier.doIt()
+
     utilityEndProgress(progress)
 
     return (handles, paths, indexes, jointTransform)
 
 
+def utilityAliasBlendShapeWeight(deformerName, index, name):
+    weight = "%s.weight[%d]" % (deformerName, index)
+
+    # Names can clash with other attributes or shapes once sanitized, so suffix them until one is free.
+    sanitized = utilitySanitizeName(name)
+    aliases = [name, sanitized] + \
+        ["%s_%d" % (sanitized, x) for x in xrange(1, 100)]
+
+    for alias in aliases:
+        try:
+            cmds.aliasAttr(alias, weight)
+            return alias
+        except RuntimeError:
+            continue
+
+    cmds.warning("Unable to name blend shape weight: %s, leaving it unnamed." % weight)
+    return None
+
+
 def importMaterialNode(path, material):
     # If you already created the material, ignore this
     if cmds.objExists("%sSG" % material.Name()):
@@ -1795,6 +2060,8 @@ def importMaterialNode(path, material):
 
 
 def importModelNode(model, path):
+    profiler = importProfiler
+
     # If we want to merge this model, grab the 'existing' skeleton
     sceneSkeleton = None
 
@@ -1802,9 +2069,12 @@ def importModelNode(model, path):
         sceneSkeleton = utilityGetSceneSkeleton()
 
     # Import skeleton for binds, materials for meshes
-    (handles, paths, indexes, jointTransform) = importSkeletonNode(model.Skeleton())
-    materials = {x.Name(): importMaterialNode(path, x)
-                 for x in model.Materials()}
+    with profiler.phase("skeleton"):
+        (handles, paths, indexes, jointTransform) = importSkeletonNode(model.Skeleton())
+
+    with profiler.phase("materials"):
+        materials = {x.Name(): importMaterialNode(path, x)
+                     for x in model.Materials()}
 
     # Import the meshes
     meshTransform = OpenMaya.MFnTransform()
@@ -1816,425 +2086,446 @@ def importModelNode(model, path):
     progress = utilityCreateProgress("Importing meshes...", len(meshes))
     meshHandles = {}
 
-    for m, mesh in enumerate(meshes):
-        newMeshTransform = OpenMaya.MFnTransform()
-        newMeshNode = newMeshTransform.create(meshNode)
-        newMeshTransform.setName(mesh.Name() or "CastMesh")
-
-        faces = list(mesh.FaceBuffer())
-        facesRemoved = 0
-
-        # Remove any degenerate faces before giving it to the mesh.
-        for i in xrange(len(faces) - 3, -1, -3):
-            remove = False
-
-            if faces[i] == faces[i + 1]:
-                facesRemoved += 1
-                remove = True
-            elif faces[i] == faces[i + 2]:
-                facesRemoved += 1
-                remove = True
-            elif faces[i + 1] == faces[i + 2]:
-                facesRemoved += 1
-                remove = True
-
-            if remove:
-                del faces[i + 2]
-                del faces[i + 1]
-                del faces[i]
-
-        # Warn the user that this took place.
-        if facesRemoved > 0:
-            cmds.warning("Removed %d degenerate faces from %s" %
-                         (facesRemoved, newMeshTransform.name()))
-
-        # Triangle count / vertex count
-        faceCount = int(mesh.FaceCount()) - facesRemoved
-        vertexCount = int(mesh.VertexCount())
-
-        scriptUtil = OpenMaya.MScriptUtil()
-        scriptUtil.createFromList(faces, len(faces))
-
-        faceBuffer = OpenMaya.MIntArray(scriptUtil.asIntPtr(), len(faces))
-        faceCountBuffer = OpenMaya.MIntArray(faceCount, 3)
-
-        vertexPositions = mesh.VertexPositionBuffer()
-        scriptUtil = OpenMaya.MScriptUtil()
-        scriptUtil.createFromList([x for y in (vertexPositions[i:i + 3] + tuple([1.0]) *
-                                               (i < len(vertexPositions) - 2) for i in xrange(0, len(vertexPositions), 3)) for x in y], vertexCount)
-
-        vertexPositionBuffer = \
-            OpenMaya.MFloatPointArray(scriptUtil.asFloat4Ptr(), vertexCount)
-
-        newMesh = OpenMaya.MFnMesh()
-        # Store the mesh for reference in other nodes later
-        meshHandles[mesh.Hash()] = newMesh.create(vertexCount, faceCount, vertexPositionBuffer,
-                                                  faceCountBuffer, faceBuffer, newMeshNode)
-        newMesh.setName(mesh.Name() or "CastShape")
-
-        scriptUtil = OpenMaya.MScriptUtil()
-        scriptUtil.createFromList(
-            [x for x in xrange(vertexCount)], vertexCount)
-
-        vertexIndexBuffer = OpenMaya.MIntArray(
-            scriptUtil.asIntPtr(), vertexCount)
-
-        # Each channel after position / faces is optional
-        # meaning we should completely ignore null buffers here
-        # even though you *should* have them
-
-        vertexNormals = mesh.VertexNormalBuffer()
-        if vertexNormals is not None:
-            scriptUtil = OpenMaya.MScriptUtil()
-            scriptUtil.createFromList(
-                [x for x in vertexNormals], len(vertexNormals))
-
-            vertexNormalBuffer = OpenMaya.MVectorArray(
-                scriptUtil.asFloat3Ptr(), int(len(vertexNormals) / 3))
-
-            newMesh.setVertexNormals(vertexNormalBuffer, vertexIndexBuffer)
-
-        colorLayerCount = mesh.ColorLayerCount()
-        for i in xrange(colorLayerCount):
-            colorLayer = mesh.VertexColorLayerBuffer(i)
-            colorLayerPacked = mesh.VertexColorLayerBufferPacked(i)
-
-            scriptUtil = OpenMaya.MScriptUtil()
-
-            if colorLayerPacked:
-                colors = len(colorLayer)
-                scriptUtil.createFromList(
-                    [x for xs in [CastColor.fromInteger(x) for x in colorLayer] for x in xs], colors * 4)
-            else:
-                colors = int(len(colorLayer) / 4)
-                scriptUtil.createFromList(colorLayer, colors * 4)
+    # Meshes are assigned to their shading groups once every mesh exists, with one command per group.
+    shadingGroups = {}
 
-            vertexColorBuffer = OpenMaya.MColorArray(
-                scriptUtil.asFloat4Ptr(), colors)
+    with profiler.phase("meshes"):
+        # Mesh transforms are created and named in one modifier instead of one at a time.
+        modifier = OpenMaya.MDagModifier()
+        meshNodes = [None] * len(meshes)
 
-            newColorName = newMesh.createColorSetWithName("color%d" % i)
+        for m, mesh in enumerate(meshes):
+            meshNodes[m] = modifier.createNode("transform", meshNode)
+            modifier.renameNode(meshNodes[m], mesh.Name() or "CastMesh")
 
-            newMesh.setCurrentColorSetName(newColorName)
-            newMesh.setVertexColors(vertexColorBuffer, vertexIndexBuffer)
+        modifier.doIt()
 
-        uvLayerCount = mesh.UVLayerCount()
+        for m, mesh in enumerate(meshes):
+            newMeshTransform = OpenMaya.MFnTransform(meshNodes[m])
 
-        scriptUtil = OpenMaya.MScriptUtil()
-        scriptUtil.createFromList([x for x in xrange(len(faces))], len(faces))
+            # Remove any degenerate faces before giving it to the mesh.
+            facesRemoved = mesh.RemoveDegenerateFaces()
+            faces = mesh.FaceBuffer()
 
-        faceIndexBuffer = OpenMaya.MIntArray(
-            scriptUtil.asIntPtr(), len(faces))
+            # Warn the user that this took place.
+            if facesRemoved > 0:
+                cmds.warning("Removed %d degenerate faces from %s" %
+                             (facesRemoved, newMeshTransform.name()))
 
-        # Set a material, or default.
-        meshMaterial = mesh.Material()
-        try:
-            if meshMaterial is not None:
-                cmds.sets(newMesh.fullPathName(), forceElement=(
-                    "%sSG" % materials[meshMaterial.Name()]))
-            else:
-                cmds.sets(newMesh.fullPathName(),
-                          forceElement="initialShadingGroup")
-        except RuntimeError:
-            pass
+            # Triangle count / vertex count
+            faceCount = int(mesh.FaceCount())
+            vertexCount = int(mesh.VertexCount())
 
-        for i in xrange(uvLayerCount):
-            uvLayer = mesh.VertexUVLayerBuffer(i)
-            scriptUtil = OpenMaya.MScriptUtil()
-            scriptUtil.createFromList([y for xs in [uvLayer[faces[x] * 2:faces[x] * 2 + 1]
-                                                    for x in xrange(len(faces))] for y in xs], len(faces))
+            profiler.count("meshes")
+            profiler.count("meshes.vertices", vertexCount)
+            profiler.count("meshes.faces", faceCount)
+            profiler.count("meshes.degenerate_faces", facesRemoved)
 
-            uvUBuffer = OpenMaya.MFloatArray(
-                scriptUtil.asFloatPtr(), len(faces))
+            # Buffers are handed to OpenMaya 2.0 arrays whole, so they're copied in C instead of
+            # one element at a time through MScriptUtil.
+            faceBuffer = OpenMaya2.MIntArray(faces)
+            faceCountBuffer = OpenMaya2.MIntArray(faceCount, 3)
 
-            scriptUtil = OpenMaya.MScriptUtil()
-            scriptUtil.createFromList([1.0 - y for xs in [uvLayer[faces[x] * 2 + 1:faces[x] * 2 + 2]
-                                                          for x in xrange(len(faces))] for y in xs], len(faces))
+            vertexPositionBuffer = OpenMaya2.MFloatPointArray(
+                utilityGroupBuffer(mesh.VertexPositionBuffer(), 3))
 
-            uvVBuffer = OpenMaya.MFloatArray(
-                scriptUtil.asFloatPtr(), len(faces))
+            newMesh = OpenMaya2.MFnMesh()
+            newMesh.create(vertexPositionBuffer, faceCountBuffer, faceBuffer,
+                           parent=utilityGetDependNode2(newMeshTransform.fullPathName()))
+            newMesh.setName(mesh.Name() or "CastShape")
 
-            if i > 0:
-                newUVName = newMesh.createUVSetWithName(
-                    "map%d" % (i + 1))
-            else:
-                newUVName = newMesh.currentUVSetName()
+            # Store the mesh for reference in other nodes later
+            meshHandles[mesh.Hash()] = \
+                utilityGetDagPath(newMesh.fullPathName()).node()
+
+            vertexIndexBuffer = OpenMaya2.MIntArray(list(xrange(vertexCount)))
 
-            newMesh.setCurrentUVSetName(newUVName)
-            newMesh.setUVs(
-                uvUBuffer, uvVBuffer, newUVName)
-            newMesh.assignUVs(
-                faceCountBuffer, faceIndexBuffer, newUVName)
+            # Each channel after position / faces is optional
+            # meaning we should completely ignore null buffers here
+            # even though you *should* have them
 
-        maximumInfluence = mesh.MaximumWeightInfluence()
-        skinningMethod = mesh.SkinningMethod()
+            vertexNormals = mesh.VertexNormalBuffer()
+            if vertexNormals is not None:
+                vertexNormalBuffer = OpenMaya2.MVectorArray(
+                    utilityGroupBuffer(vertexNormals, 3))
 
-        if maximumInfluence > 0 and sceneSettings["importSkin"]:
-            weightBoneBuffer = mesh.VertexWeightBoneBuffer()
-            weightValueBuffer = mesh.VertexWeightValueBuffer()
-            weightedBones = list({paths[x] for x in weightBoneBuffer})
-            weightedBonesCount = len(weightedBones)
+                newMesh.setVertexNormals(vertexNormalBuffer, vertexIndexBuffer)
 
-            skinCluster = utilityCreateSkinCluster(
-                newMesh, weightedBones, maximumInfluence, skinningMethod)
+            colorLayerCount = mesh.ColorLayerCount()
+            for i in xrange(colorLayerCount):
+                colorLayer = mesh.VertexColorLayerBuffer(i)
+                colorLayerPacked = mesh.VertexColorLayerBufferPacked(i)
 
-            weightedRemap = {paths.index(
-                x): i for i, x in enumerate(weightedBones)}
+                if colorLayerPacked:
+                    vertexColorBuffer = OpenMaya2.MColorArray(
+                        [CastColor.fromInteger(x) for x in colorLayer])
+                else:
+                    vertexColorBuffer = OpenMaya2.MColorArray(
+                        utilityGroupBuffer(colorLayer, 4))
+
+                newColorName = newMesh.createColorSet("color%d" % i, False)
+
+                newMesh.setCurrentColorSetName(newColorName)
+                newMesh.setVertexColors(vertexColorBuffer, vertexIndexBuffer)
+
+            uvLayerCount = mesh.UVLayerCount()
 
-            clusterAttrBase = skinCluster.name() + ".weightList[%d]"
-            clusterAttrArray = (".weights[0:%d]" % (weightedBonesCount - 1))
+            # Set a material, or default.
+            meshMaterial = mesh.Material()
+
+            if meshMaterial is not None:
+                shadingGroup = "%sSG" % materials[meshMaterial.Name()]
+            else:
+                shadingGroup = "initialShadingGroup"
 
-            weightedValueBuffer = [0.0] * (weightedBonesCount)
+            shadingGroups.setdefault(shadingGroup, []).append(newMesh.fullPathName())
 
-            for i in xrange(vertexCount):
-                if weightedBonesCount == 1:
-                    clusterAttrPayload = clusterAttrBase % i + ".weights[0]"
-                    weightedValueBuffer[0] = 1.0
+            # Uvs are stored per vertex, so they're set once per vertex and shared by each face using it.
+            for i in xrange(uvLayerCount):
+                uvLayer = mesh.VertexUVLayerBuffer(i)
+
+                uvUBuffer = OpenMaya2.MFloatArray(uvLayer[0::2])
+                uvVBuffer = OpenMaya2.MFloatArray([1.0 - x for x in uvLayer[1::2]])
+
+                if i > 0:
+                    newUVName = newMesh.createUVSet("map%d" % (i + 1))
                 else:
-                    clusterAttrPayload = clusterAttrBase % i + clusterAttrArray
+                    newUVName = newMesh.currentUVSetName()
 
-                    for j in xrange(maximumInfluence):
-                        weightIndex = j + (i * maximumInfluence)
-                        weightBone = weightBoneBuffer[weightIndex]
-                        weightValue = weightValueBuffer[weightIndex]
+                newMesh.setCurrentUVSetName(newUVName)
+                newMesh.setUVs(uvUBuffer, uvVBuffer, newUVName)
+                newMesh.assignUVs(faceCountBuffer, faceBuffer, newUVName)
 
-                        weightedValueBuffer[weightedRemap[weightBone]
-                                            ] += weightValue
+            maximumInfluence = mesh.MaximumWeightInfluence()
+            skinningMethod = mesh.SkinningMethod()
 
-                cmds.setAttr(clusterAttrPayload, *weightedValueBuffer)
-                weightedValueBuffer = [0.0] * (weightedBonesCount)
+            if maximumInfluence > 0 and sceneSettings["importSkin"]:
+                with profiler.phase("skin"):
+                    profiler.count("meshes.weights", vertexCount * maximumInfluence)
 
-        utilityStepProgress(
-            progress, "Importing mesh [%d] of [%d]..." % (m + 1, len(meshes)))
-    utilityEndProgress(progress)
+                    weightBoneBuffer = mesh.VertexWeightBoneBuffer()
+                    weightValueBuffer = mesh.VertexWeightValueBuffer()
+                    weightedBones = list({paths[x] for x in weightBoneBuffer})
 
-    # Import the hairs if necessary.
-    if sceneSettings["importHair"]:
-        hairs = model.Hairs()
+                    skinCluster = utilityCreateSkinCluster(
+                        newMesh, weightedBones, maximumInfluence, skinningMethod)
 
-        for h, hair in enumerate(hairs):
-            segmentsBuffer = hair.SegmentsBuffer()
-            particleBuffer = hair.ParticleBuffer()
-            particleOffset = 0
+                    if skinCluster is None:
+                        cmds.warning("Failed to create a skin cluster for %s" %
+                                     newMeshTransform.name())
+                    else:
+                        clusterFn = OpenMayaAnim2.MFnSkinCluster(
+                            utilityGetDependNode2(skinCluster.name()))
+
+                        # Map each bone to its influence index, in the order the cluster reports them.
+                        influencePaths = clusterFn.influenceObjects()
+                        influenceCount = len(influencePaths)
+                        influenceIndices = {influencePaths[i].fullPathName(): i
+                                            for i in xrange(influenceCount)}
+
+                        weightedRemap = {x: influenceIndices[paths[x]]
+                                         for x in set(weightBoneBuffer)}
+
+                        # The whole vertex by influence weight matrix is built once, then applied
+                        # to every vertex in a single call instead of one setAttr per vertex.
+                        if influenceCount == 1:
+                            weightedValueBuffer = [1.0] * vertexCount
+                        else:
+                            weightedValueBuffer = [0.0] * (vertexCount * influenceCount)
+
+                            for i in xrange(vertexCount * maximumInfluence):
+                                weightedValueBuffer[(i // maximumInfluence) * influenceCount +
+                                                    weightedRemap[weightBoneBuffer[i]]] += weightValueBuffer[i]
+
+                        vertexComponent = OpenMaya2.MFnSingleIndexedComponent()
+                        vertexComponents = vertexComponent.create(
+                            OpenMaya2.MFn.kMeshVertComponent)
+                        vertexComponent.setCompleteData(vertexCount)
+
+                        clusterFn.setWeights(newMesh.getPath(),
+                                             vertexComponents,
+                                             OpenMaya2.MIntArray(
+                                                 list(xrange(influenceCount))),
+                                             OpenMaya2.MDoubleArray(weightedValueBuffer),
+                                             False)
+
+            utilityStepProgress(
+                progress, "Importing mesh [%d] of [%d]..." % (m + 1, len(meshes)))
+
+        for (shadingGroup, meshPaths) in shadingGroups.items():
+            try:
+                cmds.sets(*meshPaths, forceElement=shadingGroup)
+            except RuntimeError:
+                pass
 
-            strandCount = hair.StrandCount()
+        utilityEndProgress(progress)
 
-            hairTransform = OpenMaya.MFnTransform()
-            hairTransformNode = hairTransform.create(meshNode)
-            hairTransform.setName(hair.Name() or "CastHair")
+    # Import the hairs if necessary.
+    if sceneSettings["importHair"]:
+        hairs = model.Hairs()
 
-            status = "Importing hair [%d] of [%d]..." % (h + 1, len(hairs))
-            progress = utilityCreateProgress(status, strandCount)
+        with profiler.phase("hair"):
+            for h, hair in enumerate(hairs):
+                segmentsBuffer = hair.SegmentsBuffer()
+                particleBuffer = hair.ParticleBuffer()
+                particleOffset = 0
 
-            # Curve hair is the best option for accuracy
-            # Mesh hair can be used as a light weight fallback method.
-            if sceneSettings["createCurveHairs"]:
-                for s in xrange(strandCount):
-                    segment = segmentsBuffer[s]
-                    points = OpenMaya.MPointArray(segment + 1)
+                strandCount = hair.StrandCount()
 
-                    for pt in xrange(segment + 1):
-                        points.set(pt, particleBuffer[particleOffset * 3],
-                                   particleBuffer[particleOffset * 3 + 1],
-                                   particleBuffer[particleOffset * 3 + 2], 1.0)
-                        particleOffset += 1
+                profiler.count("hair.strands", strandCount)
 
-                    curveTransform = OpenMaya.MFnTransform()
-                    curveTransformNode = \
-                        curveTransform.create(hairTransformNode)
-                    curveTransform.setName("CastStrand")
+                hairTransform = OpenMaya.MFnTransform()
+                hairTransformNode = hairTransform.create(meshNode)
+                hairTransform.setName(hair.Name() or "CastHair")
 
-                    curve = OpenMaya.MFnNurbsCurve()
-                    curve.createWithEditPoints(
-                        # Always use the default degree 3 curve unless we don't have enough points.
-                        points, 3 if segment >= 3 else 1, OpenMaya.MFnNurbsCurve.kOpen, False, False, False, curveTransformNode)
+                status = "Importing hair [%d] of [%d]..." % (h + 1, len(hairs))
+                progress = utilityCreateProgress(status, strandCount)
 
-                    path = curveTransform.fullPathName()
+                # Curve hair is the best option for accuracy
+                # Mesh hair can be used as a light weight fallback method.
+                if sceneSettings["createCurveHairs"]:
+                    # Every strand is a curve shape under the one hair transform, with a transform per
+                    # strand Maya spends most of the time creating and naming nodes.
+                    hairTransformNode2 = utilityGetDependNode2(
+                        hairTransform.fullPathName())
+                    particles = utilityGroupBuffer(particleBuffer, 3)
 
-                    # Maya becomes unusable if the curves are allowed to be viewed in the outliner.
-                    # This will hide them and only show the hair transform, with no children.
-                    cmds.setAttr("%s.hiddenInOutliner" % path, True)
+                    # Attribute edits are queued and applied in one go, instead of a command per strand.
+                    modifier = OpenMaya2.MDGModifier()
 
-                    # Setup Arnold rendering for curves, this is a light weight system
-                    # That can be used to produce good results without nHair.
-                    if sceneSettings["setupArnoldHair"] and cmds.objExists("%s.aiRenderCurve" % path):
-                        cmds.setAttr("%s.aiRenderCurve" % path, True)
-                        cmds.setAttr("%s.aiMode" % path, 1)
+                    setupArnoldHair = sceneSettings["setupArnoldHair"]
+                    hairShader = None
 
-                        # Set a material, or default.
+                    if setupArnoldHair:
                         hairMaterial = hair.Material()
                         try:
                             if hairMaterial is not None:
-                                cmds.connectAttr("%s.outColor" % materials[hairMaterial.Name()],
-                                                 "%s.aiCurveShader" % path, force=True)
-                        except RuntimeError:
+                                selectList = OpenMaya2.MSelectionList()
+                                selectList.add("%s.outColor" %
+                                               materials[hairMaterial.Name()])
+                                hairShader = selectList.getPlug(0)
+                        except (KeyError, RuntimeError):
                             pass
 
-                    utilityStepProgress(progress, status)
-            elif sceneSettings["createMeshHairs"]:
-                vertexBuffer = OpenMaya.MFloatPointArray()
-                normalBuffer = OpenMaya.MVectorArray()
-                normalIndices = OpenMaya.MIntArray()
-                faceBuffer = OpenMaya.MIntArray()
+                    for s in xrange(strandCount):
+                        segment = segmentsBuffer[s]
+                        points = OpenMaya2.MPointArray(
+                            particles[particleOffset:particleOffset + segment + 1])
+                        particleOffset += segment + 1
+
+                        curve = OpenMaya2.MFnNurbsCurve()
+                        curve.createWithEditPoints(
+                            # Always use the default degree 3 curve unless we don't have enough points.
+                            points, 3 if segment >= 3 else 1, OpenMaya2.MFnNurbsCurve.kOpen, False, False, False, hairTransformNode2)
+
+                        # Maya becomes unusable if the curves are allowed to be viewed in the outliner.
+                        # This will hide them and only show the hair transform, with no children.
+                        modifier.newPlugValueBool(
+                            curve.findPlug("hiddenInOutliner", False), True)
+
+                        # Setup Arnold rendering for curves, this is a light weight system
+                        # That can be used to produce good results without nHair.
+                        if setupArnoldHair and curve.hasAttribute("aiRenderCurve"):
+                            modifier.newPlugValueBool(
+                                curve.findPlug("aiRenderCurve", False), True)
+                            modifier.newPlugValueInt(
+                                curve.findPlug("aiMode", False), 1)
+
+                            # Set a material, or default.
+                            if hairShader is not None:
+                                modifier.connect(hairShader, curve.findPlug(
+                                    "aiCurveShader", False))
+
+                        if (s + 1) % HAIR_PROGRESS_STEP == 0:
+                            utilityStepProgress(
+                                progress, status, HAIR_PROGRESS_STEP)
+
+                    modifier.doIt()
+                elif sceneSettings["createMeshHairs"]:
+                    vertexBuffer = OpenMaya.MFloatPointArray()
+                    normalBuffer = OpenMaya.MVectorArray()
+                    normalIndices = OpenMaya.MIntArray()
+                    faceBuffer = OpenMaya.MIntArray()
+
+                    def createNormal(v1, v2, v3):
+                        return ((v3 - v1) ^ (v2 - v1).normal()).normal()
+
+                    def createVertex(position, normal):
+                        index = vertexBuffer.length()
+
+                        vertexBuffer.append(position)
+
+                        normalBuffer.append(OpenMaya.MVector(normal))
+                        normalIndices.append(index)
+                        return index
+
+                    particleExtrusion = OpenMaya.MFloatVector(0.0, 0.0, 0.010)
+                    particleOffset = 0
+
+                    for s in xrange(strandCount):
+                        segment = segmentsBuffer[s]
+
+                        for i in xrange(segment):
+                            a = OpenMaya.MFloatPoint(particleBuffer[particleOffset * 3],
+                                                     particleBuffer[particleOffset * 3 + 1],
+                                                     particleBuffer[particleOffset * 3 + 2], 1.0)
+                            particleOffset += 1
+                            b = OpenMaya.MFloatPoint(particleBuffer[particleOffset * 3],
+                                                     particleBuffer[particleOffset * 3 + 1],
+                                                     particleBuffer[particleOffset * 3 + 2], 1.0)
+
+                            aUp = a + particleExtrusion
+                            bUp = b + particleExtrusion
+
+                            normal1 = createNormal(a, b, aUp)
+                            normal2 = createNormal(a, b, bUp)
+
+                            a1 = createVertex(a, normal1)
+                            b1 = createVertex(b, normal1)
+                            aUp1 = createVertex(aUp, normal1)
+
+                            a2 = createVertex(a, normal2)
+                            b2 = createVertex(b, normal2)
+                            bUp2 = createVertex(bUp, normal2)
+
+                            faceBuffer.extend([a1, b1, aUp1])
+                            faceBuffer.extend([a2, b2, bUp2])
 
-                def createNormal(v1, v2, v3):
-                    return ((v3 - v1) ^ (v2 - v1).normal()).normal()
+                        particleOffset += 1
 
-                def createVertex(position, normal):
-                    index = vertexBuffer.length()
+                        if (s + 1) % HAIR_PROGRESS_STEP == 0:
+                            utilityStepProgress(
+                                progress, status, HAIR_PROGRESS_STEP)
 
-                    vertexBuffer.append(position)
+                    vertexCount = int(vertexBuffer.length())
+                    faceCount = int(faceBuffer.length() / 3)
+                    faceCountBuffer = OpenMaya.MIntArray(faceCount, 3)
 
-                    normalBuffer.append(OpenMaya.MVector(normal))
-                    normalIndices.append(index)
-                    return index
+                    newMesh = OpenMaya.MFnMesh()
+                    newMesh.create(vertexCount, faceCount,
+                                   vertexBuffer, faceCountBuffer, faceBuffer, hairTransformNode)
 
-                particleExtrusion = OpenMaya.MFloatVector(0.0, 0.0, 0.010)
-                particleOffset = 0
+                    newMesh.setVertexNormals(normalBuffer, normalIndices)
 
-                for s in xrange(strandCount):
-                    segment = segmentsBuffer[s]
+                    # Set a material, or default.
+                    hairMaterial = hair.Material()
+                    try:
+                        if hairMaterial is not None:
+                            cmds.sets(newMesh.fullPathName(), forceElement=(
+                                "%sSG" % materials[hairMaterial.Name()]))
+                        else:
+                            cmds.sets(newMesh.fullPathName(),
+                                      forceElement="initialShadingGroup")
+                    except RuntimeError:
+                        pass
 
-                    for i in xrange(segment):
-                        a = OpenMaya.MFloatPoint(particleBuffer[particleOffset * 3],
-                                                 particleBuffer[particleOffset * 3 + 1],
-                                                 particleBuffer[particleOffset * 3 + 2], 1.0)
-                        particleOffset += 1
-                        b = OpenMaya.MFloatPoint(particleBuffer[particleOffset * 3],
-                                                 particleBuffer[particleOffset * 3 + 1],
-                                                 particleBuffer[particleOffset * 3 + 2], 1.0)
+                utilityEndProgress(progress)
 
-                        aUp = a + particleExtrusion
-                        bUp = b + particleExtrusion
+    # Import blend shape controllers if necessary.
+    if sceneSettings["importBlendShapes"]:
+        with profiler.phase("blend_shapes"):
+            blendShapes = model.BlendShapes()
+            blendShapesByBaseShape = {}
 
-                        normal1 = createNormal(a, b, aUp)
-                        normal2 = createNormal(a, b, bUp)
+            # Merge the blend shapes together by their base shapes, so we only create one deformer per base.
+            for blendShape in blendShapes:
+                baseShapeHash = blendShape.BaseShape().Hash()
 
-                        a1 = createVertex(a, normal1)
-                        b1 = createVertex(b, normal1)
-                        aUp1 = createVertex(aUp, normal1)
+                if baseShapeHash not in meshHandles:
+                    continue
+                if baseShapeHash not in blendShapesByBaseShape:
+                    blendShapesByBaseShape[baseShapeHash] = [blendShape]
+                else:
+                    blendShapesByBaseShape[baseShapeHash].append(blendShape)
 
-                        a2 = createVertex(a, normal2)
-                        b2 = createVertex(b, normal2)
-                        bUp2 = createVertex(bUp, normal2)
+            progress = utilityCreateProgress(
+                "Importing shapes...", len(blendShapes))
 
-                        faceBuffer.extend([a1, b1, aUp1])
-                        faceBuffer.extend([a2, b2, bUp2])
+            # Iterate over blend shapes by base shapes.
+            for blendShapes in blendShapesByBaseShape.values():
+                baseShape = meshHandles[blendShapes[0].BaseShape().Hash()]
+                baseShapeDagNode = OpenMaya.MFnDagNode(baseShape)
 
-                    particleOffset += 1
-                    utilityStepProgress(progress, status)
+                # Targets store offsets from the base shape, which was created from these positions.
+                basePositions = blendShapes[0].BaseShape().VertexPositionBuffer()
 
-                vertexCount = int(vertexBuffer.length())
-                faceCount = int(faceBuffer.length() / 3)
-                faceCountBuffer = OpenMaya.MIntArray(faceCount, 3)
+                # Create the deformer on the abse shape.
+                blendDeformer = OpenMayaAnim.MFnBlendShapeDeformer()
+                blendDeformer.create(baseShape)
 
-                newMesh = OpenMaya.MFnMesh()
-                newMesh.create(vertexCount, faceCount,
-                               vertexBuffer, faceCountBuffer, faceBuffer, hairTransformNode)
+                deformerName = blendDeformer.name()
+                deformer = OpenMaya2.MFnDependencyNode(
+                    utilityGetDependNode2(deformerName))
 
-                newMesh.setVertexNormals(normalBuffer, normalIndices)
+                weightPlug = deformer.findPlug("weight", False)
+                inputTargetPlug = \
+                    deformer.findPlug("inputTarget", False).elementByLogicalIndex(0)
 
-                # Set a material, or default.
-                hairMaterial = hair.Material()
-                try:
-                    if hairMaterial is not None:
-                        cmds.sets(newMesh.fullPathName(), forceElement=(
-                            "%sSG" % materials[hairMaterial.Name()]))
-                    else:
-                        cmds.sets(newMesh.fullPathName(),
-                                  forceElement="initialShadingGroup")
-                except RuntimeError:
-                    pass
+                inputTargetGroup = deformer.attribute("inputTargetGroup")
+                inputTargetItem = deformer.attribute("inputTargetItem")
+                inputPointsTarget = deformer.attribute("inputPointsTarget")
+                inputComponentsTarget = deformer.attribute("inputComponentsTarget")
 
-            utilityEndProgress(progress)
+                # Write each target's sparse points and components straight into the deformer,
+                # instead of duplicating the base shape to use as target geometry.
+                for i, blendShape in enumerate(blendShapes):
+                    indices = blendShape.TargetShapeVertexIndices()
+                    positions = blendShape.TargetShapeVertexPositions()
 
-    # Import blend shape controllers if necessary.
-    if sceneSettings["importBlendShapes"]:
-        blendShapes = model.BlendShapes()
-        blendShapesByBaseShape = {}
+                    # Targets that don't move any vertex are kept, as an empty target.
+                    if indices is None or positions is None:
+                        cmds.warning(
+                            "Ignoring blend shape \"%s\" for mesh \"%s\" no indices or positions specified." % (blendShape.Name(), baseShapeDagNode.name()))
+                        utilityStepProgress(progress, "Importing shapes...")
+                        continue
 
-        # Merge the blend shapes together by their base shapes, so we only create one deformer per base.
-        for blendShape in blendShapes:
-            baseShapeHash = blendShape.BaseShape().Hash()
+                    pointsData = OpenMaya2.MFnPointArrayData()
+                    points = pointsData.create(OpenMaya2.MPointArray(
+                        [(positions[j * 3] - basePositions[x * 3],
+                          positions[(j * 3) + 1] - basePositions[(x * 3) + 1],
+                          positions[(j * 3) + 2] - basePositions[(x * 3) + 2]) for j, x in enumerate(indices)]))
 
-            if baseShapeHash not in meshHandles:
-                continue
-            if baseShapeHash not in blendShapesByBaseShape:
-                blendShapesByBaseShape[baseShapeHash] = [blendShape]
-            else:
-                blendShapesByBaseShape[baseShapeHash].append(blendShape)
-
-        progress = utilityCreateProgress(
-            "Importing shapes...", len(blendShapes))
-
-        # Iterate over blend shapes by base shapes.
-        for blendShapes in blendShapesByBaseShape.values():
-            baseShape = meshHandles[blendShapes[0].BaseShape().Hash()]
-            baseShapeDagNode = OpenMaya.MFnDagNode(baseShape)
-
-            # Create the deformer on the abse shape.
-            blendDeformer = OpenMayaAnim.MFnBlendShapeDeformer()
-            blendDeformer.create(baseShape)
-
-            # Create the targets in the deformer and set the new vertex data.
-            for i, blendShape in enumerate(blendShapes):
-                # Clone the base shape to add as a target.
-                tempShape = cmds.duplicate(
-                    baseShapeDagNode.fullPathName(), ic=True)
-
-                # Get the actual mesh name.
-                newShapeShapes = cmds.listRelatives(
-                    tempShape, shapes=True, fullPath=True)
-
-                # Grab a handle to the new shape, which will be our target mesh.
-                selectList = OpenMaya.MSelectionList()
-                selectList.add(newShapeShapes[0])
-
-                # Get the mesh object.
-                targetShape = OpenMaya.MObject()
-                selectList.getDependNode(0, targetShape)
-                targetMesh = OpenMaya.MFnMesh(targetShape)
-
-                # Rename the actual mesh to the key name.
-                cmds.rename(newShapeShapes[0], blendShape.Name())
-
-                # Set the shape positions.
-                indices = blendShape.TargetShapeVertexIndices()
-                positions = blendShape.TargetShapeVertexPositions()
-
-                if not indices or not positions:
-                    cmds.warning(
-                        "Ignoring blend shape \"%s\" for mesh \"%s\" no indices or positions specified." % (blendShape.Name(), baseShapeDagNode.name()))
-                    cmds.delete(tempShape)
-                    utilityStepProgress(progress, "Importing shapes...")
-                    continue
+                    vertexComponent = OpenMaya2.MFnSingleIndexedComponent()
+                    vertexComponents = vertexComponent.create(
+                        OpenMaya2.MFn.kMeshVertComponent)
+                    vertexComponent.addElements(OpenMaya2.MIntArray(indices))
 
-                vertexPositions = OpenMaya.MFloatPointArray()
+                    componentsData = OpenMaya2.MFnComponentListData()
+                    components = componentsData.create()
+                    componentsData.add(vertexComponents)
 
-                targetMesh.getPoints(vertexPositions)
+                    # The target item index encodes the weight the target is fully applied at.
+                    fullWeight = max(0.0, blendShape.TargetWeightScale() or 1.0)
+                    itemIndex = int(round(5000 + fullWeight * 1000))
 
-                for index, vertexIndex in enumerate(indices):
-                    vertexPositions.set(
-                        vertexIndex, positions[index * 3], positions[(index * 3) + 1], positions[(index * 3) + 2], 1.0)
+                    targetItemPlug = inputTargetPlug.child(inputTargetGroup) \
+                        .elementByLogicalIndex(i) \
+                        .child(inputTargetItem) \
+                        .elementByLogicalIndex(itemIndex)
 
-                targetMesh.setPoints(vertexPositions)
+                    targetItemPlug.child(inputPointsTarget).setMObject(points)
+                    targetItemPlug.child(inputComponentsTarget).setMObject(components)
 
-                blendDeformer.addTarget(baseShape, i, targetShape,
-                                        max(0.0, blendShape.TargetWeightScale() or 1.0))
+                    weightPlug.elementByLogicalIndex(i).setFloat(0.0)
 
-                # Delete the cloned shape now that the target was added.
-                cmds.delete(tempShape)
+                    utilityAliasBlendShapeWeight(
+                        deformerName, i, blendShape.Name())
 
-                utilityStepProgress(progress, "Importing shapes...")
-        utilityEndProgress(progress)
+                    profiler.count("blend_shapes")
+                    profiler.count("blend_shapes.vertices", len(indices))
+
+                    utilityStepProgress(progress, "Importing shapes...")
+            utilityEndProgress(progress)
 
     # Merge with the existing skeleton here if one is selected and we have a skeleton.
     if sceneSettings["importMerge"]:
         if sceneSkeleton:
-            jointTransform = importMergeModel(sceneSkeleton,
-                                              model.Skeleton(),
-                                              handles,
-                                              paths,
-                                              jointTransform)
+            with profiler.phase("merge"):
+                jointTransform = importMergeModel(sceneSkeleton,
+                                                  model.Skeleton(),
+                                                  handles,
+                                                  paths,
+                                                  jointTransform)
         else:
             cmds.warning(
                 "No skeleton exists to merge to in the current scene.")
@@ -2242,19 +2533,21 @@ def importModelNode(model, path):
     # Import any ik handles now that the meshes are bound because the constraints may
     # effect the bind pose of the joints causing the meshes to deform incorrectly.
     if sceneSettings["importIK"]:
-        importSkeletonIKNode(model.Skeleton(),
-                             handles,
-                             paths,
-                             indexes,
-                             jointTransform)
+        with profiler.phase("ik"):
+            importSkeletonIKNode(model.Skeleton(),
+                                 handles,
+                                 paths,
+                                 indexes,
+                                 jointTransform)
 
     # Import any additional constraints.
     if sceneSettings["importConstraints"]:
-        importSkeletonConstraintNode(model.Skeleton(),
-                                     handles,
-                                     paths,
-                                     indexes,
-                                     jointTransform)
+        with profiler.phase("constraints"):
+            importSkeletonConstraintNode(model.Skeleton(),
+                                         handles,
+                                         paths,
+                                         indexes,
+                                         jointTransform)
 
     # Optional transform to apply to the skeleton, or each separate mesh.
     # Must be done here, after skinning and bind pose has been used.
@@ -2267,7 +2560,7 @@ def importModelNode(model, path):
         utilitySetPRS(meshTransform, modelPosition, modelRotation, modelScale)
 
 
-def importCurveNode(node, path, timeUnit, startFrame, overrides):
+def importCurveNode(node, path, timeUnit, startFrame, overrides, nodeCache, timeCache):
     propertySwitcher = {
         "rq": ["rx", "ry", "rz"],
         "tx": ["tx"],
@@ -2306,7 +2599,7 @@ def importCurveNode(node, path, timeUnit, startFrame, overrides):
 
     # Special case for blend shapes because it requires one curve to N deformer(s).
     if propertyName == "bs":
-        return utilityImportBlendShapeTrackData(nodeName, timeUnit, startFrame, keyFrameBuffer, keyValueBuffer)
+        return utilityImportBlendShapeTrackData(nodeName, timeUnit, startFrame, keyFrameBuffer, keyValueBuffer, timeCache)
 
     smallestFrame = OpenMaya.MTime(sys.maxsize, timeUnit)
     largestFrame = OpenMaya.MTime(0, timeUnit)
@@ -2314,7 +2607,8 @@ def importCurveNode(node, path, timeUnit, startFrame, overrides):
     if not propertyName in propertySwitcher:
         return (smallestFrame, largestFrame)
 
-    tracks = [utilityGetOrCreateCurve(nodeName,
+    tracks = [utilityGetOrCreateCurve(nodeCache,
+                                      nodeName,
                                       x,
                                       typeSwitcher[propertyName]) for x in propertySwitcher[propertyName]]
 
@@ -2350,7 +2644,8 @@ def importCurveNode(node, path, timeUnit, startFrame, overrides):
                                                                 keyFrameBuffer,
                                                                 keyValueBuffer,
                                                                 nodeMode,
-                                                                node.AdditiveBlendWeight())
+                                                                node.AdditiveBlendWeight(),
+                                                                timeCache)
 
     # Make sure we have at least one quaternion track to set the interpolation mode to
     if propertyName == "rq":
@@ -2381,6 +2676,8 @@ def importNotificationTrackNode(node, timeUnit, frameStart):
 
 
 def importAnimationNode(node, path):
+    profiler = importProfiler
+
     # We need to be sure to disable auto keyframe, because it breaks import of animations
     # do this now so we don't forget...
     sceneAnimationController = OpenMayaAnim.MAnimControl()
@@ -2423,34 +2720,46 @@ def importAnimationNode(node, path):
 
     progress = utilityCreateProgress("Importing animation...", len(curves))
 
-    for i, x in enumerate(curves):
-        (smallestFrame, largestFrame) = importCurveNode(x,
-                                                        path,
-                                                        wantedFps,
-                                                        startFrame,
-                                                        curveModeOverrides)
+    # Target nodes and key times are shared by many curves, so they're resolved once for the whole animation.
+    nodeCache = {}
+    timeCache = {}
 
-        wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
-        wantedLargestFrame = max(largestFrame, wantedLargestFrame)
+    with profiler.phase("curves"):
+        profiler.count("animation.curves", len(curves))
 
-        utilityStepProgress(progress,
-                            "Importing curve [%d] of [%d]..." % (i + 1, len(curves)))
+        for i, x in enumerate(curves):
+            profiler.count("animation.keys", len(x.KeyFrameBuffer()))
 
-    utilityEndProgress(progress)
+            (smallestFrame, largestFrame) = importCurveNode(x,
+                                                            path,
+                                                            wantedFps,
+                                                            startFrame,
+                                                            curveModeOverrides,
+                                                            nodeCache,
+                                                            timeCache)
+
+            wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
+            wantedLargestFrame = max(largestFrame, wantedLargestFrame)
+
+            utilityStepProgress(progress,
+                                "Importing curve [%d] of [%d]..." % (i + 1, len(curves)))
+
+        utilityEndProgress(progress)
 
     notifications = node.Notifications()
 
-    for x in notifications:
-        (smallestFrame, largestFrame) = importNotificationTrackNode(x,
-                                                                    wantedFps,
-                                                                    startFrame)
+    with profiler.phase("notetracks"):
+        for x in notifications:
+            (smallestFrame, largestFrame) = importNotificationTrackNode(x,
+                                                                        wantedFps,
+                                                                        startFrame)
 
-        wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
-        wantedLargestFrame = max(largestFrame, wantedLargestFrame)
+            wantedSmallestFrame = min(smallestFrame, wantedSmallestFrame)
+            wantedLargestFrame = max(largestFrame, wantedLargestFrame)
 
-    # Sync the notetrack editor if we imported any notetracks.
-    if notifications:
-        utilitySyncNotetracks()
+        # Sync the notetrack editor if we imported any notetracks.
+        if notifications:
+            utilitySyncNotetracks()
 
     # Set the animation segment
     if wantedSmallestFrame == OpenMaya.MTime(sys.maxsize, wantedFps):
@@ -2511,6 +2820,9 @@ def importInstanceNodes(nodes, path, sceneRoot):
     instanceGroup.create()
     instanceGroup.setName("%s_instances" % name)
 
+    importProfiler.count("instances", len(nodes))
+    importProfiler.count("instances.scenes", len(uniqueInstances))
+
     for instancePath, instances in uniqueInstances.items():
         try:
             imported = cmds.file(instancePath, i=True,
@@ -2547,18 +2859,48 @@ def importInstanceNodes(nodes, path, sceneRoot):
 
             base = group.fullPathName()
 
-        for instance in instances:
-            newInstance = cmds.instance(base, name=instance.Name())[0]
+        baseNode = OpenMaya.MFnDagNode(utilityGetDagPath(base))
+        baseChildren = [baseNode.child(x) for x in xrange(baseNode.childCount())]
+
+        # Every instance transform is created right under the instance group, named, and placed
+        # in one modifier, instead of an instance, parent, and transform edit per instance.
+        modifier = OpenMaya.MDagModifier()
+        transforms = [None] * len(instances)
+
+        for i, instance in enumerate(instances):
+            transforms[i] = modifier.createNode(
+                "transform", instanceGroup.object())
 
-            transform = OpenMaya.MFnTransform(utilityGetDagPath(newInstance))
+            if instance.Name():
+                modifier.renameNode(transforms[i], instance.Name())
 
             (position, rotation, scale) = \
                 utilityCreatePRS(instance.Position(),
                                  instance.Rotation(), instance.Scale())
 
-            utilitySetPRS(transform, position, rotation, scale)
+            # Rotate plugs take radians in the default xyz rotate order, which is what the euler is in.
+            euler = OpenMaya.MQuaternion(
+                rotation[0], rotation[1], rotation[2], rotation[3]).asEulerRotation()
+
+            transformNode = OpenMaya.MFnDependencyNode(transforms[i])
+
+            for (attribute, values) in (("translate", position),
+                                        ("rotate", (euler.x, euler.y, euler.z)),
+                                        ("scale", scale)):
+                for (axis, value) in zip("XYZ", values):
+                    modifier.newPlugValueDouble(
+                        transformNode.findPlug(attribute + axis), value)
+
+        modifier.doIt()
 
-            cmds.parent(newInstance, instanceGroup.fullPathName())
+        # A modifier can only move nodes, so the scene's children are shared with each instance
+        # through the function set, the same way the instance command does.
+        for transformNode in transforms:
+            transform = OpenMaya.MFnDagNode(transformNode)
+
+            for child in baseChildren:
+                transform.addChild(
+                    child, OpenMaya.MFnDagNode.kNextPos, True)
 
         cmds.parent(base, baseGroup.fullPathName())
 
@@ -2579,32 +2921,65 @@ def importMetadata(meta):
 
 
 def importCast(path):
-    cast = Cast.load(path)
+    global importProfiler
 
-    instances = []
-    meta = None
+    # Instance scenes are imported through the translator again, so only the outer import owns the profiler.
+    profiler = importProfiler
 
-    for root in cast.Roots():
-        for child in root.ChildrenOfType(Model):
-            importModelNode(child, path)
-        for child in root.ChildrenOfType(Animation):
-            importAnimationNode(child, path)
-        for child in root.ChildrenOfType(Instance):
-            instances.append(child)
+    if profiler is None:
+        importProfiler = CastProfiler(os.path.basename(path),
+                                      sceneSettings["profileImport"]).start()
 
-        # Grab the first defined meta node, if there is one.
-        meta = meta or root.ChildOfType(Metadata)
+    # Recording undo and redrawing the viewport for every edit dominates large imports.
+    withoutUndo = profiler is None and sceneSettings["importWithoutUndo"]
 
-    if meta:
-        sceneRoot = meta.SceneRoot()
-    else:
-        sceneRoot = None
+    if withoutUndo:
+        undoState = cmds.undoInfo(query=True, state=True)
+
+        cmds.undoInfo(stateWithoutFlush=False)
+        cmds.refresh(suspend=True)
 
-    if instances:
-        importInstanceNodes(instances, path, sceneRoot)
+    try:
+        with importProfiler.phase("import" if profiler is None else "scene"):
+            cast = Cast.load(path)
+
+            instances = []
+            meta = None
+
+            for root in cast.Roots():
+                for child in root.ChildrenOfType(Model):
+                    with importProfiler.phase("model"):
+                        importModelNode(child, path)
+                for child in root.ChildrenOfType(Animation):
+                    with importProfiler.phase("animation"):
+                        importAnimationNode(child, path)
+                for child in root.ChildrenOfType(Instance):
+                    instances.append(child)
+
+                # Grab the first defined meta node, if there is one.
+                meta = meta or root.ChildOfType(Metadata)
+
+            if meta:
+                sceneRoot = meta.SceneRoot()
+            else:
+                sceneRoot = None
 
-    if meta:
-        importMetadata(meta)
+            if instances:
+                with importProfiler.phase("instances"):
+                    importInstanceNodes(instances, path, sceneRoot)
+
+            if meta:
+                importMetadata(meta)
+    finally:
+        if withoutUndo:
+            cmds.refresh(suspend=False)
+            cmds.undoInfo(stateWithoutFlush=undoState)
+
+        if profiler is None:
+            profiler = importProfiler.stop()
+            importProfiler = None
+
+            profiler.write()
 
 
 def exportAnimation(root, exportSelected):
@@ -2683,59 +3058,84 @@ def exportAnimation(root, exportSelected):
         if len(keyframes) > 0:
             exportable.append([object, "rotate", "rq", list(keyframes)])
 
-    progress = utilityCreateProgress("Exporting animation...", len(exportable))
+    # Resolve the plugs of each exported channel once, rotations read all three axes.
+    nodes = {}
+    plugs = []
+    orients = {}
 
     for export in exportable:
+        if export[0] not in nodes:
+            nodes[export[0]] = OpenMaya.MFnDependencyNode(
+                utilityGetDagPath(export[0]).node())
+
+        node = nodes[export[0]]
+
+        if export[1] == "rotate":
+            plugs.append([node.findPlug(x, False)
+                          for x in ["rotateX", "rotateY", "rotateZ"]])
+
+            # The joint orientation is static, so it's read once instead of every frame.
+            if export[0] not in orients:
+                orients[export[0]] = OpenMaya.MEulerRotation(
+                    *[node.findPlug(x, False).asDouble() for x in ["jointOrientX", "jointOrientY", "jointOrientZ"]]).asQuaternion()
+        else:
+            plugs.append([node.findPlug(export[1], False)])
+
+    # Group the channels by frame, so each frame is evaluated once for every joint.
+    frames = {}
+
+    for i, export in enumerate(exportable):
         # Always ensure a control keyframe is present based on the start range.
         if not startFrame in export[3]:
             export[3].append(startFrame)
 
-        keyframes = []
-        keyvalues = []
-
         # Export the keyed and possibly control keyframes within the range.
         for frame in export[3]:
             if frame < startFrame or frame > endFrame:
                 continue
 
-            keyframes.append(frame)
-
-            # We need to sample the joint orientation into the quaternion curve
-            # because cast models will combine the rotation and orientation.
-            if export[1] == "rotate":
-                euler = cmds.getAttr("%s.rotate" % export[0], time=frame)[0]
-                eulerJo = cmds.getAttr("%s.jointOrient" %
-                                       export[0], time=frame)[0]
-
-                quat = OpenMaya.MEulerRotation(
-                    euler[0], euler[1], euler[2]).asQuaternion()
-                quatJo = OpenMaya.MEulerRotation(
-                    eulerJo[0], eulerJo[1], eulerJo[2]).asQuaternion()
+            frames.setdefault(frame, []).append(i)
 
-                value = quat * quatJo
+    keyframes = [[] for _ in exportable]
+    keyvalues = [[] for _ in exportable]
 
-                keyvalues.append((value.x, value.y, value.z, value.w))
-            else:
-                keyvalues.append(cmds.getAttr("%s.%s" %
-                                 (export[0], export[1]), time=frame))
+    timeUnit = OpenMaya.MTime.uiUnit()
+    progress = utilityCreateProgress("Exporting animation...", len(frames))
 
-        # Make sure we had at least one usable keyframe before creating the curve.
-        if len(keyframes) > 0:
-            curveNode = animation.CreateCurve()
-            curveNode.SetNodeName(export[0])
-            curveNode.SetKeyPropertyName(export[2])
-            curveNode.SetMode("absolute")
+    for frame in sorted(frames.keys()):
+        context = OpenMaya.MDGContext(OpenMaya.MTime(frame, timeUnit))
 
-            curveNode.SetKeyFrameBuffer(keyframes)
-
-            if export[1] == "rotate":
-                curveNode.SetVec4KeyValueBuffer(keyvalues)
-            else:
-                curveNode.SetFloatKeyValueBuffer(keyvalues)
+        for i in frames[frame]:
+            keyframes[i].append(frame)
+            keyvalues[i].extend(x.asDouble(context) for x in plugs[i])
 
         utilityStepProgress(progress, "Exporting animation...")
     utilityEndProgress(progress)
 
+    for i, export in enumerate(exportable):
+        # Make sure we had at least one usable keyframe before creating the curve.
+        if len(keyframes[i]) == 0:
+            continue
+
+        curveNode = animation.CreateCurve()
+        curveNode.SetNodeName(export[0])
+        curveNode.SetKeyPropertyName(export[2])
+        curveNode.SetMode("absolute")
+
+        curveNode.SetKeyFrameBuffer(keyframes[i])
+
+        # We need to sample the joint orientation into the quaternion curve
+        # because cast models will combine the rotation and orientation.
+        if export[1] == "rotate":
+            curveNode.SetVec4KeyValueBuffer(
+                utilityEulersToQuaternions(keyvalues[i], orients[export[0]]))
+        elif export[2] in ["tx", "ty", "tz"]:
+            # Plugs are read in internal units, while getAttr used the scene's linear unit.
+            curveNode.SetFloatKeyValueBuffer(
+                [OpenMaya.MDistance.internalToUI(x) for x in keyvalues[i]])
+        else:
+            curveNode.SetFloatKeyValueBuffer(keyvalues[i])
+
     # Collect and create notification tracks.
     notifications = utilityGetNotetracks()
 
@@ -2745,7 +3145,147 @@ def exportAnimation(root, exportSelected):
         notetrack.SetKeyFrameBuffer([int(x) for x in notifications[note]])
 
 
-def exportModel(root, exportSelected, filePath):
+def utilityGetVertexUVs(meshFn, uvLayer, polygonCounts, polygonVertices, vertexCount):
+    # Uvs are stored per face vertex, each vertex takes the uv of the first face that uses it.
+    (us, vs) = meshFn.getUVs(uvLayer)
+    (uvCounts, uvIds) = meshFn.getAssignedUVs(uvLayer)
+
+    if numpy is not None:
+        counts = numpy.asarray(polygonCounts, dtype=numpy.int64)
+        vertices = numpy.asarray(polygonVertices, dtype=numpy.int64)
+
+        # Faces without uvs have no uv ids, so only face vertices of mapped faces line up with them.
+        mapped = numpy.repeat(numpy.asarray(uvCounts, dtype=numpy.int64) == counts, counts)
+        vertices = vertices[mapped]
+
+        (vertexIds, first) = numpy.unique(vertices, return_index=True)
+        ids = numpy.asarray(uvIds, dtype=numpy.int64)[first]
+
+        uvs = numpy.zeros((vertexCount, 2), dtype=numpy.float64)
+        uvs[:, 1] = 1.0
+        uvs[vertexIds, 0] = numpy.asarray(us, dtype=numpy.float64)[ids]
+        uvs[vertexIds, 1] = 1.0 - numpy.asarray(vs, dtype=numpy.float64)[ids]
+
+        return [tuple(x) for x in uvs.tolist()]
+
+    uvs = [None] * vertexCount
+    offset = 0
+    uvOffset = 0
+
+    for (count, uvCount) in zip(polygonCounts, uvCounts):
+        if count == uvCount:
+            for i in xrange(count):
+                vertex = polygonVertices[offset + i]
+
+                if uvs[vertex] is None:
+                    uv = uvIds[uvOffset + i]
+                    uvs[vertex] = (us[uv], 1.0 - vs[uv])
+
+        offset += count
+        uvOffset += uvCount
+
+    return [x or (0.0, 1.0) for x in uvs]
+
+
+def utilityGetVertexColors(meshFn, colorLayer, polygonVertices, vertexCount):
+    # Colors are stored per face vertex, each vertex takes the average of the faces that use it.
+    faceVertexColors = meshFn.getFaceVertexColors(colorLayer)
+
+    # Face vertices that were never painted come back as (-1, -1, -1, -1), they're left out of the average.
+    # A vertex with no painted face vertices at all keeps the default color.
+    if numpy is not None:
+        vertices = numpy.asarray(polygonVertices, dtype=numpy.int64)
+        colors = numpy.asarray([tuple(x) for x in faceVertexColors],
+                               dtype=numpy.float64).reshape(-1, 4)
+
+        painted = (colors != -1.0).any(axis=1)
+        vertices = vertices[painted]
+        colors = colors[painted]
+
+        counts = numpy.bincount(vertices, minlength=vertexCount)
+        averaged = numpy.stack([numpy.bincount(vertices, weights=colors[:, x], minlength=vertexCount)
+                                for x in xrange(4)], axis=1) / numpy.maximum(counts, 1)[:, None]
+
+        averaged[counts == 0] = (0.0, 0.0, 0.0, 1.0)
+
+        return [tuple(x) for x in averaged.tolist()]
+
+    sums = [[0.0, 0.0, 0.0, 0.0] for _ in xrange(vertexCount)]
+    counts = [0] * vertexCount
+
+    for (vertex, color) in zip(polygonVertices, faceVertexColors):
+        if color.r == -1.0 and color.g == -1.0 and color.b == -1.0 and color.a == -1.0:
+            continue
+
+        total = sums[vertex]
+        total[0] += color.r
+        total[1] += color.g
+        total[2] += color.b
+        total[3] += color.a
+
+        counts[vertex] += 1
+
+    return [tuple(x / count for x in total) if count > 0 else (0.0, 0.0, 0.0, 1.0)
+            for (total, count) in zip(sums, counts)]
+
+
+def utilityGetVertexWeights(weights, influenceCount, vertexCount, bones):
+    # Compacts the vertex by influence weights into each vertex's weights above the threshold, in influence order.
+    if influenceCount == 0 or vertexCount == 0:
+        return (0, [], [])
+
+    if numpy is not None:
+        values = numpy.asarray(weights, dtype=numpy.float64).reshape(
+            vertexCount, influenceCount)
+        used = values > WEIGHT_THRESHOLD
+
+        maximumInfluence = int(used.sum(axis=1).max())
+
+        if maximumInfluence == 0:
+            return (0, [], [])
+
+        # A stable sort moves each vertex's used influences to the front, keeping their order.
+        order = numpy.argsort(~used, axis=1, kind="stable")[:, :maximumInfluence]
+        slots = numpy.take_along_axis(used, order, axis=1)
+
+        weightValues = numpy.where(slots, numpy.take_along_axis(values, order, axis=1), 0.0)
+        weightBones = numpy.where(slots, numpy.asarray(bones, dtype=numpy.int64)[order], 0)
+
+        return (maximumInfluence, weightValues.ravel().tolist(), weightBones.ravel().tolist())
+
+    maximumInfluence = 0
+
+    for i in xrange(vertexCount):
+        influence = 0
+
+        for j in xrange(i * influenceCount, (i + 1) * influenceCount):
+            if weights[j] > WEIGHT_THRESHOLD:
+                influence += 1
+
+        maximumInfluence = max(maximumInfluence, influence)
+
+    if maximumInfluence == 0:
+        return (0, [], [])
+
+    weightValues = [0.0] * vertexCount * maximumInfluence
+    weightBones = [0] * vertexCount * maximumInfluence
+
+    for i in xrange(vertexCount):
+        slot = i * maximumInfluence
+
+        for j in xrange(influenceCount):
+            weight = weights[i * influenceCount + j]
+
+            if weight > WEIGHT_THRESHOLD:
+                weightValues[slot] = weight
+                weightBones[slot] = bones[j]
+
+                slot += 1
+
+    return (maximumInfluence, weightValues, weightBones)
+
+
+def exportModel(root, exportSelected, filePath, sharedMaterials=None):
     model = root.CreateModel()
 
     # Grab all selected, or objects that can be exported.
@@ -2890,14 +3430,29 @@ def exportModel(root, exportSelected, filePath):
 
         if material:
             if material in uniqueMaterials:
+                meshNode.SetMaterial(uniqueMaterials[material])
+            elif sharedMaterials is not None and material in sharedMaterials:
+                # Batch exports query each material once, and share the node between every output.
+                matNode = sharedMaterials[material]
+
+                utilityShareNodes(model, [matNode])
+
+                uniqueMaterials[material] = matNode.Hash()
+
                 meshNode.SetMaterial(uniqueMaterials[material])
             else:
-                matNode = model.CreateMaterial()
+                # Shared materials are parented to a scratch model, so saving one output doesn't pull in another.
+                matNode = (model if sharedMaterials is None else Model()).CreateMaterial()
                 matNode.SetName(material)
                 matNode.SetType("pbr")
 
                 utilityQueryMaterialSlots(material, matNode, filePath)
 
+                if sharedMaterials is not None:
+                    sharedMaterials[material] = matNode
+
+                    utilityShareNodes(model, [matNode])
+
                 uniqueMaterials[material] = matNode.Hash()
 
                 meshNode.SetMaterial(uniqueMaterials[material])
@@ -2918,22 +3473,6 @@ def exportModel(root, exportSelected, filePath):
         if skinCluster:
             skinCluster.influenceObjects(skinJoints)
 
-        vertexIter = OpenMaya.MItMeshVertex(transformDagPath)
-        vertexCount = vertexIter.count()
-
-        vertexPositions = [None] * vertexCount
-        vertexNormals = [None] * vertexCount
-        vertexUVLayers = [[None] * vertexCount for _ in uvLayers]
-        vertexColorLayers = [[None] * vertexCount for _ in colorLayers]
-        vertexMaxInfluence = 0
-
-        normal = OpenMaya.MVector()
-        uv = OpenMaya.MScriptUtil()
-        color = OpenMaya.MColor()
-
-        numWeights = OpenMaya.MScriptUtil()
-        numWeightsPtr = numWeights.asUintPtr()
-        weights = OpenMaya.MDoubleArray()
         bones = [0] * skinJoints.length()
 
         # Create weight index to bone index lookup.
@@ -2954,138 +3493,211 @@ def exportModel(root, exportSelected, filePath):
                 cmds.warning("Skipping joint not in skeleton: %s" % jointName)
                 pass
 
-        uv.createFromList([0.0, 0.0], 2)
-        uvPtr = uv.asFloat2Ptr()
+        # Every buffer is read from the mesh in one call, instead of one vertex at a time.
+        meshDagPath = OpenMaya2.MSelectionList()
+        meshDagPath.add(transformDagPath.fullPathName())
+        meshDagPath = meshDagPath.getDagPath(0)
 
-        while not vertexIter.isDone():
-            index = vertexIter.index()
+        meshFn = OpenMaya2.MFnMesh(meshDagPath)
+        vertexCount = meshFn.numVertices
 
-            position = vertexIter.position(OpenMaya.MSpace.kWorld)
+        (polygonCounts, polygonVertices) = meshFn.getVertices()
 
-            vertexPositions[index] = \
-                (position.x, position.y, position.z)
+        vertexPositions = [(x.x, x.y, x.z)
+                           for x in meshFn.getPoints(OpenMaya2.MSpace.kWorld)]
+        vertexNormals = [(x.x, x.y, x.z)
+                         for x in meshFn.getVertexNormals(False)]
+        vertexUVLayers = [utilityGetVertexUVs(meshFn, x, polygonCounts, polygonVertices, vertexCount)
+                          for x in uvLayers]
+        vertexColorLayers = [utilityGetVertexColors(meshFn, x, polygonVertices, vertexCount)
+                             for x in colorLayers]
 
-            vertexIter.getNormal(normal)
+        if skinCluster:
+            vertexComponent = OpenMaya2.MFnSingleIndexedComponent()
+            vertexComponents = vertexComponent.create(
+                OpenMaya2.MFn.kMeshVertComponent)
+            vertexComponent.setCompleteData(vertexCount)
 
-            vertexNormals[index] = \
-                (normal.x, normal.y, normal.z)
+            (weights, influenceCount) = OpenMayaAnim2.MFnSkinCluster(
+                utilityGetDependNode2(skinCluster.name())).getWeights(meshDagPath, vertexComponents)
 
-            for i, uvLayer in enumerate(uvLayers):
-                vertexIter.getUV(uvPtr, uvLayer)
+            (vertexMaxInfluence, vertexWeightValueBuffer, vertexWeightBoneBuffer) = \
+                utilityGetVertexWeights(
+                    weights, influenceCount, vertexCount, bones)
 
-                vertexUVLayers[i][index] = \
-                    (OpenMaya.MScriptUtil.getFloat2ArrayItem(uvPtr, 0, 0),
-                     1.0 - OpenMaya.MScriptUtil.getFloat2ArrayItem(uvPtr, 0, 1))
+            if vertexMaxInfluence > 0:
+                meshNode.SetMaximumWeightInfluence(vertexMaxInfluence)
+                meshNode.SetVertexWeightValueBuffer(vertexWeightValueBuffer)
+                meshNode.SetVertexWeightBoneBuffer(vertexWeightBoneBuffer)
 
-            for i, colorLayer in enumerate(colorLayers):
-                vertexIter.getColor(color, colorLayer)
+        meshNode.SetVertexPositionBuffer(vertexPositions)
+        meshNode.SetVertexNormalBuffer(vertexNormals)
 
-                vertexColorLayers[i][index] = \
-                    (color.r, color.g, color.b, color.a)
+        for uvLayer, vertexUVs in enumerate(vertexUVLayers):
+            meshNode.SetVertexUVLayerBuffer(uvLayer, vertexUVs)
 
-            if skinCluster:
-                skinCluster.getWeights(transformDagPath,
-                                       vertexIter.currentItem(),
-                                       weights,
-                                       numWeightsPtr)
+        meshNode.SetUVLayerCount(len(vertexUVLayers))
 
-                # Calculate the maximum influence for this vertex.
-                influence = 0
+        for colorLayer, vertexColors in enumerate(vertexColorLayers):
+            meshNode.SetVertexColorBuffer(colorLayer, vertexColors)
 
-                for vindex in xrange(weights.length()):
-                    if weights[vindex] > WEIGHT_THRESHOLD:
-                        influence += 1
+        meshNode.SetColorLayerCount(len(vertexColorLayers))
 
-                vertexMaxInfluence = max(vertexMaxInfluence, influence)
+        # Automatically converts n-gons to triangle faces.
+        (_, faceIndices) = meshFn.getTriangles()
 
-            vertexIter.next()
+        meshNode.SetFaceBuffer(list(faceIndices))
 
-        if vertexMaxInfluence > 0:
-            vertexWeightValueBuffer = [0.0] * vertexCount * vertexMaxInfluence
-            vertexWeightBoneBuffer = [0] * vertexCount * vertexMaxInfluence
 
-            vertexIter.reset()
+def utilityShareNodes(root, nodes):
+    # Shared nodes keep their scratch root as the parent, so each output only saves what it references.
+    root.childNodes.extend(nodes)
 
-            while not vertexIter.isDone():
-                index = vertexIter.index()
 
-                skinCluster.getWeights(transformDagPath,
-                                       vertexIter.currentItem(),
-                                       weights,
-                                       numWeightsPtr)
+def utilityCreateCast():
+    cast = Cast()
+    root = cast.CreateRoot()
 
-                slot = 0
+    meta = root.CreateMetadata()
+    meta.SetSoftware("Cast v%s for %s" %
+                     (version, cmds.about(product=True)))
 
-                for vindex in xrange(weights.length()):
-                    if weights[vindex] > WEIGHT_THRESHOLD:
-                        vertexWeightValueBuffer[(
-                            index * vertexMaxInfluence) + slot] = weights[vindex]
-                        vertexWeightBoneBuffer[(
-                            index * vertexMaxInfluence) + slot] = bones[vindex]
+    if sceneSettings["exportAxis"]:
+        meta.SetUpAxis(cmds.upAxis(query=True, ax=True))
 
-                        slot += 1
+    return (cast, root)
 
-                vertexIter.next()
 
-            meshNode.SetMaximumWeightInfluence(vertexMaxInfluence)
-            meshNode.SetVertexWeightValueBuffer(vertexWeightValueBuffer)
-            meshNode.SetVertexWeightBoneBuffer(vertexWeightBoneBuffer)
+def utilityCreateExportCast(path, exportSelected):
+    (cast, root) = utilityCreateCast()
 
-        meshNode.SetVertexPositionBuffer(vertexPositions)
-        meshNode.SetVertexNormalBuffer(vertexNormals)
+    if sceneSettings["exportAnim"]:
+        exportAnimation(root, exportSelected)
 
-        for uvLayer, vertexUVs in enumerate(vertexUVLayers):
-            meshNode.SetVertexUVLayerBuffer(uvLayer, vertexUVs)
+    if sceneSettings["exportModel"]:
+        exportModel(root, exportSelected, path)
 
-        meshNode.SetUVLayerCount(len(vertexUVLayers))
+    return cast
 
-        for colorLayer, vertexColors in enumerate(vertexColorLayers):
-            meshNode.SetVertexColorBuffer(colorLayer, vertexColors)
 
-        meshNode.SetColorLayerCount(len(vertexColorLayers))
+def exportCast(path, exportSelected):
+    # Query current user settings so we can reset them after the operation completes.
+    currentAngle = cmds.currentUnit(query=True, angle=True)
 
-        faceCounts = OpenMaya.MIntArray()
-        faceIndices = OpenMaya.MIntArray()
+    try:
+        cmds.currentUnit(angle="rad")
+
+        cast = utilityCreateExportCast(path, exportSelected)
+        cast.save(path)
+    finally:
+        # Reset scene units back to user setting.
+        cmds.currentUnit(angle=currentAngle)
 
-        # Automatically converts n-gons to triangle faces.
-        mesh.getTriangles(faceCounts, faceIndices)
 
-        faceBuffer = [0] * faceIndices.length()
+def exportCastBatch(directory):
+    # Query current user settings so we can reset them after the operation completes.
+    currentAngle = cmds.currentUnit(query=True, angle=True)
+    currentSelection = cmds.ls(selection=True, long=True)
 
-        for i in xrange(faceIndices.length()):
-            faceBuffer[i] = faceIndices[i]
+    # Each skeleton is a root joint, with every joint below it.
+    skeletons = [x for x in cmds.ls(type="joint", long=True)
+                 if not cmds.listRelatives(x, parent=True, type="joint")]
 
-        meshNode.SetFaceBuffer(faceBuffer)
+    # Find the meshes that are bound to each joint once, instead of once per skeleton.
+    jointMeshes = {}
 
+    for skinCluster in cmds.ls(type="skinCluster"):
+        influences = cmds.ls(cmds.skinCluster(skinCluster, query=True, influence=True) or [],
+                             long=True)
+        geometry = cmds.skinCluster(skinCluster, query=True, geometry=True) or []
+        transforms = cmds.listRelatives(geometry, parent=True, fullPath=True) or []
 
-def exportCast(path, exportSelected):
-    # Query current user settings so we can reset them after the operation completes.
-    currentAngle = cmds.currentUnit(query=True, angle=True)
+        for influence in influences:
+            jointMeshes.setdefault(influence, set()).update(transforms)
 
-    try:
-        cast = Cast()
-        root = cast.CreateRoot()
+    outputs = []
+    paths = set()
 
-        meta = root.CreateMetadata()
-        meta.SetSoftware("Cast v%s for %s" %
-                         (version, cmds.about(product=True)))
+    skeletonJoints = [[x] + (cmds.listRelatives(x, allDescendents=True, type="joint", fullPath=True) or [])
+                      for x in skeletons]
 
-        if sceneSettings["exportAxis"]:
-            meta.SetUpAxis(cmds.upAxis(query=True, ax=True))
+    sharedAnimation = None
+    sharedCurves = {}
+    sharedMaterials = {}
 
+    try:
         cmds.currentUnit(angle="rad")
 
-        if sceneSettings["exportAnim"]:
-            exportAnimation(root, exportSelected)
+        # Sample every skeleton's animation in one timeline sweep, then hand each output the curves of its own joints.
+        if sceneSettings["exportAnim"] and skeletons:
+            cmds.select(sum(skeletonJoints, []), replace=True)
 
-        if sceneSettings["exportModel"]:
-            exportModel(root, exportSelected, path)
+            (_, scratch) = utilityCreateCast()
 
-        cast.save(path)
+            exportAnimation(scratch, True)
+
+            sharedAnimation = scratch.ChildOfType(Animation)
+
+            if sharedAnimation is not None:
+                for curve in sharedAnimation.Curves():
+                    sharedCurves.setdefault(curve.NodeName(), []).append(curve)
+
+                # Only the notifications stay shared, each curve moves to the output of its skeleton.
+                sharedAnimation.childNodes = sharedAnimation.Notifications()
+
+        for skeleton, joints in zip(skeletons, skeletonJoints):
+            meshes = set()
+
+            for joint in joints:
+                meshes.update(jointMeshes.get(joint, []))
+
+            # The regular model export handles a selected skeleton and its meshes, so reuse it for each one.
+            cmds.select(joints + sorted(meshes), replace=True)
+
+            # Keep the namespace, so referenced rigs with the same root joint get their own file.
+            name = utilitySanitizeName(skeleton.split("|")[-1])
+            path = os.path.join(directory, "%s.cast" % name)
+            suffix = 1
+
+            while path in paths:
+                path = os.path.join(directory, "%s_%d.cast" % (name, suffix))
+                suffix += 1
+
+            if suffix > 1:
+                cmds.warning("Skeleton: %s shares its name with another skeleton, exporting to %s" %
+                             (skeleton, os.path.basename(path)))
+
+            paths.add(path)
+
+            (cast, root) = utilityCreateCast()
+
+            if sharedAnimation is not None:
+                animation = root.CreateAnimation()
+                animation.SetFramerate(sharedAnimation.Framerate())
+                animation.SetLooping(sharedAnimation.Looping())
+
+                # Curves are named the same way the animation export lists the joints.
+                for joint in cmds.ls(joints):
+                    for curve in sharedCurves.get(joint, []):
+                        animation.CreateChild(curve)
+
+                utilityShareNodes(animation, sharedAnimation.Notifications())
+
+            if sceneSettings["exportModel"]:
+                exportModel(root, True, path, sharedMaterials)
+
+            outputs.append((cast, path))
     finally:
-        # Reset scene units back to user setting.
+        # Reset scene units and selection back to user setting.
         cmds.currentUnit(angle=currentAngle)
 
+        if currentSelection:
+            cmds.select(currentSelection, replace=True)
+        else:
+            cmds.select(clear=True)
+
+    utilitySaveCasts(outputs)
+
 
 class CastFileTranslator(OpenMayaMPx.MPxFileTranslator):
     def __init__(self):
@@ -3131,6 +3743,17 @@ def initializePlugin(m_object):
     utilityLoadSettings()
     utilityCreateMenu()
 
+    # Cached rest positions belong to the scene they were read from.
+    for message in [OpenMaya.MSceneMessage.kAfterNew, OpenMaya.MSceneMessage.kAfterOpen,
+                    OpenMaya.MSceneMessage.kBeforeRemoveReference, OpenMaya.MSceneMessage.kAfterUnloadReference]:
+        restPositionCallbacks.append(
+            OpenMaya.MSceneMessage.addCallback(message, utilityClearRestPositionCache))
+
+    # Undo and redo can remove or restore the saved rest position attribute.
+    for event in ["Undo", "Redo"]:
+        restPositionCallbacks.append(
+            OpenMaya.MEventMessage.addEventCallback(event, utilityClearRestPositionCache))
+
 
 def uninitializePlugin(m_object):
     m_plugin = OpenMayaMPx.MFnPlugin(m_object)
@@ -3141,3 +3764,9 @@ def uninitializePlugin(m_object):
         pass
 
     utilityRemoveMenu()
+
+    for callback in restPositionCallbacks:
+        OpenMaya.MMessage.removeCallback(callback)
+
+    del restPositionCallbacks[:]
+    utilityClearRestPositionCache()